@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+
+from rate_control import AdaptiveRateController, SharedTokenBucket
+
+QUEUE_DB_FILE = os.getenv("NHL_CACHE_DB", "nhl_cache.db") # Queue, ingest state and response cache, shared with main
+LEASE_SECONDS = 2 * 60 * 60 # A unit claimed longer ago than this is assumed to belong to a dead worker
+MAX_ATTEMPTS = 3
+
+
+# Function to expand a season range such as 20152016..20242025 into season ids
+def expand_seasons(start_season, end_season):
+    start_year, end_year = int(str(start_season)[:4]), int(str(end_season)[:4])
+    return [f"{year}{year + 1}" for year in range(start_year, end_year + 1)]
+
+
+# Persistent season x game type work queue shared by backfill workers through SQLite
+class WorkQueue:
+    def __init__(self, db_file=QUEUE_DB_FILE):
+        self.con = sqlite3.connect(db_file, isolation_level=None, timeout=60)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS backfill_queue (
+                season_id TEXT,
+                game_type INTEGER,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                worker TEXT,
+                claimed_at REAL,
+                finished_at REAL,
+                error TEXT,
+                PRIMARY KEY (season_id, game_type)
+            )""")
+
+    # Function to add units to the queue; units already queued or completed are left alone
+    def enqueue(self, seasons, game_types):
+        self.con.execute("BEGIN IMMEDIATE")
+        for season_id in seasons:
+            for game_type in game_types:
+                self.con.execute(
+                    "INSERT OR IGNORE INTO backfill_queue (season_id, game_type, status) VALUES (?, ?, 'pending')",
+                    (season_id, game_type))
+        self.con.execute("COMMIT")
+
+    # Function to atomically claim the next pending (or abandoned) unit; returns None when the queue is drained.
+    # An abandoned unit that has used up its attempts, e.g. one that keeps killing its worker, is parked as failed.
+    def claim(self, worker):
+        now = time.time()
+        self.con.execute("BEGIN IMMEDIATE")
+        self.con.execute("""
+            UPDATE backfill_queue SET status = 'failed', error = COALESCE(error, 'lease expired on the last attempt')
+            WHERE status = 'running' AND claimed_at < ? AND attempts >= ?""", (now - LEASE_SECONDS, MAX_ATTEMPTS))
+        row = self.con.execute("""
+            SELECT season_id, game_type FROM backfill_queue
+            WHERE status = 'pending' OR (status = 'running' AND claimed_at < ? AND attempts < ?)
+            ORDER BY season_id, game_type
+            LIMIT 1""", (now - LEASE_SECONDS, MAX_ATTEMPTS)).fetchone()
+        if row:
+            self.con.execute("""
+                UPDATE backfill_queue SET status = 'running', worker = ?, claimed_at = ?, attempts = attempts + 1
+                WHERE season_id = ? AND game_type = ?""", (worker, now, *row))
+        self.con.execute("COMMIT")
+        return row
+
+    def complete(self, season_id, game_type):
+        self.con.execute(
+            "UPDATE backfill_queue SET status = 'done', finished_at = ?, error = NULL WHERE season_id = ? AND game_type = ?",
+            (time.time(), season_id, game_type))
+
+    # Function to put a failed unit back in the queue, or park it once it has used up its attempts
+    def fail(self, season_id, game_type, error):
+        self.con.execute("""
+            UPDATE backfill_queue
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, error = ?
+            WHERE season_id = ? AND game_type = ?""", (MAX_ATTEMPTS, str(error), season_id, game_type))
+
+    # Function to count units per status
+    def summary(self):
+        return dict(self.con.execute("SELECT status, COUNT(*) FROM backfill_queue GROUP BY status").fetchall())
+
+    def close(self):
+        self.con.close()
+
+
+# Function to load one season x game type unit through the regular pipeline
+def run_unit(pipeline, season_id, game_type, controller, state, cache):
+    async def season_teams():
+        async with pipeline.NHLFetchEngine(controller=controller, cache=cache) as engine:
+            return await engine.season_teams(season_id)
+
+    teams = asyncio.run(season_teams())
+    if not teams:
+        raise RuntimeError(f"no teams found for season {season_id}")
+    # Staging tables are named after this suffix, so keep it unique across concurrent workers
+    timestamp = f"{season_id}_{game_type}_{datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}"
+    # Streaming keeps each worker's memory flat no matter how many games a season has
+    loaded = asyncio.run(
+        pipeline.run_pipeline(teams, season_id, game_type, timestamp, state, controller=controller, streaming=True,
+                              cache=cache))
+    if not loaded:
+        raise RuntimeError("warehouse load failed")
+
+
+# Worker process: drain the queue with a controller drawing from the shared token bucket
+def worker(limiter, db_file):
+    # Imported here so every process opens its own SQLite connections and clients
+    import main as pipeline
+
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    controller = AdaptiveRateController(limiter=limiter)
+    queue = WorkQueue(db_file)
+    state = pipeline.IngestState(db_file, pipeline.STAGING_DIR)
+    cache = pipeline.ResponseCache(db_file)
+    while (unit := queue.claim(name)) is not None:
+        season_id, game_type = unit
+        logging.info(f"🚀 {name} loading season {season_id}, game type {game_type}")
+        try:
+            run_unit(pipeline, season_id, game_type, controller, state, cache)
+            queue.complete(season_id, game_type)
+            logging.info(f"✅ {name} finished season {season_id}, game type {game_type}")
+        except Exception as e:
+            logging.error(f"❌ {name} failed season {season_id}, game type {game_type}: {e}")
+            queue.fail(season_id, game_type, e)
+    cache.close()
+    state.close()
+    queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill NHL game logs for a range of seasons")
+    parser.add_argument("--start-season", required=True, help="first season, e.g. 20152016")
+    parser.add_argument("--end-season", required=True, help="last season, e.g. 20242025")
+    parser.add_argument("--game-types", type=int, nargs="+", default=[2, 3], help="2 = regular season, 3 = playoffs")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--calls-per-second", type=float, default=10, help="starting rate shared by all workers")
+    parser.add_argument("--db-file", default=QUEUE_DB_FILE)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%m/%d/%Y %I:%M:%S %p",
+        level=logging.INFO)
+
+    queue = WorkQueue(args.db_file)
+    queue.enqueue(expand_seasons(args.start_season, args.end_season), args.game_types)
+    logging.info(f"🚀 Backfill queue: {queue.summary()}")
+    queue.close()
+
+    ctx = multiprocessing.get_context("spawn")
+    limiter = SharedTokenBucket(args.calls_per_second, ctx=ctx)
+    processes = [ctx.Process(target=worker, args=(limiter, args.db_file)) for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    queue = WorkQueue(args.db_file)
+    logging.info(f"✅ Backfill finished: {queue.summary()}")
+    queue.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+
+import pandas as pd
+
+import fetch_engine
+from replay import FIXTURES_DIR, ReplayServer, fixture_path, load_index
+
+
+# Function to run one benchmark stage, recording wall time, peak traced memory and requests served by the replay server
+def measure(results, server, stage, fn, trace_memory=True, **settings):
+    server.reset_stats()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        output = fn()
+    finally:
+        wall_time = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        tracemalloc.stop()
+    stats = dict(server.stats)
+    rows = len(output) if isinstance(output, (pd.DataFrame, list)) else None
+    result = {
+        "stage": stage,
+        **settings,
+        "wall_time": round(wall_time, 4),
+        "requests": stats["requests"],
+        "requests_per_second": round(stats["requests"] / wall_time, 2) if wall_time else None,
+        "throttled": stats["throttled"],
+        "errors": stats["errors"],
+        "rows": rows,
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+    }
+    results.append(result)
+    memory = f", peak {result['peak_memory_mb']} MB" if peak is not None else ""
+    logging.info(
+        f"✅ {stage} {settings or ''}: {result['wall_time']:.2f}s, {result['requests']} requests "
+        f"({result['requests_per_second']}/s), {rows} rows{memory}")
+    return output
+
+
+# Function to read recorded game logs straight from the fixtures, for timing the transforms without the network
+def read_raw_game_logs(fixtures_dir, index):
+    raw_game_logs = []
+    for player_id in index["players"]:
+        path = fixture_path(
+            fixtures_dir, f"/player/{player_id}/game-log/{index['season_id']}/{index['game_type']}")
+        if path.is_file():
+            with open(path) as f:
+                raw_game_logs.append((player_id, json.load(f).get("gameLog", [])))
+    return raw_game_logs
+
+
+def run_benchmarks(fixtures_dir, worker_counts, rates, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                   retry_after=1, trace_memory=True):
+    index = load_index(fixtures_dir)
+    server = ReplayServer(fixtures_dir, latency=latency, jitter=jitter, error_rate=error_rate,
+                          throttle_rate=throttle_rate, retry_after=retry_after).start()
+    fetch_engine.NHL_API_BASE_URL = server.base_url
+    import main
+    from normalize import normalize_game_logs
+    from schemas import conform
+    from spool import join_roster
+
+    # Benchmark the network path rather than the local response cache
+    main.CACHE_DB_FILE = None
+    season_id, game_type = index["season_id"], index["game_type"]
+    results = []
+
+    def run(stage, fn, **settings):
+        return measure(results, server, stage, fn, trace_memory, **settings)
+
+    try:
+        teams = run("teams", lambda: main.fetch_sync(lambda engine: engine.teams(index["date"])))
+        rosters = run("rosters", lambda: pd.concat(
+            [main.get_team_roster(team, season_id) for team in teams], ignore_index=True))
+
+        for max_workers in worker_counts:
+            for rate in rates:
+                run("game_logs",
+                        lambda: main.get_combined_game_logs(index["players"], season_id, game_type, max_workers, rate),
+                        max_workers=max_workers, api_calls_per_second=rate)
+
+        raw_game_logs = read_raw_game_logs(fixtures_dir, index)
+        df = run("normalize", lambda: normalize_game_logs(raw_game_logs, season_id))
+        roster_lookup = {record["id"]: record for record in rosters.to_dict("records")}
+        df = run("join_roster", lambda: join_roster(df, roster_lookup))
+        # Same shape as the skaters branch: no goalie-only columns
+        skaters = df[df["positionCode"] != "G"].dropna(axis=1, how="all")
+        run("serialize_csv", lambda: skaters.to_csv(index=False))
+        run("serialize_parquet", lambda: conform(skaters, "skaters").to_parquet(index=False))
+    finally:
+        server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%m/%d/%Y %I:%M:%S %p",
+        level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Benchmark the NHL pipeline stages against recorded fixtures")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    parser.add_argument("--workers", type=int, nargs="+", default=[5, 10, 20], help="max_workers settings to compare")
+    parser.add_argument("--calls-per-second", type=float, nargs="+", default=[5, 20, 50],
+                        help="starting API rates to compare (the rate controller caps them at its max_rate)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the replay server adds to every response")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--no-trace-memory", action="store_true",
+                        help="skip tracemalloc, which slows allocation-heavy stages, for more accurate timings")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.fixtures_dir, args.workers, args.calls_per_second, args.latency, args.jitter,
+                             args.error_rate, args.throttle_rate, args.retry_after, not args.no_trace_memory)
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,180 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+from collections import deque
+
+import httpx
+
+from rate_control import AdaptiveRateController, FetchError, RetryPolicy, RETRYABLE_STATUS_CODES, parse_retry_after
+
+# Same web API that nhlpy wraps; overridable for pointing the pipeline at a stand-in server
+NHL_API_BASE_URL = os.getenv("NHL_API_BASE_URL", "https://api-web.nhle.com/v1")
+
+# Path templates for the endpoints the pipeline uses, keyed by the name used for caching and TTLs
+ENDPOINTS = {
+    "standings": "/standings/{date}",
+    "standings_season": "/standings-season",
+    "roster": "/roster/{team_abbr}/{season_id}",
+    "player_game_log": "/player/{player_id}/game-log/{season_id}/{game_type}",
+}
+
+
+# Function to iterate a plain or async iterable asynchronously
+async def aiter_items(items):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+# Function to run `fetch` over items (plain or async iterable) with bounded concurrency, yielding results in input order
+async def ordered_stream(items, fetch, window_size):
+    window = deque()
+    try:
+        async for item in aiter_items(items):
+            window.append(asyncio.ensure_future(fetch(item)))
+            if len(window) >= window_size:
+                yield await window.popleft()
+        while window:
+            yield await window.popleft()
+    finally:
+        for task in window:
+            task.cancel()
+
+
+# Async fetch engine for the NHL web API with adaptive rate control, retries and a concurrency cap
+class NHLFetchEngine:
+    def __init__(self, api_calls_per_second=5, max_concurrency=10, base_url=None, timeout=30.0,
+                 controller=None, retry_policy=None, cache=None, metrics=None, transport=None):
+        self.max_concurrency = max_concurrency
+        # Read at construction so the benchmark can point engines at a replay server after import
+        self.base_url = base_url or NHL_API_BASE_URL
+        self.timeout = timeout
+        # Pass a shared controller to carry the learned rate across engine sessions
+        self.controller = controller or AdaptiveRateController(initial_rate=api_calls_per_second)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.cache = cache
+        self.metrics = metrics # Optional RunMetrics for latency histograms and retry/cache counters
+        self.transport = transport # Optional httpx transport, such as a MockTransport serving canned responses
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.http = None
+
+    async def __aenter__(self):
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+            follow_redirects=True,
+            transport=self.transport)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.http.aclose()
+        self.http = None
+
+    # Function to fetch an endpoint as JSON, serving fresh cache entries without a request
+    # and revalidating stale ones with a conditional request
+    async def get_json(self, endpoint, **params):
+        entry = self.cache.get(endpoint, params) if self.cache else None
+        if entry is not None and entry.fresh:
+            self.count("cache_hits", endpoint)
+            return entry.data
+
+        headers = entry.conditional_headers() if entry is not None else {}
+        response = await self.request(ENDPOINTS[endpoint].format(**params), headers, endpoint)
+        if response.status_code == 304 and entry is not None:
+            self.count("cache_revalidated", endpoint)
+            self.cache.revalidate(entry)
+            return entry.data
+        self.count("response_bytes", endpoint, len(response.content))
+        if self.cache:
+            self.cache.put(
+                endpoint, params, response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"))
+        return response.json()
+
+    # Function to make a rate-limited GET request with retries; raises FetchError once retries run out
+    async def request(self, path, headers=None, endpoint=None):
+        attempt = 0
+        while True:
+            retry_after = None
+            async with self.semaphore:
+                await self.controller.limiter.acquire()
+                started = time.monotonic()
+                try:
+                    response = await self.http.get(path, headers=headers)
+                except httpx.RequestError as e:
+                    error, status_code = e, None
+                else:
+                    status_code = response.status_code
+                    latency = time.monotonic() - started
+                    if self.metrics and endpoint:
+                        self.metrics.observe_latency(endpoint, latency)
+                    if status_code < 400:
+                        self.controller.on_success(latency)
+                        return response
+                    error = f"HTTP {status_code}"
+                    if status_code == 429:
+                        self.count("throttled_responses", endpoint)
+                        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                        self.controller.on_throttle(retry_after)
+                    elif status_code not in RETRYABLE_STATUS_CODES:
+                        self.count("failed_requests", endpoint)
+                        raise FetchError(path, error, status_code)
+
+            if attempt >= self.retry_policy.max_retries:
+                self.count("failed_requests", endpoint)
+                raise FetchError(path, f"{error} after {attempt + 1} attempts", status_code)
+            self.count("retries", endpoint)
+            delay = self.retry_policy.delay(attempt, retry_after)
+            logging.warning(f"⚠️ Retrying {path} in {delay:.1f}s ({error})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def count(self, name, endpoint, value=1):
+        if self.metrics and endpoint:
+            self.metrics.count(name, value, endpoint=endpoint)
+
+    # Function to get the abbreviations of all franchises in the standings for a date
+    async def teams(self, date):
+        data = await self.get_json("standings", date=date)
+        return [team["teamAbbrev"]["default"] for team in data.get("standings", [])]
+
+    # Function to get the franchises that played in a season, from the standings on its last regular-season day
+    async def season_teams(self, season_id):
+        data = await self.get_json("standings_season")
+        seasons = {str(season["id"]): season for season in data.get("seasons", [])}
+        if str(season_id) not in seasons:
+            raise FetchError("/standings-season", f"unknown season {season_id}")
+        date = min(seasons[str(season_id)]["standingsEnd"], datetime.date.today().isoformat())
+        return await self.teams(date)
+
+    # Function to get a team's roster for a season as a list of player records
+    async def roster(self, team_abbr, season_id):
+        data = await self.get_json("roster", team_abbr=team_abbr, season_id=season_id)
+        return data.get("forwards", []) + data.get("defensemen", []) + data.get("goalies", [])
+
+    # Function to fetch a player's game log
+    async def player_game_log(self, player_id, season_id, game_type):
+        data = await self.get_json(
+            "player_game_log", player_id=player_id, season_id=season_id, game_type=game_type)
+        return data.get("gameLog", [])
+
+    # Function to stream (player_id, game_log) pairs in the same order as players_list;
+    # game_log is None for players whose requests failed after all retries
+    async def stream_game_logs(self, players_list, season_id, game_type):
+        async def fetch(player_id):
+            try:
+                return player_id, await self.player_game_log(player_id, season_id, game_type)
+            except FetchError as e:
+                logging.error(f"❌ Failed to fetch game logs for player {player_id}: {e}")
+                return player_id, None
+
+        # Keep a few requests queued behind the in-flight ones so the limiter never idles
+        async for result in ordered_stream(players_list, fetch, self.max_concurrency * 4):
+            yield result
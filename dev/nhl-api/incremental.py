@@ -0,0 +1,152 @@
+import datetime
+import logging
+import os
+import sqlite3
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+
+# Function to keep only rows that come after a player's (gameDate, gameId) high-water mark
+def new_rows_since(df, watermark):
+    if watermark is None or df.shape[1] == 0:
+        return df
+    last_game_date, last_game_id = watermark
+    last_game_date = pd.Timestamp(last_game_date)
+    newer = (df["gameDate"] > last_game_date) | ((df["gameDate"] == last_game_date) & (df["gameId"] > last_game_id))
+    return df.loc[newer]
+
+
+# Per-player watermarks and per-run checkpoints for incremental game-log ingestion.
+# Staged rows are appended to a JSON-lines spool file per run, so an interrupted run
+# resumes from its checkpoints and watermarks only advance once the warehouse merge succeeded.
+class IngestState:
+    def __init__(self, db_file="nhl_cache.db", staging_dir="staging"):
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(db_file, timeout=30)
+        self.con.executescript("""
+            CREATE TABLE IF NOT EXISTS ingest_watermarks (
+                player_id INTEGER,
+                season_id TEXT,
+                game_type INTEGER,
+                last_game_date TEXT,
+                last_game_id INTEGER,
+                updated_at TEXT,
+                PRIMARY KEY (player_id, season_id, game_type)
+            );
+            CREATE TABLE IF NOT EXISTS ingest_runs (
+                run_id TEXT PRIMARY KEY,
+                table_name TEXT,
+                season_id TEXT,
+                game_type INTEGER,
+                status TEXT,
+                started_at TEXT,
+                finished_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                run_id TEXT,
+                player_id INTEGER,
+                last_game_date TEXT,
+                last_game_id INTEGER,
+                row_count INTEGER,
+                PRIMARY KEY (run_id, player_id)
+            );
+        """)
+
+    # Function to resume the unfinished run for a table/season/game type, or start a new one
+    def start_run(self, table_name, season_id, game_type):
+        row = self.con.execute(
+            "SELECT run_id FROM ingest_runs WHERE table_name = ? AND season_id = ? AND game_type = ? AND status = 'running'",
+            (table_name, str(season_id), game_type)).fetchone()
+        if row:
+            logging.info(f"⚠️ Resuming interrupted run {row[0]} for {table_name}")
+            return row[0]
+        run_id = uuid.uuid4().hex
+        with self.con:
+            self.con.execute(
+                "INSERT INTO ingest_runs VALUES (?, ?, ?, ?, 'running', ?, NULL)",
+                (run_id, table_name, str(season_id), game_type, datetime.datetime.now().isoformat()))
+        return run_id
+
+    # Function to list players already checkpointed in a run
+    def completed_players(self, run_id):
+        rows = self.con.execute("SELECT player_id FROM ingest_checkpoints WHERE run_id = ?", (run_id,))
+        return {player_id for (player_id,) in rows}
+
+    # Function to get {player_id: (last_game_date, last_game_id)} for a season and game type
+    def watermarks(self, season_id, game_type):
+        rows = self.con.execute(
+            "SELECT player_id, last_game_date, last_game_id FROM ingest_watermarks WHERE season_id = ? AND game_type = ?",
+            (str(season_id), game_type))
+        return {player_id: (last_game_date, last_game_id) for player_id, last_game_date, last_game_id in rows}
+
+    def spool_path(self, run_id):
+        return self.staging_dir / f"{run_id}.jsonl"
+
+    # Function to append a player's new rows to the run's spool file and checkpoint the player
+    def stage(self, run_id, player_id, df, watermark=None):
+        if len(df) > 0:
+            records = df.to_json(orient="records", lines=True, date_format="iso")
+            with open(self.spool_path(run_id), "a") as f:
+                f.write(records if records.endswith("\n") else records + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            last = df.sort_values(["gameDate", "gameId"]).iloc[-1]
+            watermark = (last["gameDate"].strftime("%Y-%m-%d"), int(last["gameId"]))
+        last_game_date, last_game_id = watermark if watermark else (None, None)
+        with self.con:
+            self.con.execute(
+                "INSERT OR REPLACE INTO ingest_checkpoints VALUES (?, ?, ?, ?, ?)",
+                (run_id, player_id, last_game_date, last_game_id, len(df)))
+
+    # Function to read everything staged in a run; rows re-staged after a crash are dropped
+    def staged_rows(self, run_id, key_columns):
+        path = self.spool_path(run_id)
+        if not path.exists() or path.stat().st_size == 0:
+            return pd.DataFrame()
+        df = pd.read_json(path, lines=True, convert_dates=False)
+        df["gameDate"] = pd.to_datetime(df["gameDate"]).dt.tz_localize(None)
+        return df.drop_duplicates(subset=key_columns, keep="last").reset_index(drop=True)
+
+    # Function to read a run's staged rows in chunks. Like staged_rows, the last copy of a re-staged key wins:
+    # a first pass finds the line each key was last staged on, a second pass yields only those lines.
+    def iter_staged_rows(self, run_id, key_columns, chunksize=50000):
+        path = self.spool_path(run_id)
+        if not path.exists() or path.stat().st_size == 0:
+            return
+        last_lines = {}
+        for df in self.read_spool_chunks(path, chunksize):
+            last_lines.update(zip(zip(*(df[col] for col in key_columns)), df.index))
+        for df in self.read_spool_chunks(path, chunksize):
+            keys = zip(*(df[col] for col in key_columns))
+            latest = [last_lines[key] == line for key, line in zip(keys, df.index)]
+            yield df.loc[latest].reset_index(drop=True)
+
+    # Function to read a spool file in chunks, indexed by line number
+    @staticmethod
+    def read_spool_chunks(path, chunksize):
+        with pd.read_json(path, lines=True, convert_dates=False, chunksize=chunksize) as reader:
+            for df in reader:
+                df["gameDate"] = pd.to_datetime(df["gameDate"]).dt.tz_localize(None)
+                yield df
+
+    # Function to promote a run's checkpoints to watermarks once its rows are merged into the warehouse
+    def finish_run(self, run_id):
+        now = datetime.datetime.now().isoformat()
+        with self.con:
+            self.con.execute("""
+                INSERT OR REPLACE INTO ingest_watermarks
+                SELECT c.player_id, r.season_id, r.game_type, c.last_game_date, c.last_game_id, ?
+                FROM ingest_checkpoints c
+                JOIN ingest_runs r ON r.run_id = c.run_id
+                WHERE c.run_id = ? AND c.last_game_date IS NOT NULL
+            """, (now, run_id))
+            self.con.execute(
+                "UPDATE ingest_runs SET status = 'complete', finished_at = ? WHERE run_id = ?", (now, run_id))
+            self.con.execute("DELETE FROM ingest_checkpoints WHERE run_id = ?", (run_id,))
+        self.spool_path(run_id).unlink(missing_ok=True)
+
+    def close(self):
+        self.con.close()
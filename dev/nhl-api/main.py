@@ -1,16 +1,22 @@
 import pandas as pd
-import time
-import httpx
+import asyncio
 import datetime
 import os
-from google.cloud import storage
-from google.cloud import bigquery
-from nhlpy.nhl_client import NHLClient
-import concurrent.futures
-import threading
+import argparse
 from dotenv import load_dotenv
 from pathlib import Path
 import logging
+import threading
+from fetch_engine import NHLFetchEngine
+from rate_control import AdaptiveRateController
+from response_cache import ResponseCache
+from incremental import IngestState, new_rows_since
+from spool import CsvSpool, ParquetSpool, join_roster
+from schemas import conform, warehouse_schema
+from normalize import normalize_game_logs, normalize_roster
+from staging_store import GCSStagingStore, LocalStagingStore
+from warehouse import BigQueryWarehouse, SQLiteWarehouse
+from metrics import RunMetrics
 
 dotenv_path = Path("creds/nhl-env-var.env")
 load_dotenv(dotenv_path=dotenv_path)
@@ -18,6 +24,7 @@ load_dotenv(dotenv_path=dotenv_path)
 SEASON_ID = "20242025" # Set to 2024/25 Season
 REGULAR_SEASON = 2 # Game type for fetching stats
 PLAYOFFS = 3 # Game type for fetching stats
+API_CALLS_PER_SECOND = 5 # Starting rate; adjusted at runtime based on 429s and latency
 
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME")
 SKATERS_FILE_NAME = os.getenv("SKATERS_FILE_NAME")
@@ -26,26 +33,71 @@ GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 STAGING_DATASET_ID = os.getenv("STAGING_DATASET_ID")
 PROD_DATASET_ID = os.getenv("PROD_DATASET_ID")
 GOOGLE_APPLICATION_CREDENTIALS =  os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-
-client = NHLClient(verbose=True)
+CACHE_DB_FILE = os.getenv("NHL_CACHE_DB", "nhl_cache.db") # Response cache and ingest state; empty to disable the cache
+STAGING_DIR = os.getenv("NHL_STAGING_DIR", "staging")
+KEY_COLUMNS = ["gameDate", "gameId", "playerId"] # Merge keys for the game logs tables
+STREAM_BATCH_ROWS = 20000 # Rows joined and spooled at a time in streaming mode
+STAGING_FORMAT = os.getenv("STAGING_FORMAT", "csv") # csv, or parquet for typed and compressed loads
+LOCAL_STAGING_DIR = os.getenv("LOCAL_STAGING_DIR") # Stage files in a local directory instead of GCS
+WAREHOUSE_BACKEND = os.getenv("WAREHOUSE_BACKEND", "bigquery") # bigquery, or sqlite to load into a local database
+WAREHOUSE_DB_FILE = os.getenv("WAREHOUSE_DB_FILE", "hnl.db")
+METRICS_DIR = os.getenv("NHL_METRICS_DIR", "metrics") # JSON run reports are written here
+PROMETHEUS_TEXTFILE = os.getenv("NHL_PROMETHEUS_TEXTFILE", os.path.join(METRICS_DIR, "nhl_pipeline.prom"))
+
+# Shared rate controller so the learned API rate carries over between fetch sessions
+rate_controller = AdaptiveRateController(initial_rate=API_CALLS_PER_SECOND)
+# Local response cache so warm runs only revalidate or skip unchanged payloads, opened on first use
+response_cache = None
+response_cache_lock = threading.Lock()
+# Where staged files are uploaded before the warehouse load
+if LOCAL_STAGING_DIR or WAREHOUSE_BACKEND == "sqlite":
+    staging_store = LocalStagingStore(LOCAL_STAGING_DIR or Path(STAGING_DIR) / "store")
+else:
+    staging_store = GCSStagingStore(GCS_BUCKET_NAME)
+# Stage timings, API latencies and counters for the current run
+run_metrics = RunMetrics()
+# Warehouse backend shared by every load and merge, created on first use
+warehouse = None
+warehouse_lock = threading.Lock()
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s", 
     datefmt="%m/%d/%Y %I:%M:%S %p",
     level=logging.INFO)
 
-# Function to get default values for English spelling of players names
-def get_default_value(column, get_value):
-    return column.apply(lambda x: x.get(get_value) if isinstance(x, dict) else x)
+# Function to run a single fetch engine call from synchronous code
+def fetch_sync(fetch):
+    async def run():
+        async with NHLFetchEngine(controller=rate_controller, cache=get_response_cache(), metrics=run_metrics) as engine:
+            return await fetch(engine)
+    return asyncio.run(run())
+
+# Function to get the shared response cache, or None when CACHE_DB_FILE is empty
+def get_response_cache():
+    global response_cache
+    with response_cache_lock:
+        if response_cache is None and CACHE_DB_FILE:
+            response_cache = ResponseCache(CACHE_DB_FILE)
+    return response_cache
+
+# Function to get the shared warehouse backend
+def get_warehouse():
+    global warehouse
+    with warehouse_lock:
+        if warehouse is None:
+            if WAREHOUSE_BACKEND == "sqlite":
+                warehouse = SQLiteWarehouse(WAREHOUSE_DB_FILE)
+            else:
+                warehouse = BigQueryWarehouse(GCP_PROJECT_ID)
+    return warehouse
 
 # Function that returns list of franchises
 def get_team_info():  
     try:
         # Load franchises data for the most recent date into a dataframe
         date = datetime.datetime.now().strftime("%Y-%m-%d")
-        team_info = client.teams.teams_info(date=date)
-        df_team_info = pd.DataFrame(team_info)
         # Return a list of franchises for future iterations
-        teams_list = df_team_info["abbr"].to_list()
+        with run_metrics.span("teams_fetch"):
+            teams_list = fetch_sync(lambda engine: engine.teams(date))
         return teams_list
     except Exception as e:
         logging.error(f"❌ Failed to fetch team info: {e}")
@@ -55,88 +107,37 @@ def get_team_info():
 def get_team_roster(team_abbr, season_id):
     try: 
         # Load roster forwards, defensemen and goalies data into a dataframe 
-        data = client.teams.roster(team_abbr=team_abbr, season=season_id)
-        data_combined = data["forwards"] + data["defensemen"] + data ["goalies"]
-        df = pd.DataFrame(data_combined)
-
-        # Get default English player and geographical names and drop columns that aren't needed
-        if df.shape[1] > 0:
-            # Clean columns
-            columns_to_change = ["firstName", "lastName", "birthCity", "birthStateProvince"]
-            for column in columns_to_change:
-                df[column] = get_default_value(df[column], "default")
-            # Add a column for the current team a player is signed to
-            df["currentTeam"] = team_abbr
-            
-            # Drop columns
-            df.drop(columns=["heightInInches", "weightInPounds", "birthCity", "birthStateProvince"], axis=1, inplace=True)
-        return df
+        data_combined = fetch_sync(lambda engine: engine.roster(team_abbr, season_id))
+        return normalize_roster(data_combined, team_abbr)
     except Exception as e:
         logging.error(f"❌ Failed to fetch roster for team {team_abbr}: {e}")
         return pd.DataFrame()
 
-# Function to get game logs for a player for a given season and game type - pre-season, regular season or playoffs
-def get_game_logs(player_id, season_id, game_type):
-    try:
-        # Get the data and load it into a dataframe
-        data = client.stats.player_game_log(player_id=player_id, season_id=season_id, game_type=game_type)
-        df = pd.DataFrame(data)
-        if df.shape[1] > 0:
-            # Drop columns that aren't needed
-            df.drop(columns=["commonName", "opponentCommonName"], inplace=True)
-            
-            # Convert gameDate column to date data type
-            df["gameDate"] = pd.to_datetime(df["gameDate"], format="%Y-%m-%d")
-            
-            # Convert time on ice to seconds and drop the original column
-            df["toiInSeconds"] = df["toi"].apply(
-                lambda x: 
-                    int(x.split(":")[0]) * 60 + int(x.split(":")[1]) 
-                    if len(x.split(":")) == 2 
-                    else int(x.split(":")[0]) * 60 * 60 + int(x.split(":")[1]) * 60 + int(x.split(":")[2]))
-            df.drop(columns=["toi"], inplace=True)
-
-            # Append player and season ids
-            df["playerId"] = player_id
-            df["seasonId"] = season_id
-        return df
-    except Exception as e:
-        logging.error(f"❌ Failed to fetch game logs for player {player_id}: {e}")
-        return pd.DataFrame()
-
-# Global lock for rate-limiting
-lock = threading.Lock()
-
-# Helper function for dynamic rate-limiting
-def rate_limit(api_calls_per_second):
-    time_between_calls = 1 / api_calls_per_second
-    time.sleep(time_between_calls)
-
-# Function for fetching game logs
-def get_combined_game_logs(players_list, season_id, game_type, max_workers=10, api_calls_per_second=5):
-    def fetch_game_logs(player_id):
-        with lock:
-            rate_limit(api_calls_per_second)  # Enforce rate-limiting
-        try:
-            df = get_game_logs(player_id, season_id, game_type)
-            return df
-        except httpx.RequestError as e:
-            logging.warning(f"❌ Request failed for player {player_id}: {e}")
-            return None
-
-    # Using ThreadPoolExecutor for concurrency
-    game_logs_list = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(fetch_game_logs, player): player for player in players_list}
-
-        for future in concurrent.futures.as_completed(futures):
-            player_id = futures[future]
-            try:
-                result = future.result()
-                if result is not None:
-                    game_logs_list.append(result)
-            except Exception as e:
-                logging.error(f"❌ An error occurred for player {player_id}: {e}")
+# Function to collect game logs through the async fetch engine, normalizing them in one batch
+async def collect_game_logs(players_list, season_id, game_type, max_workers, controller):
+    raw_game_logs = []
+    failed_players = []
+    async with NHLFetchEngine(max_concurrency=max_workers, controller=controller, cache=get_response_cache(),
+                              metrics=run_metrics) as engine:
+        async for player_id, data in engine.stream_game_logs(players_list, season_id, game_type):
+            if data is None:
+                failed_players.append(player_id)
+                continue
+            raw_game_logs.append((player_id, data))
+    if failed_players:
+        logging.error(f"❌ Missing game logs for {len(failed_players)} of {len(players_list)} players: {failed_players}")
+    logging.info(f"✅ Fetched game logs at {controller.rate:.2f} calls/sec ({controller.throttled} throttled responses)")
+    return [normalize_game_logs(raw_game_logs, season_id)]
+
+# Function for fetching game logs with up to max_workers requests in flight;
+# api_calls_per_second only sets a starting rate, by default the shared controller's learned rate is used
+def get_combined_game_logs(players_list, season_id, game_type, max_workers=10, api_calls_per_second=None):
+    if api_calls_per_second is None:
+        controller = rate_controller
+    else:
+        controller = AdaptiveRateController(initial_rate=api_calls_per_second)
+    game_logs_list = asyncio.run(
+        collect_game_logs(players_list, season_id, game_type, max_workers, controller))
 
     # Combine all game logs into a single DataFrame
     if game_logs_list:
@@ -144,24 +145,46 @@ def get_combined_game_logs(players_list, season_id, game_type, max_workers=10, a
     else:
         return pd.DataFrame()
 
-# Function for loading data to Google Cloud Storage
-def load_data_to_gcs(bucket_name, df, file_name):
+# Function for loading data to the staging store (Google Cloud Storage unless LOCAL_STAGING_DIR is set)
+def load_data_to_staging(df, file_name, staging_format="csv"):
+    object_name = f"{file_name}.{staging_format}"
+    try:
+        with run_metrics.span("serialize"):
+            if staging_format == "parquet":
+                data = df.to_parquet(index=False, compression="snappy")
+                content_type = "application/octet-stream"
+            else:
+                data = df.to_csv(index=False).encode()
+                content_type = "text/csv"
+        with run_metrics.span("staging_upload"):
+            staging_store.upload_bytes(data, object_name, content_type)
+        run_metrics.count("staged_bytes", len(data), table=file_name.rsplit("_", 1)[0])
+        logging.info(f"✅ Uploaded {object_name} to {staging_store}")
+        return True
+    except Exception as e:
+        logging.error(f"❌ Failed to upload {object_name} to {staging_store}: {e}")
+        return False
+
+# Function for uploading a spool file to the staging store with a chunked, resumable upload
+def load_file_to_staging(spool, file_name):
+    object_name = f"{file_name}.{spool.source_format.lower()}"
     try:
-        client = storage.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(f"{file_name}.csv")
-        blob.upload_from_string(df.to_csv(index=False), 'text/csv')
-        logging.info(f"✅ Uploaded {file_name}.csv to GCS bucket {bucket_name}")
+        with run_metrics.span("staging_upload"):
+            staging_store.upload_file(spool.path, object_name, spool.content_type)
+        run_metrics.count("staged_bytes", spool.path.stat().st_size, table=file_name.rsplit("_", 1)[0])
+        logging.info(f"✅ Uploaded {object_name} to {staging_store}")
+        return True
     except Exception as e:
-        logging.error(f"❌ Failed to upload {file_name} to GCS: {e}")
+        logging.error(f"❌ Failed to upload {object_name} to {staging_store}: {e}")
+        return False
 
 # Function to get schema for a dataframe
 def get_schema(df):
     schema = []
     for col, dtype in zip(df.columns, df.dtypes):
-        if dtype == "int64":
+        if pd.api.types.is_integer_dtype(dtype):
             field_type = "INT64"
-        elif dtype == "float64":
+        elif pd.api.types.is_float_dtype(dtype):
             field_type = "FLOAT"
         elif dtype == "object":
             field_type = "STRING"
@@ -169,175 +192,254 @@ def get_schema(df):
             field_type = "DATETIME"
         else:
             field_type = "STRING"
-        schema.append(bigquery.SchemaField(col, field_type))
+        schema.append((col, field_type))
     return schema    
 
-# Function to load data to BigQuery
-def load_data_to_bq(bucket_name, project_id, dataset_id, schema, file_name):
-    client = bigquery.Client()
-    try:
-        # Ensure dataset exists
-        client.get_dataset(dataset_id)
-    except Exception:
-        client.create_dataset(dataset_id)
-    
-    table_id = f"{project_id}.{dataset_id}.{file_name}"
-    job_config = bigquery.LoadJobConfig(
-        schema=schema, 
-        skip_leading_rows=1,
-        source_format=bigquery.SourceFormat.CSV
-    )
-
-    uri = f"gs://{bucket_name}/{file_name}.csv"
-    try:
-        load_job = client.load_table_from_uri(uri, table_id, job_config=job_config)
-        load_job.result()  # Wait for the job to complete
-        destination_table = client.get_table(table_id)
-        logging.info(f"✅ Loaded {destination_table.num_rows} rows into {table_id}.")
-
-        # Set table expiration to 5 days
-        expiration = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
-            days=5
-        )
-        destination_table.expires = expiration
-        destination_table = client.update_table(destination_table, ["expires"])
-        logging.info(f"✅ Updated {table_id}, expires {destination_table.expires}.")
-    except Exception as e:
-        logging.error(f"❌ Error loading data to BigQuery: {e}")
-
-# Function to sync schema of two tables in BigQuery
-def sync_table_schema(project_id, prod_dataset_id, prod_table, staging_dataset_id, staging_table):
-    client = bigquery.Client()
-    prod_table_id = f"{project_id}.{prod_dataset_id}.{prod_table}"
-    staging_table_id = f"{project_id}.{staging_dataset_id}.{staging_table}"
-
-    # Get existing production table schema
-    try:
-        prod_table_ref = client.get_table(prod_table_id)
-        existing_columns = {field.name: field.field_type for field in prod_table_ref.schema}
-    except Exception as e:
-        logging.error(f"❌ Error fetching schema for {prod_table_id}: {e}")
-        return
-    
-    # Identify missing columns
-    try: 
-        staging_table_ref = client.get_table(staging_table_id)
-        new_columns = [field for field in staging_table_ref.schema if field.name not in existing_columns]
-    except Exception as e:
-        logging.error(f"❌ Error fetching schema for {staging_table_id}: {e}")
-        return
-
-    if new_columns:
-        logging.info(f"⚠️ Adding missing columns to `{prod_table_id}`: {[col.name for col in new_columns]}")
-        for col in new_columns:
-            try:
-                alter_table_query = f"""
-                    ALTER TABLE `{prod_table_id}`
-                    ADD COLUMN {col.name} {col.field_type};
-                """
-                client.query(alter_table_query).result()
-                logging.info(f"✅ Column `{col.name}` added successfully.")
-            except Exception as e:
-                logging.error(f"❌ Error adding column `{col.name}`: {e}")
+# Function to load a staged file into a warehouse staging table and merge it into the production table
+def load_and_merge(file_name, schema, name, source_format="CSV"):
+    prod_table = f"{name}"
+    warehouse = get_warehouse()
+    with run_metrics.span("warehouse_load"):
+        loaded = warehouse.load_staging_table(
+            staging_store.uri(f"{file_name}.{source_format.lower()}"), 
+            STAGING_DATASET_ID, 
+            file_name,
+            schema, 
+            source_format)
+    if not loaded:
+        return False
+    with run_metrics.span("warehouse_merge"):
+        return warehouse.upsert(
+            STAGING_DATASET_ID, 
+            file_name, 
+            PROD_DATASET_ID, 
+            prod_table,
+            KEY_COLUMNS)
+
+# Function to stage a branch's rows and merge them into its production table.
+# Parquet staging conforms the rows to the table's declared schema instead of inferring one.
+def load_branch(df, name, timestamp, table, staging_format="csv"):
+    file_name = f"{name}_{timestamp}"
+    if staging_format == "parquet":
+        df = conform(df, table)
+        schema = warehouse_schema(table)
+    else:
+        schema = get_schema(df)
+    if not load_data_to_staging(df, file_name, staging_format):
+        return False
+    return load_and_merge(file_name, schema, name, staging_format.upper())
+
+# Function to do the same from a spool file, without holding the branch's rows in memory
+def load_spooled_branch(spool, name, timestamp, table):
+    file_name = f"{name}_{timestamp}"
+    spool.close()
+    if not load_file_to_staging(spool, file_name):
+        return False
+    if spool.source_format == "PARQUET":
+        schema = warehouse_schema(table)
     else:
-        logging.info("⚠️ No new columns to add.")
-
-# Function to upsert data into BigQuery
-def upsert_data_in_bq(project_id, staging_dataset_id, staging_table, prod_dataset_id, prod_table, key_columns):
-    client = bigquery.Client()
-
-    prod_table_id = f"{project_id}.{prod_dataset_id}.{prod_table}"
-    staging_table_id = f"{project_id}.{staging_dataset_id}.{staging_table}"
-
-    # Check if the production table exists
-    tables = [table.table_id for table in client.list_tables(prod_dataset_id)]
-
-    if prod_table not in tables:
-        logging.info(f"⚠️ Production table `{prod_table}` does not exist. Creating it...")
-        try: 
-            query = f"""
-                CREATE TABLE `{prod_table_id}`
-                PARTITION BY DATE(gameDate)
-                CLUSTER BY gameId
-                AS
-                SELECT * FROM `{staging_table_id}`
-                WHERE 1=0;
-            """
-            query_job = client.query(query=query)
-            query_job.result()
-            logging.info(f"✅ Created production table `{prod_table_id}`.")
+        schema = get_schema(spool.sample)
+    return load_and_merge(file_name, schema, name, spool.source_format)
+
+# Function to yield items from an asyncio queue until the None sentinel arrives
+async def drain(queue):
+    while (item := await queue.get()) is not None:
+        yield item
+
+# Roster stage: fetch all rosters concurrently and route each player id to its branch queue as soon as the roster arrives.
+# Roster attributes are kept in roster_lookup (player id -> record) for joining onto game logs.
+async def roster_stage(engine, teams, season_id, queues, roster_lookup):
+    async def fetch_roster(team_abbr):
+        try:
+            return normalize_roster(await engine.roster(team_abbr, season_id), team_abbr)
         except Exception as e:
-            logging.error(f"❌ Error creating a table in BigQuery: {e}")
+            logging.error(f"❌ Failed to fetch roster for team {team_abbr}: {e}")
+            return pd.DataFrame()
 
-    # Sync schema in case new columns added
-    sync_table_schema(project_id, prod_dataset_id, prod_table, staging_dataset_id, staging_table)
+    rosters = 0
+    try:
+        with run_metrics.span("roster_fetch"):
+            for next_roster in asyncio.as_completed([fetch_roster(team) for team in teams]):
+                df = await next_roster
+                if df.empty:
+                    run_metrics.count("empty_rosters")
+                    continue
+                rosters += 1
+                for record in df.to_dict("records"):
+                    if record["id"] not in roster_lookup:
+                        roster_lookup[record["id"]] = record
+                        await queues["goalies" if record["positionCode"] == "G" else "skaters"].put(record["id"])
+        logging.info(f"✅ Fetched {rosters} rosters with {len(roster_lookup)} players")
+    finally:
+        for queue in queues.values():
+            await queue.put(None)
+
+# Game-log stage for one branch: fetch logs as player ids arrive, join roster attributes and load the result.
+# With an IngestState only rows past each player's watermark are staged and checkpointed.
+# In streaming mode rows are joined and appended to a spool file in batches instead of being held until the end.
+async def game_log_stage(engine, player_ids, season_id, game_type, name, table, roster_lookup, timestamp,
+                         state=None, streaming=False, staging_format="csv"):
+    if state:
+        run_id = state.start_run(name, season_id, game_type)
+        watermarks = state.watermarks(season_id, game_type)
+        completed = state.completed_players(run_id)
+        player_ids = (player_id async for player_id in player_ids if player_id not in completed)
+    spool = None
+    if streaming and staging_format == "parquet":
+        spool = ParquetSpool(Path(STAGING_DIR) / f"{name}_{timestamp}.parquet", table)
+    elif streaming:
+        spool = CsvSpool(Path(STAGING_DIR) / f"{name}_{timestamp}.csv", table)
+
+    # Raw records are normalized in batches of about STREAM_BATCH_ROWS rows rather than one frame per player
+    raw_batch = []
+    batch_rows = 0
+    game_logs_list = []
+    failed_players = []
 
-    staging_schema = client.get_table(staging_table_id).schema
-    non_key_columns = [col.name for col in staging_schema if col.name not in key_columns]
+    def flush_batch():
+        try:
+            with run_metrics.span("normalize"):
+                df = normalize_game_logs(raw_batch, season_id)
+        except Exception as e:
+            failed_players.extend(player_id for player_id, _ in raw_batch)
+            logging.error(f"❌ Failed to normalize game logs for {len(raw_batch)} players: {e}")
+            return
+        if spool:
+            with run_metrics.span("join_roster"):
+                df = join_roster(df, roster_lookup)
+            with run_metrics.span("spool_write"):
+                spool.append(df)
+        elif not df.empty:
+            game_logs_list.append(df)
+
+    with run_metrics.span(f"{table}_game_log_fetch"):
+        async for player_id, data in engine.stream_game_logs(player_ids, season_id, game_type):
+            if data is None:
+                failed_players.append(player_id)
+                continue
+            run_metrics.count("game_log_rows", len(data), table=table)
+            if not data:
+                # The API answers 200 with an empty log for players who did not play
+                run_metrics.count("empty_game_logs", table=table)
+            if state:
+                try:
+                    watermark = watermarks.get(player_id)
+                    with run_metrics.span("normalize"):
+                        df = new_rows_since(normalize_game_logs([(player_id, data)], season_id), watermark)
+                    state.stage(run_id, player_id, df, watermark)
+                except Exception as e:
+                    failed_players.append(player_id)
+                    logging.error(f"❌ An error occurred for player {player_id}: {e}")
+                continue
+            raw_batch.append((player_id, data))
+            batch_rows += len(data)
+            if batch_rows >= STREAM_BATCH_ROWS:
+                flush_batch()
+                raw_batch, batch_rows = [], 0
+    if raw_batch:
+        flush_batch()
+    if failed_players:
+        run_metrics.count("failed_players", len(failed_players), table=table)
+        logging.error(f"❌ Missing game logs for {len(failed_players)} {name} players: {failed_players}")
+
+    if state and spool:
+        batches = state.iter_staged_rows(run_id, KEY_COLUMNS, STREAM_BATCH_ROWS)
+    elif state:
+        batches = [state.staged_rows(run_id, KEY_COLUMNS)]
+    elif spool:
+        batches = []
+    else:
+        batches = [pd.concat(game_logs_list, ignore_index=True)] if game_logs_list else []
+
+    # Join game logs data with player attributes from the roster lookup
+    if spool:
+        for df in batches:
+            with run_metrics.span("join_roster"):
+                df = join_roster(df, roster_lookup)
+            with run_metrics.span("spool_write"):
+                spool.append(df)
+        has_rows = spool.rows > 0
+        run_metrics.count("staged_rows", spool.rows, table=table)
+    else:
+        with run_metrics.span("join_roster"):
+            df_performance = join_roster(batches[0], roster_lookup) if batches else pd.DataFrame()
+        has_rows = not df_performance.empty
+        run_metrics.count("staged_rows", len(df_performance), table=table)
+
+    if not has_rows:
+        logging.info(f"⚠️ No new games for {name}")
+        loaded = True
+    elif spool:
+        # GCS/BigQuery calls block, so run them in a thread and let the other branch keep fetching or loading
+        loaded = await asyncio.to_thread(load_spooled_branch, spool, name, timestamp, table)
+    else:
+        loaded = await asyncio.to_thread(load_branch, df_performance, name, timestamp, table, staging_format)
 
+    if spool and loaded:
+        spool.remove()
+    if state:
+        if loaded:
+            state.finish_run(run_id)
+        else:
+            logging.error(f"❌ Run {run_id} for {name} left open; rerun to resume from its checkpoints")
+    return loaded
+
+# Function to run the roster stage and both game-log branches concurrently
+async def run_pipeline(teams, season_id, game_type, timestamp, state=None, max_workers=10, controller=None,
+                       streaming=False, staging_format=STAGING_FORMAT, cache=None):
+    controller = controller or rate_controller
+    cache = cache or get_response_cache()
+    queues = {"skaters": asyncio.Queue(), "goalies": asyncio.Queue()}
+    roster_lookup = {}
+    async with NHLFetchEngine(max_concurrency=max_workers, controller=controller, cache=cache,
+                              metrics=run_metrics) as engine:
+        results = await asyncio.gather(
+            roster_stage(engine, teams, season_id, queues, roster_lookup),
+            game_log_stage(engine, drain(queues["skaters"]), season_id, game_type, SKATERS_FILE_NAME, "skaters",
+                           roster_lookup, timestamp, state, streaming, staging_format),
+            game_log_stage(engine, drain(queues["goalies"]), season_id, game_type, GOALIE_FILE_NAME, "goalies",
+                           roster_lookup, timestamp, state, streaming, staging_format))
+    return all(results[1:])
+
+# Function to finish the run's metrics and write the JSON run report and the Prometheus textfile
+def write_run_metrics(timestamp, success):
+    run_metrics.finish(success)
+    report_path = os.path.join(METRICS_DIR, f"run_report_{timestamp}.json")
     try:
-        merge_query = f"""
-            MERGE `{prod_table_id}` T
-            USING `{staging_table_id}` S
-            ON {" AND ".join([f"T.{col} = S.{col}" for col in key_columns])}
-            WHEN MATCHED THEN
-            UPDATE SET
-                {", ".join([f"T.{col} = S.{col}" for col in non_key_columns]) if non_key_columns else ""}
-            WHEN NOT MATCHED THEN
-            INSERT ({", ".join([col.name for col in staging_schema])})
-            VALUES ({", ".join([f"S.{col.name}" for col in staging_schema])});
-        """
-
-        print("Executing MERGE query...")
-        merge_job = client.query(query=merge_query)
-        merge_job.result()
-        logging.info(f"✅ Data upserted into `{prod_table_id}`.")
+        run_metrics.write(report_path, PROMETHEUS_TEXTFILE)
+        logging.info(f"✅ Wrote run report to {report_path}")
     except Exception as e:
-        logging.error(f"❌ Error upserting date into a table in BigQuery: {e}")
+        logging.error(f"❌ Failed to write run metrics: {e}")
 
-def main():
+def main(incremental=False, streaming=False, staging_format=STAGING_FORMAT, trace_memory=False):
     logging.info("🚀 Starting NHL data pipeline")
+    run_metrics.start(trace_memory)
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
     teams = get_team_info()
     
     if not teams:
         logging.error("❌ No teams retrieved. Aborting.")
+        write_run_metrics(timestamp, False)
         return
 
-    # Fetch team rosters and combine them
-    rosters = [get_team_roster(team, SEASON_ID) for team in teams]
-    df_team_roster_combined = pd.concat(rosters)
-
-    # Save player ids as lists
-    skater_ids = df_team_roster_combined.loc[df_team_roster_combined['positionCode'] != "G"]['id'].to_list()
-    goalie_ids = df_team_roster_combined.loc[df_team_roster_combined['positionCode'] == "G"]['id'].to_list()
+    # Stage only games past each player's watermark; watermarks advance once the merge succeeds
+    state = IngestState(CACHE_DB_FILE, STAGING_DIR) if incremental else None
+    success = asyncio.run(run_pipeline(teams, SEASON_ID, REGULAR_SEASON, timestamp, state, streaming=streaming, staging_format=staging_format))
+    if state:
+        state.close()
 
-    # Fetch combined game logs for all players
-    df_game_logs_skaters = get_combined_game_logs(skater_ids, SEASON_ID, REGULAR_SEASON)
-    df_game_logs_goalies = get_combined_game_logs(goalie_ids, SEASON_ID, REGULAR_SEASON)
-
-    # Join game logs data with player attributes from the team roster dataframe.
-    df_skaters_performance = df_game_logs_skaters.merge(df_team_roster_combined, how="left", left_on="playerId", right_on="id")
-    df_goalies_performance = df_game_logs_goalies.merge(df_team_roster_combined, how="left", left_on="playerId", right_on="id")
-
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
-    for df, name in [(df_skaters_performance, SKATERS_FILE_NAME), (df_goalies_performance, GOALIE_FILE_NAME)]:
-        file_name = f"{name}_{timestamp}"
-        prod_table = f"{name}"
-        load_data_to_gcs(GCS_BUCKET_NAME, df, file_name)
-        schema = get_schema(df)
-        load_data_to_bq(
-            GCS_BUCKET_NAME, 
-            GCP_PROJECT_ID, 
-            STAGING_DATASET_ID, 
-            schema, 
-            file_name)
-        upsert_data_in_bq(
-            GCP_PROJECT_ID, 
-            STAGING_DATASET_ID, 
-            file_name, 
-            PROD_DATASET_ID, 
-            prod_table,
-            ["gameDate", "gameId", "playerId"])
+    cache = get_response_cache()
+    if cache:
+        logging.info(
+            f"✅ Response cache: {cache.hits} fresh hits, {cache.revalidated} revalidated, {cache.stored} fetched")
+    write_run_metrics(timestamp, success)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="NHL game logs pipeline")
+    parser.add_argument("--incremental", action="store_true", help="only load games newer than each player's watermark")
+    parser.add_argument("--streaming", action="store_true", help="join and spool game logs in batches to keep memory flat")
+    parser.add_argument("--staging-format", choices=["csv", "parquet"], default=STAGING_FORMAT)
+    parser.add_argument("--trace-memory", action="store_true", help="record tracemalloc peaks in the run report")
+    args = parser.parse_args()
+    main(incremental=args.incremental, streaming=args.streaming, staging_format=args.staging_format,
+         trace_memory=args.trace_memory)
@@ -0,0 +1,172 @@
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+# Upper bounds (seconds) of the API latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+PROMETHEUS_PREFIX = "nhl_pipeline"
+
+
+# Function to get a percentile from a sorted list of values
+def percentile(values, q):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# Function to write a file atomically so scrapers never read a half-written report
+def write_atomic(path, text):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+# Function to format Prometheus labels
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+# Timing spans, API latency histograms and counters for one pipeline run.
+# Spans and counters may be recorded from the event loop and from loader threads at the same time.
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started_at = None
+        self.started = None
+        self.duration = None
+        self.success = None
+        self.trace_memory = False
+        self.stages = {}
+        self.latencies = defaultdict(list)
+        self.counters = defaultdict(float)
+        self.peak_traced_bytes = None
+
+    # Function to start a run; with trace_memory, tracemalloc peaks are recorded per stage
+    def start(self, trace_memory=False):
+        self.reset()
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.started = time.perf_counter()
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def finish(self, success):
+        self.duration = time.perf_counter() - self.started if self.started is not None else None
+        self.success = success
+        if self.trace_memory:
+            self.peak_traced_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    # Context manager timing a stage; repeated or concurrent spans of the same stage are summed
+    @contextlib.contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            # Stages overlap, so this is the run's high-water mark when the stage ended, not the stage's own peak
+            peak = tracemalloc.get_traced_memory()[1] if self.trace_memory and tracemalloc.is_tracing() else None
+            with self.lock:
+                stats = self.stages.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+                stats["count"] += 1
+                stats["total_seconds"] += elapsed
+                stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+                if peak is not None:
+                    stats["peak_traced_bytes"] = max(stats.get("peak_traced_bytes", 0), peak)
+
+    def observe_latency(self, endpoint, seconds):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+
+    # Function to add to a counter such as rows, bytes, retries or empty responses, with optional labels
+    def count(self, name, value=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    # Function to build the JSON run report
+    def report(self):
+        with self.lock:
+            latency = {}
+            for endpoint, values in self.latencies.items():
+                values = sorted(values)
+                latency[endpoint] = {
+                    "count": len(values),
+                    "p50": percentile(values, 0.5),
+                    "p90": percentile(values, 0.9),
+                    "p99": percentile(values, 0.99),
+                    "max": values[-1],
+                }
+            report = {
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "duration_seconds": self.duration,
+                "success": self.success,
+                "stages": {stage: dict(stats) for stage, stats in self.stages.items()},
+                "api_latency_seconds": latency,
+                "counters": [
+                    {"name": name, **dict(labels), "value": value} for (name, labels), value in self.counters.items()],
+            }
+            if self.trace_memory:
+                report["peak_traced_bytes"] = self.peak_traced_bytes
+            return report
+
+    # Function to render the run in the Prometheus text exposition format, for the node exporter's textfile collector
+    def prometheus(self):
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{PROMETHEUS_PREFIX}_{name}{suffix}{format_labels(labels)} {value}")
+
+        with self.lock:
+            if self.started_at:
+                metric("last_run_timestamp_seconds", "gauge", "Start time of the last run",
+                       [("", [], self.started_at.timestamp())])
+            if self.success is not None:
+                metric("last_run_success", "gauge", "Whether the last run loaded every branch",
+                       [("", [], int(self.success))])
+            if self.duration is not None:
+                metric("last_run_duration_seconds", "gauge", "Wall time of the last run", [("", [], self.duration)])
+            metric("stage_seconds", "gauge", "Wall time spent in each stage during the last run",
+                   [("", [("stage", stage)], stats["total_seconds"]) for stage, stats in self.stages.items()])
+
+            samples = []
+            for endpoint, values in self.latencies.items():
+                for bucket in LATENCY_BUCKETS:
+                    samples.append(("_bucket", [("endpoint", endpoint), ("le", bucket)],
+                                    sum(value <= bucket for value in values)))
+                samples.append(("_bucket", [("endpoint", endpoint), ("le", "+Inf")], len(values)))
+                samples.append(("_sum", [("endpoint", endpoint)], sum(values)))
+                samples.append(("_count", [("endpoint", endpoint)], len(values)))
+            metric("api_request_duration_seconds", "histogram", "NHL API request latency during the last run", samples)
+
+            counters = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                counters[name].append(("", list(labels), value))
+            for name, samples in counters.items():
+                metric(name, "gauge", f"{name.replace('_', ' ').capitalize()} during the last run", samples)
+            if self.peak_traced_bytes is not None:
+                metric("peak_traced_bytes", "gauge", "Peak memory traced by tracemalloc during the last run",
+                       [("", [], self.peak_traced_bytes)])
+        return "\n".join(lines) + "\n"
+
+    # Function to write the JSON report and the Prometheus textfile
+    def write(self, report_path, prometheus_path):
+        write_atomic(report_path, json.dumps(self.report(), indent=2, default=str))
+        write_atomic(prometheus_path, self.prometheus())
@@ -0,0 +1,69 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from schemas import TABLE_SCHEMAS
+
+LOCALIZED_ROSTER_COLUMNS = ["firstName", "lastName", "birthCity", "birthStateProvince"]
+DROPPED_ROSTER_COLUMNS = ["heightInInches", "weightInPounds", "birthCity", "birthStateProvince"]
+DROPPED_GAME_LOG_COLUMNS = ["commonName", "opponentCommonName"]
+
+# Declared dtypes of both tables, used to downcast whichever of those columns a frame has
+COMPACT_DTYPES = {col: dtype for columns in TABLE_SCHEMAS.values() for col, (dtype, _) in columns.items()}
+
+
+# Function to replace localized {"default": ..., "cs": ...} fields with their default (English) value.
+# Expects a frame from json_normalize, where those fields arrive as "<column>.<language>" columns.
+def flatten_localized(df, columns, key="default"):
+    for col in columns:
+        nested = f"{col}.{key}"
+        if nested in df.columns:
+            # Records that carried a plain string stay in the un-nested column
+            df[col] = df[nested].fillna(df[col]) if col in df.columns else df[nested]
+    return df.drop(columns=[col for col in df.columns if "." in col])
+
+
+# Function to downcast known columns to their declared compact dtypes
+def downcast(df):
+    return df.astype({col: dtype for col, dtype in COMPACT_DTYPES.items() if col in df.columns})
+
+
+# Function to convert "mm:ss" or "hh:mm:ss" time on ice strings to seconds without a per-row lambda
+def parse_toi(toi):
+    parts = toi.str.split(":", expand=True).apply(pd.to_numeric, errors="coerce")
+    seconds = parts[0] * 60 + parts[1]
+    if parts.shape[1] > 2:
+        seconds = seconds.where(parts[2].isna(), parts[0] * 60 * 60 + parts[1] * 60 + parts[2])
+    return seconds.astype("Int32")
+
+
+# Function to turn a team's raw roster records into a typed frame
+def normalize_roster(records, team_abbr):
+    if not records:
+        return pd.DataFrame()
+    df = flatten_localized(pd.json_normalize(records, max_level=1), LOCALIZED_ROSTER_COLUMNS)
+    # Add a column for the current team a player is signed to
+    df["currentTeam"] = team_abbr
+    df = df.drop(columns=DROPPED_ROSTER_COLUMNS, errors="ignore")
+    return downcast(df)
+
+
+# Function to turn a batch of [(player_id, raw game log records)] into one typed frame
+def normalize_game_logs(batch, season_id):
+    counts = [len(records) for _, records in batch]
+    records = list(itertools.chain.from_iterable(records for _, records in batch))
+    if not records:
+        return pd.DataFrame()
+    df = pd.json_normalize(records, max_level=1)
+    df = df.drop(columns=[col for col in df.columns if col.split(".")[0] in DROPPED_GAME_LOG_COLUMNS])
+    df = df.drop(columns=[col for col in df.columns if "." in col])
+
+    df["gameDate"] = pd.to_datetime(df["gameDate"], format="%Y-%m-%d")
+    df["toiInSeconds"] = parse_toi(df["toi"])
+    df = df.drop(columns=["toi"])
+
+    # Append player and season ids
+    df["playerId"] = np.repeat([player_id for player_id, _ in batch], counts)
+    df["seasonId"] = season_id
+    return downcast(df)
@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import email.utils
+import logging
+import multiprocessing
+import random
+import time
+
+# Status codes worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# Non-blocking token bucket: callers that run out of tokens await their slot instead of sleeping a thread
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.last_decrease = 0.0
+        # Only one event loop uses this bucket, so the controller's rate changes need no lock
+        self.lock = contextlib.nullcontext()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Reserve a token up front (the balance may go negative) and wait off the debt,
+        # so concurrent callers are spaced out at exactly `rate` per second
+        self._refill()
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    # Function to hold back every caller for the given number of seconds (e.g. after a Retry-After)
+    def pause(self, seconds):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+# Token bucket kept in shared memory so several worker processes draw from one global rate budget. The time of
+# the last rate decrease is shared too, so a burst of 429s seen by every worker lowers the rate only once.
+class SharedTokenBucket:
+    def __init__(self, rate, capacity=None, ctx=multiprocessing):
+        capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._rate = ctx.Value("d", float(rate), lock=False)
+        self._capacity = ctx.Value("d", capacity, lock=False)
+        self._tokens = ctx.Value("d", capacity, lock=False)
+        self._updated = ctx.Value("d", time.monotonic(), lock=False)
+        self._last_decrease = ctx.Value("d", 0.0, lock=False)
+        self.lock = ctx.Lock()
+
+    @property
+    def rate(self):
+        return self._rate.value
+
+    @rate.setter
+    def rate(self, value):
+        self._rate.value = value
+
+    @property
+    def capacity(self):
+        return self._capacity.value
+
+    @capacity.setter
+    def capacity(self, value):
+        self._capacity.value = value
+
+    @property
+    def last_decrease(self):
+        return self._last_decrease.value
+
+    @last_decrease.setter
+    def last_decrease(self, value):
+        self._last_decrease.value = value
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated.value
+        self._tokens.value = min(self._capacity.value, self._tokens.value + elapsed * self._rate.value)
+        self._updated.value = now
+
+    async def acquire(self):
+        # Same reservation scheme as TokenBucket; the lock is only held for the bookkeeping, never while waiting
+        with self.lock:
+            self._refill()
+            self._tokens.value -= 1
+            debt = -self._tokens.value
+        if debt > 0:
+            await asyncio.sleep(debt / self.rate)
+
+    def pause(self, seconds):
+        with self.lock:
+            self._refill()
+            self._tokens.value = min(self._tokens.value, 0.0) - seconds * self._rate.value
+
+
+# Raised when a request still fails after all retries
+class FetchError(Exception):
+    def __init__(self, path, message, status_code=None):
+        super().__init__(f"{path}: {message}")
+        self.path = path
+        self.status_code = status_code
+
+
+# Function to parse a Retry-After header given either as seconds or as an HTTP date
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Jittered exponential backoff ("full jitter") with an optional server-provided floor
+class RetryPolicy:
+    def __init__(self, max_retries=5, base_delay=0.5, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+# AIMD controller that owns the token bucket and moves its rate with observed 429s and latency
+class AdaptiveRateController:
+    def __init__(self, initial_rate=5, min_rate=1, max_rate=50, increase_step=0.5,
+                 decrease_factor=0.5, latency_target=2.0, limiter=None):
+        # Pass a SharedTokenBucket as limiter to apply the controller to a budget shared across processes
+        self.limiter = limiter or TokenBucket(initial_rate, capacity=max(1, initial_rate))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.throttled = 0
+
+    @property
+    def rate(self):
+        return self.limiter.rate
+
+    def _set_rate(self, rate):
+        self.limiter.rate = min(self.max_rate, max(self.min_rate, rate))
+        self.limiter.capacity = max(1.0, self.limiter.rate)
+
+    # Additive increase: roughly +increase_step calls/sec for every `rate` successful calls
+    def on_success(self, latency):
+        if latency > self.latency_target:
+            self._decrease(f"latency {latency:.2f}s above target")
+        else:
+            with self.limiter.lock:
+                self._set_rate(self.rate + self.increase_step / self.rate)
+
+    # Multiplicative decrease on throttling; Retry-After pauses every caller sharing the bucket
+    def on_throttle(self, retry_after=None):
+        self.throttled += 1
+        self._decrease("HTTP 429")
+        if retry_after:
+            self.limiter.pause(retry_after)
+
+    def _decrease(self, reason):
+        # Concurrent requests, in this process or in others sharing the bucket, report the same congestion;
+        # back off at most once per cooldown. The check and the decrease happen under the bucket's lock.
+        with self.limiter.lock:
+            now = time.monotonic()
+            if self.rate <= self.min_rate or now - self.limiter.last_decrease < max(1.0, 1 / self.rate):
+                return
+            self.limiter.last_decrease = now
+            old_rate = self.rate
+            self._set_rate(self.rate * self.decrease_factor)
+        logging.warning(f"⚠️ Lowering NHL API rate {old_rate:.2f} -> {self.rate:.2f} calls/sec ({reason})")
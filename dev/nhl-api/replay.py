@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from fetch_engine import NHLFetchEngine
+from normalize import normalize_roster
+
+FIXTURES_DIR = "fixtures"
+FIXTURES_INDEX = "index.json" # What was recorded: date, season, game type, teams and players
+
+
+# Fetch engine that also writes every successful response body to the fixtures directory, keyed by request path
+class RecordingEngine(NHLFetchEngine):
+    def __init__(self, fixtures_dir=FIXTURES_DIR, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures_dir = Path(fixtures_dir)
+
+    async def request(self, path, headers=None, endpoint=None):
+        response = await super().request(path, headers, endpoint)
+        fixture = fixture_path(self.fixtures_dir, path)
+        fixture.parent.mkdir(parents=True, exist_ok=True)
+        fixture.write_bytes(response.content)
+        return response
+
+
+# Function to map a request path such as /roster/TOR/20242025 to its fixture file
+def fixture_path(fixtures_dir, path):
+    return Path(fixtures_dir) / f"{path.strip('/')}.json"
+
+
+# Function to load the fixtures index written by record()
+def load_index(fixtures_dir=FIXTURES_DIR):
+    with open(Path(fixtures_dir) / FIXTURES_INDEX) as f:
+        return json.load(f)
+
+
+# Function to record standings, rosters and game logs from the live API; max_players caps the game-log calls
+async def record(fixtures_dir, date, season_id, game_type, max_players=None, api_calls_per_second=5):
+    async with RecordingEngine(fixtures_dir, api_calls_per_second=api_calls_per_second) as engine:
+        teams = await engine.teams(date)
+        players = []
+        for team_abbr in teams:
+            roster = normalize_roster(await engine.roster(team_abbr, season_id), team_abbr)
+            if not roster.empty:
+                players.extend(int(player_id) for player_id in roster["id"])
+        # Traded players can show up on more than one roster
+        players = list(dict.fromkeys(players))[:max_players]
+        async for _ in engine.stream_game_logs(players, season_id, game_type):
+            pass
+
+    index = {"date": date, "season_id": season_id, "game_type": game_type, "teams": teams, "players": players}
+    with open(Path(fixtures_dir) / FIXTURES_INDEX, "w") as f:
+        json.dump(index, f, indent=2)
+    logging.info(f"✅ Recorded {len(teams)} rosters and {len(players)} game logs to {fixtures_dir}")
+    return index
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real API
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        if server.latency or server.jitter:
+            time.sleep(server.latency + random.uniform(0, server.jitter))
+
+        roll = random.random()
+        if roll < server.throttle_rate:
+            server.count("throttled")
+            self.reply(429, b"", {"Retry-After": str(server.retry_after)})
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            server.count("errors")
+            self.reply(503, b"")
+            return
+
+        fixture = fixture_path(server.fixtures_dir, self.path.split("?")[0])
+        if not fixture.is_file():
+            server.count("missing")
+            self.reply(404, b"")
+            return
+        self.reply(200, fixture.read_bytes(), {"Content-Type": "application/json"})
+
+    def reply(self, status, body, headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Stand-in for the NHL web API that serves recorded fixtures, with injected latency, 5xx errors and 429s.
+# Point the pipeline at it through NHL_API_BASE_URL (see base_url).
+class ReplayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        super().__init__((host, port), ReplayHandler)
+        self.fixtures_dir = Path(fixtures_dir)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.stats = {"requests": 0, "throttled": 0, "errors": 0, "missing": 0}
+        self.stats_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    # Function to serve from a background thread, for benchmarks running in the same process
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%m/%d/%Y %I:%M:%S %p",
+        level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Record NHL API fixtures or replay them from a local server")
+    parser.add_argument("--fixtures-dir", default=FIXTURES_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record responses from the live API")
+    record_parser.add_argument("--date", default=datetime.date.today().isoformat())
+    record_parser.add_argument("--season-id", default="20242025")
+    record_parser.add_argument("--game-type", type=int, default=2)
+    record_parser.add_argument("--max-players", type=int, help="only record game logs for the first N players")
+    record_parser.add_argument("--calls-per-second", type=float, default=5)
+
+    serve_parser = commands.add_parser("serve", help="serve recorded responses")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    serve_parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    serve_parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    serve_parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    serve_parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        asyncio.run(record(args.fixtures_dir, args.date, args.season_id, args.game_type, args.max_players,
+                           args.calls_per_second))
+    else:
+        server = ReplayServer(args.fixtures_dir, args.host, args.port, args.latency, args.jitter,
+                              args.error_rate, args.throttle_rate, args.retry_after)
+        logging.info(f"🚀 Replaying {args.fixtures_dir} at {server.base_url} (set NHL_API_BASE_URL to use it)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        server.server_close()
@@ -0,0 +1,128 @@
+import json
+import logging
+import sqlite3
+import time
+import zlib
+
+# How long a cached payload is served without asking the API again, per endpoint (seconds)
+DEFAULT_TTLS = {
+    "standings": 6 * 60 * 60,
+    "standings_season": 24 * 60 * 60,
+    "roster": 24 * 60 * 60,
+    "player_game_log": 60 * 60,
+}
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Seconds last_accessed may lag behind: a hit only writes it when it is older than this, so warm runs read
+# without writing and LRU order is kept to the minute
+ACCESS_RESOLUTION = 60
+
+
+# Cached payload plus the validators needed for a conditional request
+class CacheEntry:
+    def __init__(self, key, data, etag, last_modified, fresh):
+        self.key = key
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh = fresh
+
+    # Function to build If-None-Match / If-Modified-Since headers for revalidating a stale entry
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+# Size-bounded, SQLite-backed LRU cache of API responses keyed by endpoint and params
+class ResponseCache:
+    def __init__(self, db_file="nhl_cache.db", ttls=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.stored = 0
+        self.con = sqlite3.connect(db_file, isolation_level=None, timeout=30)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT,
+                body BLOB,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                last_accessed REAL,
+                size INTEGER
+            )""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache (last_accessed)")
+        # Lets size() sum the sizes without reading past the bodies
+        self.con.execute("CREATE INDEX IF NOT EXISTS response_cache_size ON response_cache (size)")
+
+    # Function to build a stable cache key from an endpoint name and its params
+    @staticmethod
+    def make_key(endpoint, params):
+        return f"{endpoint}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    # Function to look up a cached response; returns None on a miss
+    def get(self, endpoint, params):
+        key = self.make_key(endpoint, params)
+        row = self.con.execute(
+            "SELECT body, etag, last_modified, fetched_at, last_accessed FROM response_cache WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at, last_accessed = row
+        now = time.time()
+        if now - last_accessed >= ACCESS_RESOLUTION:
+            self.con.execute("UPDATE response_cache SET last_accessed = ? WHERE key = ?", (now, key))
+        fresh = now - fetched_at < self.ttls.get(endpoint, 0)
+        if fresh:
+            self.hits += 1
+        return CacheEntry(key, json.loads(zlib.decompress(body)), etag, last_modified, fresh)
+
+    # Function to store a response body (raw bytes) together with its validators
+    def put(self, endpoint, params, content, etag=None, last_modified=None):
+        key = self.make_key(endpoint, params)
+        body = zlib.compress(content)
+        now = time.time()
+        self.con.execute(
+            "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, endpoint, body, etag, last_modified, now, now, len(body)))
+        self.stored += 1
+        if self.size() > self.max_bytes:
+            self.evict()
+
+    # Function to get the compressed size of every cached body; read from the table rather than counted
+    # per process, since backfill workers share the cache file
+    def size(self):
+        return self.con.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+
+    # Function to mark a stale entry fresh again after the API answered 304 Not Modified
+    def revalidate(self, entry):
+        self.revalidated += 1
+        now = time.time()
+        self.con.execute(
+            "UPDATE response_cache SET fetched_at = ?, last_accessed = ? WHERE key = ?", (now, now, entry.key))
+
+    # Function to drop least recently used entries until the cache is back under 90% of max_bytes
+    def evict(self):
+        target = self.max_bytes * 0.9
+        evicted = 0
+        # The write lock is taken before the size is read, so two processes don't both evict for the same excess
+        self.con.execute("BEGIN IMMEDIATE")
+        total_bytes = self.size()
+        rows = self.con.execute("SELECT key, size FROM response_cache ORDER BY last_accessed").fetchall()
+        for key, size in rows:
+            if total_bytes <= target:
+                break
+            self.con.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            total_bytes -= size
+            evicted += 1
+        self.con.execute("COMMIT")
+        logging.info(f"⚠️ Evicted {evicted} entries from the response cache")
+
+    def close(self):
+        self.con.close()
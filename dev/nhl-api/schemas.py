@@ -0,0 +1,94 @@
+import logging
+
+import pandas as pd
+
+# Declared column contract for the game logs tables: column -> (pandas dtype, BigQuery type).
+# Low-cardinality strings are categoricals and counters are small nullable ints, so the staged
+# frames stay compact in memory and Parquet files carry real types instead of text.
+GAME_COLUMNS = {
+    "gameId": ("Int64", "INT64"),
+    "teamAbbrev": ("category", "STRING"),
+    "homeRoadFlag": ("category", "STRING"),
+    "gameDate": ("datetime64[ns]", "DATETIME"),
+    "goals": ("Int16", "INT64"),
+    "assists": ("Int16", "INT64"),
+}
+
+SKATER_STATS_COLUMNS = {
+    "points": ("Int16", "INT64"),
+    "plusMinus": ("Int16", "INT64"),
+    "powerPlayGoals": ("Int16", "INT64"),
+    "powerPlayPoints": ("Int16", "INT64"),
+    "gameWinningGoals": ("Int16", "INT64"),
+    "otGoals": ("Int16", "INT64"),
+    "shots": ("Int16", "INT64"),
+    "shifts": ("Int16", "INT64"),
+    "shorthandedGoals": ("Int16", "INT64"),
+    "shorthandedPoints": ("Int16", "INT64"),
+}
+
+GOALIE_STATS_COLUMNS = {
+    "gamesStarted": ("Int16", "INT64"),
+    "decision": ("category", "STRING"),
+    "shotsAgainst": ("Int16", "INT64"),
+    "goalsAgainst": ("Int16", "INT64"),
+    "savePctg": ("float32", "FLOAT"),
+    "shutouts": ("Int16", "INT64"),
+}
+
+GAME_TRAILING_COLUMNS = {
+    "opponentAbbrev": ("category", "STRING"),
+    "pim": ("Int16", "INT64"),
+    "toiInSeconds": ("Int32", "INT64"),
+    "playerId": ("Int32", "INT64"),
+    "seasonId": ("category", "STRING"),
+}
+
+ROSTER_COLUMNS = {
+    "id": ("Int32", "INT64"),
+    "headshot": ("string", "STRING"),
+    "firstName": ("string", "STRING"),
+    "lastName": ("string", "STRING"),
+    "sweaterNumber": ("Int16", "INT64"),
+    "positionCode": ("category", "STRING"),
+    "shootsCatches": ("category", "STRING"),
+    "heightInCentimeters": ("Int16", "INT64"),
+    "weightInKilograms": ("Int16", "INT64"),
+    "birthDate": ("string", "STRING"),
+    "birthCountry": ("category", "STRING"),
+    "currentTeam": ("category", "STRING"),
+}
+
+TABLE_SCHEMAS = {
+    "skaters": {**GAME_COLUMNS, **SKATER_STATS_COLUMNS, **GAME_TRAILING_COLUMNS, **ROSTER_COLUMNS},
+    "goalies": {**GAME_COLUMNS, **GOALIE_STATS_COLUMNS, **GAME_TRAILING_COLUMNS, **ROSTER_COLUMNS},
+}
+
+
+# Function to get [(column, BigQuery type)] for a table
+def warehouse_schema(table):
+    return [(col, field_type) for col, (_, field_type) in TABLE_SCHEMAS[table].items()]
+
+
+# Function to check that float columns declared as integers hold whole numbers, so the cast to a
+# nullable integer dtype fails with the column's name instead of pandas' generic casting error
+def check_integral(df, dtypes):
+    for col, dtype in dtypes.items():
+        values = df[col]
+        if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_float_dtype(values.dtype):
+            fractional = values.notna() & (values % 1 != 0)
+            if fractional.any():
+                raise ValueError(f"Column {col} is declared as {dtype} but has fractional values such as {values[fractional].iloc[0]}")
+
+
+# Function to conform a frame to a table's contract: declared columns in order, declared dtypes,
+# missing columns as nulls and undeclared columns dropped
+def conform(df, table):
+    columns = TABLE_SCHEMAS[table]
+    extra = [col for col in df.columns if col not in columns]
+    if extra:
+        logging.warning(f"⚠️ Dropping columns not declared for {table}: {extra}")
+    df = df.reindex(columns=list(columns))
+    dtypes = {col: dtype for col, (dtype, _) in columns.items()}
+    check_integral(df, dtypes)
+    return df.astype(dtypes)
@@ -0,0 +1,90 @@
+from pathlib import Path
+
+import pandas as pd
+
+from schemas import conform
+
+
+# Function to join roster attributes onto a batch of game logs through the player-id lookup
+def join_roster(df, roster_lookup):
+    if df.empty:
+        return df
+    players = [roster_lookup[player_id] for player_id in df["playerId"].unique() if player_id in roster_lookup]
+    if not players:
+        return df
+    return df.merge(pd.DataFrame(players), how="left", left_on="playerId", right_on="id")
+
+
+# Append-only CSV spool file; like the Parquet spool, every batch is conformed to the table's declared schema,
+# so later batches can't bring columns the header lacks or change a column's type
+class CsvSpool:
+    source_format = "CSV"
+    content_type = "text/csv"
+
+    def __init__(self, path, table):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        self.table = table
+        self.sample = None # Empty frame with the declared dtypes, used for schema inference
+        self.rows = 0
+
+    def append(self, df):
+        if df.empty:
+            return
+        df = conform(df, self.table)
+        if self.sample is None:
+            self.sample = df.head(0)
+        df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        pass
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+# Append-only Parquet spool file; every batch is conformed to the table's declared schema
+# and written as its own row group
+class ParquetSpool:
+    source_format = "PARQUET"
+    content_type = "application/octet-stream"
+
+    def __init__(self, path, table, compression="snappy"):
+        # pyarrow is only needed when staging as Parquet
+        import pyarrow
+
+        self.pa = pyarrow
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        self.table = table
+        self.compression = compression
+        self.writer = None
+        self.schema = None
+        self.rows = 0
+
+    def append(self, df):
+        if df.empty:
+            return
+        batch = self.pa.Table.from_pandas(conform(df, self.table), preserve_index=False)
+        if self.writer is None:
+            import pyarrow.parquet
+
+            # Categoricals are stored as plain strings; Parquet dictionary-encodes them on its own
+            self.schema = self.pa.schema([
+                field.with_type(field.type.value_type) if self.pa.types.is_dictionary(field.type) else field
+                for field in batch.schema])
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=self.compression)
+        self.writer.write_table(batch.cast(self.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def remove(self):
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,56 @@
+import shutil
+from pathlib import Path
+
+GCS_CHUNK_SIZE = 8 * 1024 * 1024 # Resumable upload chunk size, must be a multiple of 256 KB
+
+
+# Staging store backed by a Google Cloud Storage bucket
+class GCSStagingStore:
+    def __init__(self, bucket_name, chunk_size=GCS_CHUNK_SIZE):
+        self.bucket_name = bucket_name
+        self.chunk_size = chunk_size
+        self.client = None
+
+    def _bucket(self):
+        if self.client is None:
+            # Imported here so the local stand-in works without the Google Cloud libraries
+            from google.cloud import storage
+
+            self.client = storage.Client()
+        return self.client.bucket(self.bucket_name)
+
+    # Function to upload an in-memory payload as a single request
+    def upload_bytes(self, data, object_name, content_type):
+        self._bucket().blob(object_name).upload_from_string(data, content_type)
+
+    # Function to upload a local file with a chunked, resumable upload
+    def upload_file(self, path, object_name, content_type):
+        blob = self._bucket().blob(object_name, chunk_size=self.chunk_size)
+        blob.upload_from_filename(str(path), content_type=content_type)
+
+    def uri(self, object_name):
+        return f"gs://{self.bucket_name}/{object_name}"
+
+    def __str__(self):
+        return f"GCS bucket {self.bucket_name}"
+
+
+# Local filesystem stand-in with the same interface, for running the staging step offline
+class LocalStagingStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def upload_bytes(self, data, object_name, content_type):
+        mode = "wb" if isinstance(data, bytes) else "w"
+        with open(self.root / object_name, mode) as f:
+            f.write(data)
+
+    def upload_file(self, path, object_name, content_type):
+        shutil.copyfile(path, self.root / object_name)
+
+    def uri(self, object_name):
+        return str(self.root / object_name)
+
+    def __str__(self):
+        return f"local staging directory {self.root}"
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import httpx
+
+from fetch_engine import NHLFetchEngine, ordered_stream
+from metrics import RunMetrics
+from rate_control import AdaptiveRateController, FetchError, RetryPolicy
+from response_cache import ResponseCache
+
+
+# Stand-in for the NHL web API: answers each path with the next of its canned (status, body, headers)
+# responses, the last one repeating, and records the requests it got
+class FakeAPI:
+    def __init__(self, responses, delays=None):
+        self.responses = {path: list(answers) for path, answers in responses.items()}
+        self.delays = delays or {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request):
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(request.url.path, 0))
+        finally:
+            self.in_flight -= 1
+        answers = self.responses.get(request.url.path, [(404, {}, {})])
+        status_code, body, headers = answers.pop(0) if len(answers) > 1 else answers[0]
+        return httpx.Response(status_code, json=body, headers=headers)
+
+    def paths(self):
+        return [request.url.path for request in self.requests]
+
+
+# Function to build an engine on a fake API that never waits on its rate limiter or between retries
+def fake_engine(api, **kwargs):
+    return NHLFetchEngine(
+        base_url="https://api.test/v1",
+        controller=AdaptiveRateController(initial_rate=1000, max_rate=1000),
+        retry_policy=RetryPolicy(max_retries=2, base_delay=0),
+        transport=httpx.MockTransport(api),
+        **kwargs)
+
+
+# Function to run a coroutine that uses an engine on a fake API
+def run_engine(api, use, **kwargs):
+    async def main():
+        async with fake_engine(api, **kwargs) as engine:
+            return await use(engine)
+    return asyncio.run(main())
+
+
+class TestOrderedStream(unittest.TestCase):
+    def test_results_keep_input_order_under_concurrency(self):
+        running = []
+        peak = []
+
+        # Later items finish first
+        async def fetch(item):
+            running.append(item)
+            peak.append(len(running))
+            await asyncio.sleep((10 - item) * 0.002)
+            running.remove(item)
+            return item * item
+
+        async def collect(items):
+            return [result async for result in ordered_stream(items, fetch, window_size=4)]
+
+        async def numbers():
+            for item in range(10):
+                yield item
+
+        self.assertEqual(asyncio.run(collect(range(10))), [item * item for item in range(10)])
+        self.assertEqual(max(peak), 4)
+        # Async iterables are streamed the same way
+        self.assertEqual(asyncio.run(collect(numbers())), [item * item for item in range(10)])
+
+    def test_pending_fetches_are_cancelled_when_the_consumer_stops(self):
+        cancelled = []
+
+        async def fetch(item):
+            try:
+                await asyncio.sleep(0 if item == 0 else 10)
+            except asyncio.CancelledError:
+                cancelled.append(item)
+                raise
+            return item
+
+        async def first():
+            stream = ordered_stream(range(5), fetch, window_size=3)
+            result = await anext(stream)
+            await stream.aclose()
+            await asyncio.sleep(0)
+            return result
+
+        self.assertEqual(asyncio.run(first()), 0)
+        self.assertEqual(sorted(cancelled), [1, 2])
+
+
+class TestRequest(unittest.TestCase):
+    def test_non_retryable_status_raises_without_retrying(self):
+        api = FakeAPI({"/v1/roster/TOR/20242025": [(404, {}, {})]})
+        metrics = RunMetrics()
+        with self.assertRaises(FetchError) as raised:
+            run_engine(api, lambda engine: engine.roster("TOR", "20242025"), metrics=metrics)
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assertEqual(api.paths(), ["/v1/roster/TOR/20242025"])
+        self.assertEqual(metrics.counters[("failed_requests", (("endpoint", "roster"),))], 1)
+
+    def test_retryable_statuses_are_retried(self):
+        api = FakeAPI({"/v1/roster/TOR/20242025": [
+            (503, {}, {}), (429, {}, {"Retry-After": "0"}), (200, {"forwards": [{"id": 1}], "goalies": [{"id": 2}]}, {})]})
+        metrics = RunMetrics()
+        engine = fake_engine(api, metrics=metrics)
+
+        async def roster():
+            async with engine:
+                return await engine.roster("TOR", "20242025")
+
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(asyncio.run(roster()), [{"id": 1}, {"id": 2}])
+        self.assertEqual(len(api.requests), 3)
+        self.assertEqual(engine.controller.throttled, 1)
+        self.assertEqual(metrics.counters[("retries", (("endpoint", "roster"),))], 2)
+
+    def test_retries_run_out(self):
+        api = FakeAPI({"/v1/roster/TOR/20242025": [(503, {}, {})]})
+        with self.assertLogs(level="WARNING"), self.assertRaises(FetchError) as raised:
+            run_engine(api, lambda engine: engine.roster("TOR", "20242025"))
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertIn("after 3 attempts", str(raised.exception))
+        self.assertEqual(len(api.requests), 3)
+
+    def test_stale_cache_entry_is_revalidated(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResponseCache(Path(tmp_dir) / "cache.db", ttls={"roster": 0})
+            cache.put("roster", {"team_abbr": "TOR", "season_id": "20242025"},
+                      json.dumps({"forwards": [{"id": 1}]}).encode(), etag='"v1"')
+            api = FakeAPI({"/v1/roster/TOR/20242025": [(304, None, {})]})
+            self.assertEqual(run_engine(api, lambda engine: engine.roster("TOR", "20242025"), cache=cache), [{"id": 1}])
+            self.assertEqual(api.requests[0].headers["If-None-Match"], '"v1"')
+            self.assertEqual(cache.revalidated, 1)
+            cache.close()
+
+
+class TestStreamGameLogs(unittest.TestCase):
+    def test_game_logs_keep_player_order_and_failed_players_give_none(self):
+        players = list(range(8470000, 8470012))
+        path = "/v1/player/{}/game-log/20242025/2"
+        # Earlier players answer slower, so responses come back out of order
+        api = FakeAPI(
+            {path.format(player_id): [(200, {"gameLog": [{"gameId": player_id}]}, {})] for player_id in players[1:]},
+            delays={path.format(player_id): (len(players) - i) * 0.002 for i, player_id in enumerate(players)})
+
+        async def stream(engine):
+            return [result async for result in engine.stream_game_logs(players, "20242025", 2)]
+
+        with self.assertLogs(level="ERROR"):
+            results = run_engine(api, stream, max_concurrency=4)
+        self.assertEqual([player_id for player_id, _ in results], players)
+        self.assertIsNone(results[0][1])
+        self.assertEqual([game_log for _, game_log in results[1:]], [[{"gameId": player_id}] for player_id in players[1:]])
+        self.assertGreater(api.max_in_flight, 1)
+        self.assertLessEqual(api.max_in_flight, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from incremental import IngestState, new_rows_since
+
+KEY_COLUMNS = ["gameDate", "gameId", "playerId"]
+
+
+# Function to build a game-log frame for a player from [(game date, game id, goals)]
+def game_logs(player_id, games):
+    return pd.DataFrame({
+        "gameDate": pd.to_datetime([game_date for game_date, _, _ in games]),
+        "gameId": [game_id for _, game_id, _ in games],
+        "playerId": player_id,
+        "goals": [goals for _, _, goals in games],
+    })
+
+
+class TestIngestState(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_file = Path(self.tmp_dir.name) / "state.db"
+        self.staging_dir = Path(self.tmp_dir.name) / "staging"
+        self.state = self.open_state()
+
+    def tearDown(self):
+        self.state.close()
+        self.tmp_dir.cleanup()
+
+    def open_state(self):
+        return IngestState(self.db_file, self.staging_dir)
+
+    def test_watermark_advances_only_after_finish_run(self):
+        run_id = self.state.start_run("skaters", "20242025", 2)
+        self.state.stage(run_id, 8478402, game_logs(8478402, [("2024-10-08", 2024020001, 1), ("2024-10-10", 2024020015, 0)]))
+        self.assertEqual(self.state.watermarks("20242025", 2), {})
+
+        self.state.finish_run(run_id)
+        self.assertEqual(self.state.watermarks("20242025", 2), {8478402: ("2024-10-10", 2024020015)})
+        self.assertFalse(self.state.spool_path(run_id).exists())
+        self.assertEqual(self.state.completed_players(run_id), set())
+        # Watermarks are kept per season and game type
+        self.assertEqual(self.state.watermarks("20242025", 3), {})
+
+    def test_player_without_new_games_keeps_watermark(self):
+        run_id = self.state.start_run("skaters", "20242025", 2)
+        self.state.stage(run_id, 8478402, game_logs(8478402, [("2024-10-10", 2024020015, 0)]))
+        self.state.finish_run(run_id)
+
+        watermark = self.state.watermarks("20242025", 2)[8478402]
+        df = game_logs(8478402, [("2024-10-08", 2024020001, 1), ("2024-10-10", 2024020015, 0)])
+        self.assertTrue(new_rows_since(df, watermark).empty)
+        run_id = self.state.start_run("skaters", "20242025", 2)
+        self.state.stage(run_id, 8478402, new_rows_since(df, watermark), watermark)
+        self.state.finish_run(run_id)
+        self.assertEqual(self.state.watermarks("20242025", 2), {8478402: ("2024-10-10", 2024020015)})
+
+    def test_failed_run_resumes_from_its_checkpoints(self):
+        run_id = self.state.start_run("skaters", "20242025", 2)
+        self.state.stage(run_id, 8478402, game_logs(8478402, [("2024-10-08", 2024020001, 1)]))
+        # The process dies before the warehouse merge, leaving the run open
+        self.state.close()
+
+        self.state = self.open_state()
+        self.assertEqual(self.state.start_run("skaters", "20242025", 2), run_id)
+        self.assertEqual(self.state.completed_players(run_id), {8478402})
+        self.assertEqual(self.state.watermarks("20242025", 2), {})
+        # Other tables, seasons and game types get runs of their own
+        self.assertNotEqual(self.state.start_run("goalies", "20242025", 2), run_id)
+        self.assertNotEqual(self.state.start_run("skaters", "20242025", 3), run_id)
+
+        self.state.stage(run_id, 8471214, game_logs(8471214, [("2024-10-09", 2024020007, 2)]))
+        self.assertEqual(len(self.state.staged_rows(run_id, KEY_COLUMNS)), 2)
+        self.state.finish_run(run_id)
+        self.assertEqual(self.state.watermarks("20242025", 2), {
+            8478402: ("2024-10-08", 2024020001),
+            8471214: ("2024-10-09", 2024020007),
+        })
+        # A finished run isn't resumed
+        self.assertNotEqual(self.state.start_run("skaters", "20242025", 2), run_id)
+
+    def test_spool_is_replayed_without_restaged_rows(self):
+        run_id = self.state.start_run("skaters", "20242025", 2)
+        first = game_logs(8478402, [("2024-10-08", 2024020001, 1), ("2024-10-10", 2024020015, 0)])
+        self.state.stage(run_id, 8478402, first)
+        # A crash between the spool append and the checkpoint re-stages the player on resume, with a correction
+        self.state.stage(run_id, 8478402, game_logs(8478402, [("2024-10-08", 2024020001, 2), ("2024-10-10", 2024020015, 0)]))
+        self.state.stage(run_id, 8471214, game_logs(8471214, [("2024-10-09", 2024020007, 2)]))
+
+        staged = self.state.staged_rows(run_id, KEY_COLUMNS)
+        self.assertEqual(len(staged), 3)
+        self.assertTrue(pd.api.types.is_datetime64_dtype(staged["gameDate"]))
+        self.assertEqual(
+            staged.set_index(["playerId", "gameId"])["goals"].to_dict(),
+            {(8478402, 2024020001): 2, (8478402, 2024020015): 0, (8471214, 2024020007): 2})
+
+        # The chunked reader used in streaming mode gives the same rows, even when copies are chunks apart
+        chunks = list(self.state.iter_staged_rows(run_id, KEY_COLUMNS, chunksize=2))
+        self.assertGreater(len(chunks), 1)
+        replayed = pd.concat(chunks, ignore_index=True)
+        pd.testing.assert_frame_equal(
+            replayed.sort_values(KEY_COLUMNS, ignore_index=True), staged.sort_values(KEY_COLUMNS, ignore_index=True))
+
+    def test_empty_run_has_no_staged_rows(self):
+        run_id = self.state.start_run("skaters", "20242025", 2)
+        self.assertTrue(self.state.staged_rows(run_id, KEY_COLUMNS).empty)
+        self.assertEqual(list(self.state.iter_staged_rows(run_id, KEY_COLUMNS)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
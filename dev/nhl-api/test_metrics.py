@@ -0,0 +1,67 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from metrics import PROMETHEUS_PREFIX, RunMetrics, percentile
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = RunMetrics()
+        self.metrics.start()
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 0.5))
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 51)
+        self.assertEqual(percentile(values, 0.99), 100)
+        self.assertEqual(percentile([3.0], 0.9), 3.0)
+
+    def test_spans_of_a_stage_are_summed(self):
+        with mock.patch("time.perf_counter", side_effect=[10.0, 12.0, 20.0, 20.5]):
+            with self.metrics.span("fetch"):
+                pass
+            with self.metrics.span("fetch"):
+                pass
+        self.assertEqual(self.metrics.stages["fetch"], {"count": 2, "total_seconds": 2.5, "max_seconds": 2.0})
+
+    def test_report_and_prometheus_output(self):
+        for latency in [0.04, 0.2, 0.3, 3.0]:
+            self.metrics.observe_latency("roster", latency)
+        self.metrics.count("rows", 10, table="skaters")
+        self.metrics.count("rows", 5, table="skaters")
+        self.metrics.count("retries", endpoint="roster")
+        self.metrics.finish(True)
+
+        report = self.metrics.report()
+        self.assertTrue(report["success"])
+        self.assertEqual(report["api_latency_seconds"]["roster"], {"count": 4, "p50": 0.3, "p90": 3.0, "p99": 3.0, "max": 3.0})
+        self.assertIn({"name": "rows", "table": "skaters", "value": 15}, report["counters"])
+
+        lines = self.metrics.prometheus().splitlines()
+        histogram = f"{PROMETHEUS_PREFIX}_api_request_duration_seconds"
+        # Buckets are cumulative and end with +Inf
+        self.assertIn(f'{histogram}_bucket{{endpoint="roster",le="0.05"}} 1', lines)
+        self.assertIn(f'{histogram}_bucket{{endpoint="roster",le="0.5"}} 3', lines)
+        self.assertIn(f'{histogram}_bucket{{endpoint="roster",le="+Inf"}} 4', lines)
+        self.assertIn(f'{histogram}_count{{endpoint="roster"}} 4', lines)
+        self.assertIn(f'{PROMETHEUS_PREFIX}_rows{{table="skaters"}} 15.0', lines)
+        self.assertIn(f"{PROMETHEUS_PREFIX}_last_run_success 1", lines)
+
+    def test_write(self):
+        self.metrics.count("rows", 3, table="goalies")
+        self.metrics.finish(False)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            report_path = Path(tmp_dir) / "reports" / "run.json"
+            prometheus_path = Path(tmp_dir) / "textfile" / "nhl.prom"
+            self.metrics.write(report_path, prometheus_path)
+            self.assertFalse(json.loads(report_path.read_text())["success"])
+            self.assertIn(f"{PROMETHEUS_PREFIX}_last_run_success 0", prometheus_path.read_text())
+            # No temporary files are left next to the outputs
+            self.assertEqual([path.name for path in report_path.parent.iterdir()], ["run.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import pandas as pd
+
+from normalize import flatten_localized, normalize_game_logs, normalize_roster, parse_toi
+
+
+class TestParseToi(unittest.TestCase):
+    def test_minutes_and_seconds(self):
+        toi = parse_toi(pd.Series(["0:00", "0:59", "18:42", "59:59"]))
+        self.assertEqual(toi.tolist(), [0, 59, 1122, 3599])
+        self.assertEqual(toi.dtype, "Int32")
+
+    def test_more_than_sixty_minutes(self):
+        # Overtime goalies pass 60 minutes, given either as minutes past 60 or with hours
+        self.assertEqual(parse_toi(pd.Series(["65:00", "1:05:00", "79:15"])).tolist(), [3900, 3900, 4755])
+
+    def test_missing_or_invalid_values_are_null(self):
+        toi = parse_toi(pd.Series(["12:30", None, "--", "1:2x"]))
+        self.assertEqual(toi[0], 750)
+        self.assertTrue(toi[1:].isna().all())
+
+
+class TestFlattenLocalized(unittest.TestCase):
+    def test_default_language_replaces_localized_fields(self):
+        df = pd.json_normalize([
+            {"id": 1, "firstName": {"default": "Auston", "cs": "Auston"}, "birthCity": {"default": "San Ramon"}},
+            {"id": 2, "firstName": "Mitch", "birthCity": {"default": "Toronto", "fr": "Toronto"}},
+        ], max_level=1)
+        df = flatten_localized(df, ["firstName", "birthCity", "lastName"])
+        self.assertEqual(list(df.columns), ["id", "firstName", "birthCity"])
+        # Records that carried a plain string keep it
+        self.assertEqual(df["firstName"].tolist(), ["Auston", "Mitch"])
+        self.assertEqual(df["birthCity"].tolist(), ["San Ramon", "Toronto"])
+
+    def test_roster_is_typed_and_tagged_with_team(self):
+        df = normalize_roster([
+            {"id": 8479318, "firstName": {"default": "Auston"}, "lastName": {"default": "Matthews"},
+             "sweaterNumber": 34, "positionCode": "C", "heightInInches": 75, "birthCity": {"default": "San Ramon"}},
+        ], "TOR")
+        self.assertEqual(df.loc[0, "lastName"], "Matthews")
+        self.assertEqual(df.loc[0, "currentTeam"], "TOR")
+        self.assertEqual(df["sweaterNumber"].dtype, "Int16")
+        self.assertNotIn("heightInInches", df.columns)
+        self.assertNotIn("birthCity", df.columns)
+        self.assertTrue(normalize_roster([], "TOR").empty)
+
+
+class TestNormalizeGameLogs(unittest.TestCase):
+    def test_batch_is_tagged_with_player_and_season(self):
+        df = normalize_game_logs([
+            (8479318, [{"gameId": 2024020001, "gameDate": "2024-10-09", "toi": "20:15", "goals": 1,
+                        "commonName": {"default": "Maple Leafs"}, "opponentAbbrev": "MTL"},
+                       {"gameId": 2024020015, "gameDate": "2024-10-12", "toi": "61:02", "goals": 0,
+                        "commonName": {"default": "Maple Leafs"}, "opponentAbbrev": "PIT"}]),
+            (8478483, []),
+            (8477939, [{"gameId": 2024020001, "gameDate": "2024-10-09", "toi": "0:00", "goals": 0,
+                        "commonName": {"default": "Maple Leafs"}, "opponentAbbrev": "MTL"}]),
+        ], "20242025")
+        self.assertEqual(df["playerId"].tolist(), [8479318, 8479318, 8477939])
+        self.assertEqual(df["toiInSeconds"].tolist(), [1215, 3662, 0])
+        self.assertEqual(set(df["seasonId"]), {"20242025"})
+        self.assertNotIn("toi", df.columns)
+        self.assertFalse([col for col in df.columns if col.startswith("commonName")])
+        self.assertTrue(pd.api.types.is_datetime64_dtype(df["gameDate"]))
+        self.assertTrue(normalize_game_logs([(8479318, [])], "20242025").empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
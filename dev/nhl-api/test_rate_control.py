@@ -0,0 +1,183 @@
+import asyncio
+import datetime
+import email.utils
+import multiprocessing
+import unittest
+from unittest import mock
+
+from rate_control import AdaptiveRateController, SharedTokenBucket, TokenBucket, parse_retry_after
+
+
+# Stand-in for time.monotonic that only moves when a test advances it; asyncio.sleep is replaced by a
+# coroutine that records how long each caller would have waited
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+
+
+class RateControlTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in (mock.patch("time.monotonic", self.clock), mock.patch("asyncio.sleep", self.clock.sleep)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    # Function to acquire a number of tokens concurrently, the way the fetch engine's requests do
+    def acquire(self, limiter, count):
+        async def acquire_all():
+            await asyncio.gather(*(limiter.acquire() for _ in range(count)))
+        asyncio.run(acquire_all())
+
+
+class TestTokenBucket(RateControlTestCase):
+    def test_reservations_are_spaced_at_rate(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        self.acquire(bucket, 4)
+        # The first caller takes the token in the bucket, the others reserve slots half a second apart
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0, 1.5])
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        self.acquire(bucket, 2)
+        self.clock.advance(60)
+        self.acquire(bucket, 3)
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_pause_holds_back_every_caller(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        bucket.pause(3)
+        self.acquire(bucket, 2)
+        self.assertEqual(self.clock.sleeps, [3.5, 4.0])
+
+    def test_pause_counts_from_the_end_of_the_queue(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        self.acquire(bucket, 3)
+        bucket.pause(1)
+        self.acquire(bucket, 1)
+        # The pause starts once the callers already queued have had their slots
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0, 2.5])
+
+
+class TestAdaptiveRateController(RateControlTestCase):
+    def test_throttle_halves_rate_and_pauses_for_retry_after(self):
+        controller = AdaptiveRateController(initial_rate=8)
+        controller.on_throttle(retry_after=2)
+        self.assertEqual(controller.rate, 4)
+        self.assertEqual(controller.limiter.capacity, 4)
+        self.assertEqual(controller.throttled, 1)
+        self.acquire(controller.limiter, 1)
+        # 2 seconds at the new rate of 4 calls/sec is 8 tokens of debt, plus the caller's own token
+        self.assertEqual(self.clock.sleeps, [2.25])
+
+    def test_decrease_happens_once_per_cooldown(self):
+        controller = AdaptiveRateController(initial_rate=8)
+        controller.on_throttle()
+        controller.on_throttle()
+        self.clock.advance(0.9)
+        controller.on_throttle()
+        self.assertEqual(controller.rate, 4)
+        self.clock.advance(0.2)
+        controller.on_throttle()
+        self.assertEqual(controller.rate, 2)
+        # At low rates the cooldown is one request interval rather than one second
+        controller = AdaptiveRateController(initial_rate=1.5, min_rate=0.1)
+        controller.on_throttle()
+        self.assertEqual(controller.rate, 0.75)
+        self.clock.advance(1.2)
+        controller.on_throttle()
+        self.assertEqual(controller.rate, 0.75)
+        self.clock.advance(0.2)
+        controller.on_throttle()
+        self.assertEqual(controller.rate, 0.375)
+        self.assertEqual(controller.throttled, 3)
+
+    def test_high_latency_decreases_rate(self):
+        controller = AdaptiveRateController(initial_rate=8, latency_target=2.0)
+        controller.on_success(latency=2.5)
+        self.assertEqual(controller.rate, 4)
+        self.assertEqual(controller.throttled, 0)
+
+    def test_rate_stays_between_min_and_max(self):
+        controller = AdaptiveRateController(initial_rate=49, max_rate=50)
+        for _ in range(1000):
+            controller.on_success(latency=0.1)
+        self.assertEqual(controller.rate, 50)
+
+        controller = AdaptiveRateController(initial_rate=3, min_rate=1)
+        for _ in range(5):
+            controller.on_throttle()
+            self.clock.advance(10)
+        self.assertEqual(controller.rate, 1)
+        self.assertEqual(controller.limiter.capacity, 1)
+
+    def test_additive_increase(self):
+        controller = AdaptiveRateController(initial_rate=4, increase_step=0.5)
+        # About +increase_step calls/sec for every `rate` successful calls
+        for _ in range(4):
+            controller.on_success(latency=0.1)
+        self.assertAlmostEqual(controller.rate, 4.5, places=1)
+
+
+# Function to report a 429 from a worker process with its own controller on the shared bucket
+def throttle_worker(limiter):
+    AdaptiveRateController(limiter=limiter).on_throttle()
+
+
+class TestSharedTokenBucket(RateControlTestCase):
+    def test_controllers_sharing_a_bucket_decrease_once_per_cooldown(self):
+        limiter = SharedTokenBucket(rate=8)
+        controllers = [AdaptiveRateController(limiter=limiter) for _ in range(4)]
+        for controller in controllers:
+            controller.on_throttle()
+        self.assertEqual(limiter.rate, 4)
+        self.assertEqual(limiter.capacity, 4)
+        self.clock.advance(1.0)
+        controllers[-1].on_throttle()
+        self.assertEqual(limiter.rate, 2)
+
+    def test_worker_processes_decrease_once_per_cooldown(self):
+        # Forked workers keep the fake clock, so every one of them sees the 429 at the same time
+        ctx = multiprocessing.get_context("fork")
+        limiter = SharedTokenBucket(rate=8, ctx=ctx)
+        workers = [ctx.Process(target=throttle_worker, args=(limiter,)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(limiter.rate, 4)
+        self.assertEqual(limiter.last_decrease, self.clock.now)
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after("120"), 120)
+        self.assertEqual(parse_retry_after("1.5"), 1.5)
+        self.assertEqual(parse_retry_after("-5"), 0)
+
+    def test_http_date(self):
+        now = datetime.datetime(2025, 1, 15, 12, 0, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch("time.time", return_value=now.timestamp()):
+            retry_at = email.utils.format_datetime(now + datetime.timedelta(seconds=30), usegmt=True)
+            self.assertEqual(retry_after := parse_retry_after(retry_at), 30)
+            self.assertIsInstance(retry_after, float)
+            self.assertEqual(parse_retry_after("Wed, 15 Jan 2025 11:59:00 GMT"), 0)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(""))
+        self.assertIsNone(parse_retry_after("soon"))
+
+
+if __name__ == "__main__":
+    unittest.main()
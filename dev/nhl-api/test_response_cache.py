@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+from unittest import mock
+
+from response_cache import ACCESS_RESOLUTION, ResponseCache
+
+TTL = 60 * 60
+
+
+# Function to build a response body of about the given size that zlib can't shrink much
+def payload(size, seed):
+    return json.dumps({"seed": seed, "data": os.urandom(size // 2).hex()}).encode()
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.now = 1_700_000_000.0
+        patcher = mock.patch("time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = self.open_cache()
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def open_cache(self, max_bytes=1024 * 1024):
+        return ResponseCache(Path(self.tmp_dir.name) / "cache.db", ttls={"roster": TTL}, max_bytes=max_bytes)
+
+    # Function to get the last_accessed time stored for an entry
+    def last_accessed(self, endpoint, params):
+        return self.cache.con.execute(
+            "SELECT last_accessed FROM response_cache WHERE key = ?", (ResponseCache.make_key(endpoint, params),)
+        ).fetchone()[0]
+
+    def test_entry_is_fresh_until_its_ttl(self):
+        self.cache.put("roster", {"team": "TOR"}, b'{"forwards": []}', etag='"v1"')
+        self.now += TTL - 1
+        entry = self.cache.get("roster", {"team": "TOR"})
+        self.assertTrue(entry.fresh)
+        self.assertEqual(entry.data, {"forwards": []})
+        self.assertEqual(self.cache.hits, 1)
+
+        self.now += 1
+        self.assertFalse(self.cache.get("roster", {"team": "TOR"}).fresh)
+        self.assertEqual(self.cache.hits, 1)
+        # Endpoints without a TTL are always revalidated, and other params are a miss
+        self.cache.put("unknown", {}, b"{}")
+        self.assertFalse(self.cache.get("unknown", {}).fresh)
+        self.assertIsNone(self.cache.get("roster", {"team": "MTL"}))
+
+    def test_not_modified_response_revalidates_entry(self):
+        self.cache.put("roster", {"team": "TOR"}, b'{"forwards": []}', etag='"v1"',
+                       last_modified="Wed, 15 Jan 2025 12:00:00 GMT")
+        self.now += TTL
+        entry = self.cache.get("roster", {"team": "TOR"})
+        self.assertFalse(entry.fresh)
+        self.assertEqual(entry.conditional_headers(), {
+            "If-None-Match": '"v1"', "If-Modified-Since": "Wed, 15 Jan 2025 12:00:00 GMT"})
+
+        self.cache.revalidate(entry)
+        self.assertEqual(self.cache.revalidated, 1)
+        entry = self.cache.get("roster", {"team": "TOR"})
+        self.assertTrue(entry.fresh)
+        self.assertEqual(entry.data, {"forwards": []})
+        self.assertEqual(entry.etag, '"v1"')
+        # An entry without validators has nothing to revalidate with
+        self.cache.put("roster", {"team": "MTL"}, b"{}")
+        self.assertEqual(self.cache.get("roster", {"team": "MTL"}).conditional_headers(), {})
+
+    def test_hits_update_last_accessed_at_most_once_per_resolution(self):
+        self.cache.put("roster", {"team": "TOR"}, b"{}")
+        stored_at = self.now
+        self.now += ACCESS_RESOLUTION - 1
+        self.cache.get("roster", {"team": "TOR"})
+        self.assertEqual(self.last_accessed("roster", {"team": "TOR"}), stored_at)
+
+        self.now += 1
+        self.cache.get("roster", {"team": "TOR"})
+        self.assertEqual(self.last_accessed("roster", {"team": "TOR"}), self.now)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        bodies = {team: payload(4000, team) for team in ["TOR", "MTL", "BOS", "NYR"]}
+        sizes = {team: len(zlib.compress(body)) for team, body in bodies.items()}
+        self.cache.close()
+        # Room for three entries; the fourth takes the cache over max_bytes
+        self.cache = self.open_cache(max_bytes=sizes["TOR"] + sizes["MTL"] + sizes["BOS"] + sizes["NYR"] // 2)
+        for team in ["TOR", "MTL", "BOS"]:
+            self.cache.put("roster", {"team": team}, bodies[team])
+            self.now += ACCESS_RESOLUTION
+        # Reading TOR makes MTL the least recently used entry
+        self.cache.get("roster", {"team": "TOR"})
+        self.now += ACCESS_RESOLUTION
+
+        self.cache.put("roster", {"team": "NYR"}, bodies["NYR"])
+        self.assertIsNone(self.cache.get("roster", {"team": "MTL"}))
+        for team in ["TOR", "BOS", "NYR"]:
+            self.assertIsNotNone(self.cache.get("roster", {"team": team}), team)
+        self.assertEqual(self.cache.size(), sizes["TOR"] + sizes["BOS"] + sizes["NYR"])
+        self.assertLessEqual(self.cache.size(), self.cache.max_bytes)
+
+    def test_size_includes_entries_written_by_other_connections(self):
+        tor, mtl = payload(4000, "TOR"), payload(4000, "MTL")
+        other = self.open_cache()
+        other.put("roster", {"team": "TOR"}, tor)
+        self.cache.put("roster", {"team": "MTL"}, mtl)
+        self.assertEqual(self.cache.size(), len(zlib.compress(tor)) + len(zlib.compress(mtl)))
+        # Replacing an entry counts its new size only
+        other.put("roster", {"team": "TOR"}, b"{}")
+        self.assertEqual(self.cache.size(), len(zlib.compress(b"{}")) + len(zlib.compress(mtl)))
+        other.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
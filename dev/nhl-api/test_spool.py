@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from schemas import TABLE_SCHEMAS
+from spool import CsvSpool, ParquetSpool, join_roster
+
+
+# Function to build a batch of skater game logs with an extra column the table doesn't declare
+def skater_batch(player_id, game_ids):
+    return pd.DataFrame({
+        "gameId": game_ids,
+        "gameDate": pd.to_datetime(["2024-10-09"] * len(game_ids)),
+        "goals": [1] * len(game_ids),
+        "playerId": player_id,
+        "undeclared": "x",
+    })
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def check_spool(self, spool, read):
+        with self.assertLogs(level="WARNING"):
+            spool.append(skater_batch(8479318, [2024020001, 2024020015]))
+            spool.append(pd.DataFrame())
+            spool.append(skater_batch(8477939, [2024020001]))
+        spool.close()
+        self.assertEqual(spool.rows, 3)
+
+        df = read(spool.path)
+        # Every batch is conformed to the declared columns, in order, under one header
+        self.assertEqual(list(df.columns), list(TABLE_SCHEMAS["skaters"]))
+        self.assertEqual(df["playerId"].tolist(), [8479318, 8479318, 8477939])
+        self.assertEqual(df["gameId"].tolist(), [2024020001, 2024020015, 2024020001])
+        self.assertTrue(df["assists"].isna().all())
+
+        spool.remove()
+        self.assertFalse(spool.path.exists())
+
+    def test_csv_spool(self):
+        spool = CsvSpool(Path(self.tmp_dir.name) / "staging" / "skaters.csv", "skaters")
+        self.check_spool(spool, pd.read_csv)
+        self.assertEqual(spool.sample["goals"].dtype, "Int16")
+
+    def test_parquet_spool(self):
+        spool = ParquetSpool(Path(self.tmp_dir.name) / "staging" / "skaters.parquet", "skaters")
+        self.check_spool(spool, pd.read_parquet)
+
+    def test_spool_replaces_an_earlier_file(self):
+        path = Path(self.tmp_dir.name) / "skaters.csv"
+        path.write_text("left over from a failed run\n")
+        spool = CsvSpool(path, "skaters")
+        self.assertFalse(path.exists())
+        spool.append(skater_batch(8479318, [2024020001]).drop(columns="undeclared"))
+        self.assertEqual(len(pd.read_csv(path)), 1)
+
+
+class TestJoinRoster(unittest.TestCase):
+    def test_roster_attributes_are_joined_by_player_id(self):
+        df = skater_batch(8479318, [2024020001, 2024020015]).drop(columns="undeclared")
+        roster_lookup = {8479318: {"id": 8479318, "lastName": "Matthews"}, 8477939: {"id": 8477939, "lastName": "Nylander"}}
+        joined = join_roster(df, roster_lookup)
+        self.assertEqual(joined["lastName"].tolist(), ["Matthews", "Matthews"])
+        # Players missing from every roster keep their rows without attributes
+        self.assertIs(join_roster(df, {}), df)
+
+
+if __name__ == "__main__":
+    unittest.main()
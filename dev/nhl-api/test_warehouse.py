@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from warehouse import SQLiteWarehouse, build_merge_query
+
+KEY_COLUMNS = ["gameDate", "gameId", "playerId"]
+SCHEMA = [("gameId", "INT64"), ("gameDate", "DATETIME"), ("playerId", "INT64"), ("goals", "INT64")]
+
+
+class TestSQLiteWarehouse(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.warehouse = SQLiteWarehouse(Path(self.tmp_dir.name) / "warehouse.db")
+        self.addCleanup(self.warehouse.con.close)
+
+    # Function to stage a frame as a CSV file and merge it into the skaters table
+    def load(self, df, schema=SCHEMA):
+        path = Path(self.tmp_dir.name) / "skaters.csv"
+        df.to_csv(path, index=False)
+        with self.assertLogs(level="INFO"):
+            self.assertTrue(self.warehouse.load_staging_table(path, "staging", "skaters_1", schema))
+            self.assertTrue(self.warehouse.upsert("staging", "skaters_1", "prod", "skaters", KEY_COLUMNS))
+
+    def rows(self):
+        return self.warehouse.con.execute('SELECT * FROM "prod__skaters" ORDER BY gameId, playerId').fetchall()
+
+    def test_repeated_upsert_is_idempotent(self):
+        df = pd.DataFrame({
+            "gameId": [2024020001, 2024020001, 2024020015],
+            "gameDate": pd.to_datetime(["2024-10-09", "2024-10-09", "2024-10-12"]),
+            "playerId": [8479318, 8477939, 8479318],
+            "goals": [1, 0, 2],
+        })
+        self.load(df)
+        rows = self.rows()
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], (2024020001, "2024-10-09T00:00:00", 8477939, 0))
+        self.load(df)
+        self.assertEqual(self.rows(), rows)
+        # The staging table is dropped once merged
+        self.assertFalse(self.warehouse.table_exists("staging", "skaters_1"))
+
+    def test_upsert_updates_matched_rows_and_adds_new_columns(self):
+        self.load(pd.DataFrame({
+            "gameId": [2024020001], "gameDate": ["2024-10-09"], "playerId": [8479318], "goals": [1]}))
+        self.load(pd.DataFrame({
+            "gameId": [2024020001, 2024020015], "gameDate": ["2024-10-09", "2024-10-12"],
+            "playerId": [8479318, 8479318], "goals": [2, 0], "assists": [1, 1]}),
+            SCHEMA + [("assists", "INT64")])
+        self.assertEqual(self.rows(), [
+            (2024020001, "2024-10-09T00:00:00", 8479318, 2, 1),
+            (2024020015, "2024-10-12T00:00:00", 8479318, 0, 1),
+        ])
+
+    def test_merge_query_matches_on_the_keys(self):
+        query = build_merge_query("p.prod.skaters", "p.staging.skaters_1", ["gameId", "playerId", "goals"], ["gameId", "playerId"])
+        self.assertIn("ON T.gameId = S.gameId AND T.playerId = S.playerId", query)
+        self.assertIn("UPDATE SET\n            T.goals = S.goals", query)
+        self.assertIn("INSERT (gameId, playerId, goals)", query)
+
+
+if __name__ == "__main__":
+    unittest.main()
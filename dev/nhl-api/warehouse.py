@@ -0,0 +1,235 @@
+import datetime
+import logging
+import sqlite3
+import threading
+
+import pandas as pd
+
+STAGING_TABLE_EXPIRATION_DAYS = 5
+LOAD_CHUNK_ROWS = 50000
+
+
+# Function to quote an SQLite identifier
+def quote(name):
+    return f'"{name}"'
+
+
+# Function to build the BigQuery MERGE statement behind BigQueryWarehouse.upsert; SQLiteWarehouse upserts with its own SQL
+def build_merge_query(prod_table_id, staging_table_id, columns, key_columns):
+    non_key_columns = [col for col in columns if col not in key_columns]
+    return f"""
+        MERGE `{prod_table_id}` T
+        USING `{staging_table_id}` S
+        ON {" AND ".join([f"T.{col} = S.{col}" for col in key_columns])}
+        WHEN MATCHED THEN
+        UPDATE SET
+            {", ".join([f"T.{col} = S.{col}" for col in non_key_columns]) if non_key_columns else ""}
+        WHEN NOT MATCHED THEN
+        INSERT ({", ".join(columns)})
+        VALUES ({", ".join([f"S.{col}" for col in columns])});
+    """
+
+
+# BigQuery warehouse with one client reused across every load, schema sync and merge.
+# Schemas are passed around as [(column, BigQuery type)] so callers stay backend-neutral.
+class BigQueryWarehouse:
+    def __init__(self, project_id):
+        # Imported here so the local backend works without the Google Cloud libraries
+        from google.cloud import bigquery
+        from google.api_core.exceptions import NotFound
+
+        self.bigquery = bigquery
+        self.not_found = NotFound
+        self.project_id = project_id
+        self.client = bigquery.Client(project=project_id)
+        self.known_datasets = set()
+
+    def table_id(self, dataset_id, table):
+        return f"{self.project_id}.{dataset_id}.{table}"
+
+    # Function to check a single table directly instead of listing the whole dataset
+    def table_exists(self, dataset_id, table):
+        try:
+            self.client.get_table(self.table_id(dataset_id, table))
+            return True
+        except self.not_found:
+            return False
+
+    def _ensure_dataset(self, dataset_id):
+        if dataset_id in self.known_datasets:
+            return
+        try:
+            self.client.get_dataset(dataset_id)
+        except self.not_found:
+            self.client.create_dataset(dataset_id)
+        self.known_datasets.add(dataset_id)
+
+    # Function to load a staged file into a staging table that expires after a few days
+    def load_staging_table(self, uri, dataset_id, table, schema, source_format="CSV"):
+        self._ensure_dataset(dataset_id)
+        table_id = self.table_id(dataset_id, table)
+        job_config = self.bigquery.LoadJobConfig(
+            schema=[self.bigquery.SchemaField(col, field_type) for col, field_type in schema],
+            source_format=getattr(self.bigquery.SourceFormat, source_format))
+        if source_format == "CSV":
+            job_config.skip_leading_rows = 1
+        try:
+            self.client.load_table_from_uri(uri, table_id, job_config=job_config).result()
+            destination_table = self.client.get_table(table_id)
+            logging.info(f"✅ Loaded {destination_table.num_rows} rows into {table_id}.")
+
+            destination_table.expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+                days=STAGING_TABLE_EXPIRATION_DAYS)
+            destination_table = self.client.update_table(destination_table, ["expires"])
+            logging.info(f"✅ Updated {table_id}, expires {destination_table.expires}.")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Error loading data to BigQuery: {e}")
+            return False
+
+    # Function to add the staging table's new columns to the production table in one ALTER TABLE
+    def sync_table_schema(self, prod_dataset_id, prod_table, staging_dataset_id, staging_table):
+        prod_table_id = self.table_id(prod_dataset_id, prod_table)
+        existing_columns = {field.name for field in self.client.get_table(prod_table_id).schema}
+        staging_schema = self.client.get_table(self.table_id(staging_dataset_id, staging_table)).schema
+        new_columns = [field for field in staging_schema if field.name not in existing_columns]
+        if not new_columns:
+            logging.info("⚠️ No new columns to add.")
+            return staging_schema
+        logging.info(f"⚠️ Adding missing columns to `{prod_table_id}`: {[col.name for col in new_columns]}")
+        add_columns = ",\n".join([f"ADD COLUMN {col.name} {col.field_type}" for col in new_columns])
+        self.client.query(f"ALTER TABLE `{prod_table_id}`\n{add_columns};").result()
+        logging.info(f"✅ Added {len(new_columns)} columns to `{prod_table_id}`.")
+        return staging_schema
+
+    # Function to upsert a staging table into the production table, creating it on first use
+    def upsert(self, staging_dataset_id, staging_table, prod_dataset_id, prod_table, key_columns):
+        prod_table_id = self.table_id(prod_dataset_id, prod_table)
+        staging_table_id = self.table_id(staging_dataset_id, staging_table)
+        try:
+            if not self.table_exists(prod_dataset_id, prod_table):
+                logging.info(f"⚠️ Production table `{prod_table}` does not exist. Creating it...")
+                self.client.query(f"""
+                    CREATE TABLE `{prod_table_id}`
+                    PARTITION BY DATE(gameDate)
+                    CLUSTER BY gameId
+                    AS
+                    SELECT * FROM `{staging_table_id}`
+                    WHERE 1=0;
+                """).result()
+                logging.info(f"✅ Created production table `{prod_table_id}`.")
+
+            # Sync schema in case new columns added
+            staging_schema = self.sync_table_schema(prod_dataset_id, prod_table, staging_dataset_id, staging_table)
+            columns = [field.name for field in staging_schema]
+            self.client.query(build_merge_query(prod_table_id, staging_table_id, columns, key_columns)).result()
+            logging.info(f"✅ Data upserted into `{prod_table_id}`.")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Error upserting data into `{prod_table_id}`: {e}")
+            return False
+
+
+# Local SQLite warehouse with the same interface, for running and benchmarking the load/merge stage offline.
+# Datasets become table name prefixes and staged files are read from local paths.
+class SQLiteWarehouse:
+    SQLITE_TYPES = {"INT64": "INTEGER", "FLOAT": "REAL", "STRING": "TEXT", "DATETIME": "TEXT"}
+
+    def __init__(self, db_file="hnl.db"):
+        self.db_file = db_file
+        self.local = threading.local()
+
+    # Each thread gets its own connection since branches load concurrently
+    @property
+    def con(self):
+        if not hasattr(self.local, "con"):
+            self.local.con = sqlite3.connect(self.db_file, timeout=60)
+            self.local.con.execute("PRAGMA journal_mode=WAL")
+        return self.local.con
+
+    def table_id(self, dataset_id, table):
+        return f"{dataset_id}__{table}"
+
+    def table_exists(self, dataset_id, table):
+        row = self.con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table_id(dataset_id, table),)).fetchone()
+        return row is not None
+
+    def _columns(self, table_id):
+        return [row[1] for row in self.con.execute(f'PRAGMA table_info("{table_id}")')]
+
+    # Function to read a staged CSV or Parquet file in chunks
+    def _read_chunks(self, uri, source_format):
+        if source_format == "PARQUET":
+            import pyarrow.parquet
+
+            for batch in pyarrow.parquet.ParquetFile(uri).iter_batches(batch_size=LOAD_CHUNK_ROWS):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(uri, chunksize=LOAD_CHUNK_ROWS)
+
+    def load_staging_table(self, uri, dataset_id, table, schema, source_format="CSV"):
+        table_id = self.table_id(dataset_id, table)
+        columns = ", ".join([f'"{col}" {self.SQLITE_TYPES.get(field_type, "TEXT")}' for col, field_type in schema])
+        insert = f'INSERT INTO "{table_id}" VALUES ({", ".join(["?"] * len(schema))})'
+        rows = 0
+        try:
+            with self.con:
+                self.con.execute(f'DROP TABLE IF EXISTS "{table_id}"')
+                self.con.execute(f'CREATE TABLE "{table_id}" ({columns})')
+                for df in self._read_chunks(uri, source_format):
+                    df = df.reindex(columns=[col for col, _ in schema])
+                    for col, field_type in schema:
+                        if field_type == "DATETIME":
+                            df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%dT%H:%M:%S")
+                    df = df.astype(object).where(df.notna(), None)
+                    self.con.executemany(insert, df.itertuples(index=False, name=None))
+                    rows += len(df)
+            logging.info(f"✅ Loaded {rows} rows into {table_id}.")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Error loading data to SQLite: {e}")
+            return False
+
+    # SQLite only takes one ADD COLUMN per ALTER TABLE, so the statements share one transaction
+    def sync_table_schema(self, prod_dataset_id, prod_table, staging_dataset_id, staging_table):
+        prod_table_id = self.table_id(prod_dataset_id, prod_table)
+        existing_columns = set(self._columns(prod_table_id))
+        staging_columns = self.con.execute(
+            f'PRAGMA table_info("{self.table_id(staging_dataset_id, staging_table)}")').fetchall()
+        new_columns = [(row[1], row[2]) for row in staging_columns if row[1] not in existing_columns]
+        if new_columns:
+            logging.info(f"⚠️ Adding missing columns to `{prod_table_id}`: {[col for col, _ in new_columns]}")
+            with self.con:
+                for col, col_type in new_columns:
+                    self.con.execute(f'ALTER TABLE "{prod_table_id}" ADD COLUMN "{col}" {col_type}')
+        return [row[1] for row in staging_columns]
+
+    def upsert(self, staging_dataset_id, staging_table, prod_dataset_id, prod_table, key_columns):
+        prod_table_id = self.table_id(prod_dataset_id, prod_table)
+        staging_table_id = self.table_id(staging_dataset_id, staging_table)
+        try:
+            if not self.table_exists(prod_dataset_id, prod_table):
+                logging.info(f"⚠️ Production table `{prod_table_id}` does not exist. Creating it...")
+                with self.con:
+                    self.con.execute(f'CREATE TABLE "{prod_table_id}" AS SELECT * FROM "{staging_table_id}" WHERE 1=0')
+                    # ON CONFLICT needs a unique index over the merge keys
+                    self.con.execute(
+                        f'CREATE UNIQUE INDEX {quote(prod_table_id + "_keys")} ON {quote(prod_table_id)} '
+                        f'({", ".join(map(quote, key_columns))})')
+
+            columns = self.sync_table_schema(prod_dataset_id, prod_table, staging_dataset_id, staging_table)
+            quoted = ", ".join(map(quote, columns))
+            non_key_columns = [col for col in columns if col not in key_columns]
+            updates = ", ".join([f"{quote(col)} = excluded.{quote(col)}" for col in non_key_columns])
+            on_conflict = f"DO UPDATE SET {updates}" if non_key_columns else "DO NOTHING"
+            with self.con:
+                self.con.execute(
+                    f'INSERT INTO "{prod_table_id}" ({quoted}) SELECT {quoted} FROM "{staging_table_id}" WHERE true '
+                    f'ON CONFLICT ({", ".join(map(quote, key_columns))}) {on_conflict}')
+                self.con.execute(f'DROP TABLE "{staging_table_id}"')
+            logging.info(f"✅ Data upserted into `{prod_table_id}`.")
+            return True
+        except Exception as e:
+            logging.error(f"❌ Error upserting data into `{prod_table_id}`: {e}")
+            return False
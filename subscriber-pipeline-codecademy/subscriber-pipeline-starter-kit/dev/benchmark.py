@@ -0,0 +1,129 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import data_pipeline
+from change_capture import HASH_TABLE
+from synthetic_data import generate
+
+DATA_DIR = os.path.join(tempfile.gettempdir(), "subscriber_pipeline_benchmark") # Generated databases, reused between runs
+
+
+# Function to get the peak resident memory of the current process in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+# Function to get the generated database for a scale, generating it the first time
+def synthetic_database(data_dir, students, duplicate_rate, malformed_rate, null_rate, seed):
+    db_file = os.path.join(
+        data_dir, f"students_{students}_d{duplicate_rate}_m{malformed_rate}_n{null_rate}_s{seed}.db")
+    if not os.path.exists(db_file):
+        os.makedirs(data_dir, exist_ok=True)
+        logging.info(f"Generating {students} students into {db_file}")
+        generate(db_file, students, duplicate_rate, malformed_rate, null_rate, seed)
+    return db_file
+
+
+# Function to drop what earlier pipeline runs wrote to a database, so each mode starts from the source tables alone
+def reset_database(db_file):
+    with sqlite3.connect(db_file) as con:
+        for table in ["students_data", "students_data__shadow", HASH_TABLE]:
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+# Function to run the pipeline once; runs in a fresh process so the peak memory is that run's own.
+# Returns the run's manifest with the memory figures added.
+def run_once(db_file, mode, work_dir, chunk_size):
+    data_pipeline.CHUNK_SIZE = chunk_size
+    data_pipeline.configure_logging(os.path.join(work_dir, "data_pipeline.log"))
+    baseline = peak_rss_mb()
+    with sqlite3.connect(db_file) as con:
+        try:
+            data_pipeline.run_version(con, db_file, mode, data_pipeline.DB_TABLE,
+                                      os.path.join(work_dir, data_pipeline.FILE_PATH), state_dir=work_dir)
+        except Exception:
+            pass # The manifest records the error
+    manifest = dict(data_pipeline.run_manifest.data)
+    manifest["baseline_rss_mb"] = round(baseline, 1)
+    manifest["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return manifest
+
+
+# Function to run every mode on a generated database of each scale. Malformed rows are logged as errors and fail
+# the run, so none are generated by default and the errors of a run are counted in a column of their own
+def run_benchmarks(scales, modes, data_dir=DATA_DIR, duplicate_rate=0.01, malformed_rate=0, null_rate=0.05,
+                   seed=0, chunk_size=data_pipeline.CHUNK_SIZE):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for students in scales:
+        db_file = synthetic_database(data_dir, students, duplicate_rate, malformed_rate, null_rate, seed)
+        with sqlite3.connect(db_file) as con:
+            source_rows = con.execute("SELECT COUNT(*) FROM cademycode_students").fetchone()[0]
+
+        for mode in modes:
+            reset_database(db_file)
+            # Incremental mode is run a second time against its own saved state, which is its steady state
+            runs = ["rebuild", "no changes"] if mode == "incremental" else [None]
+            for run in runs:
+                with tempfile.TemporaryDirectory() as work_dir, \
+                        ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    manifest = pool.submit(run_once, db_file, mode, work_dir, chunk_size).result()
+                    output_bytes = sum(output["bytes"] for output in manifest["outputs"])
+
+                duration = manifest["duration_seconds"]
+                result = {
+                    "students": students,
+                    "source_rows": source_rows,
+                    "mode": mode,
+                    "run": run,
+                    "status": manifest["status"],
+                    "errors": manifest["log_records"].get("ERROR", 0),
+                    "wall_time": round(duration, 4),
+                    "rows_per_second": round(source_rows / duration) if duration else None,
+                    "stage_seconds": {stage: round(seconds, 4) for stage, seconds in manifest["stage_seconds"].items()},
+                    "students_data_rows": manifest["students_data_rows"],
+                    "output_mb": round(output_bytes / 1024 / 1024, 2),
+                    "baseline_rss_mb": manifest["baseline_rss_mb"],
+                    "peak_rss_mb": manifest["peak_rss_mb"],
+                    "peak_rss_growth_mb": round(manifest["peak_rss_mb"] - manifest["baseline_rss_mb"], 1),
+                }
+                results.append(result)
+                stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stage_seconds"].items())
+                logging.info(
+                    f"{students} students, {mode}{f' ({run})' if run else ''}: {result['status']} "
+                    f"({result['errors']} errors) in "
+                    f"{result['wall_time']:.2f}s, {result['rows_per_second']} rows/s, "
+                    f"peak RSS +{result['peak_rss_growth_mb']} MB ({stages})")
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Benchmark the subscriber pipeline modes on synthetic databases")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Numbers of unique students to generate")
+    parser.add_argument("--modes", nargs="+", choices=list(data_pipeline.MODES), default=list(data_pipeline.MODES))
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Directory for the generated databases")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0, help="Share of students with malformed contact_info JSON")
+    parser.add_argument("--null-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=data_pipeline.CHUNK_SIZE, help="Rows per chunk in streaming mode")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.modes, args.data_dir, args.duplicate_rate, args.malformed_rate,
+                             args.null_rate, args.seed, args.chunk_size)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
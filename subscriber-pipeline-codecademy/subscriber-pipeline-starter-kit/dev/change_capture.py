@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+HASH_TABLE = "students_data_row_hashes" # Content hash of every source row as of the last incremental run
+
+
+# Function to check if a table exists in the database
+def table_exists(con, table):
+    row = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+# Function to check if an incremental run has saved source hashes before
+def has_change_state(con):
+    return table_exists(con, HASH_TABLE) and con.execute(f"SELECT 1 FROM {HASH_TABLE} LIMIT 1").fetchone() is not None
+
+
+# Function to hash the content of every row, combined per key so keys with several rows get one hash
+def row_hashes(df, key):
+    hashes = pd.Series(pd.util.hash_pandas_object(df, index=False).to_numpy().view(np.int64), index=df.index)
+    return hashes.groupby(df[key]).agg(np.bitwise_xor.reduce)
+
+
+# Function to compare current hashes against the saved ones; returns (new or changed keys, deleted keys)
+def changed_keys(con, source, hashes):
+    saved = pd.read_sql_query(f"SELECT key, row_hash FROM {HASH_TABLE} WHERE source = ?", con, params=(source,))
+    saved = saved.set_index("key")["row_hash"]
+    current = hashes.reindex(saved.index)
+    changed = set(hashes.index.difference(saved.index)) | set(current.index[current.ne(saved)])
+    deleted = set(saved.index.difference(hashes.index))
+    return changed - deleted, deleted
+
+
+# Function to save the hashes of a source table; with changed/deleted keys only those rows are written
+def save_hashes(con, source, hashes, changed=None, deleted=()):
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {HASH_TABLE} (
+            source TEXT,
+            key INTEGER,
+            row_hash INTEGER,
+            PRIMARY KEY (source, key)
+        )""")
+    if changed is None:
+        con.execute(f"DELETE FROM {HASH_TABLE} WHERE source = ?", (source,))
+        changed = hashes.index
+    con.executemany(
+        f"DELETE FROM {HASH_TABLE} WHERE source = ? AND key = ?", ((source, int(key)) for key in deleted))
+    con.executemany(
+        f"INSERT OR REPLACE INTO {HASH_TABLE} (source, key, row_hash) VALUES (?, ?, ?)",
+        ((source, int(key), int(hashes[key])) for key in changed))
+
+
+# Function to delete the rows of a table whose key is in keys
+def delete_keys(con, table, key, keys):
+    con.execute("CREATE TEMP TABLE IF NOT EXISTS stale_keys (key INTEGER PRIMARY KEY)")
+    con.execute("DELETE FROM temp.stale_keys")
+    con.executemany("INSERT OR IGNORE INTO temp.stale_keys VALUES (?)", ((int(value),) for value in keys))
+    con.execute(f"DELETE FROM {table} WHERE {key} IN (SELECT key FROM temp.stale_keys)")
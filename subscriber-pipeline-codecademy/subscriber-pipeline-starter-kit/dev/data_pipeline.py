@@ -1,24 +1,61 @@
+import argparse
 import sqlite3
 import pandas as pd
 import json
 import logging
+import tempfile
+import time
 import unittest
+from unittest import mock
 import os
+import csv
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from pathlib import Path
+from change_capture import changed_keys, delete_keys, has_change_state, row_hashes, save_hashes, table_exists
+from sql_transform import build_students_data, count_duplicates, count_students, export_table, invalid_contact_info
+from loader import TableLoader, create_indexes, insert_rows, load_table
+from streaming import SeenRows, build_lookup
+from schema import STUDENTS_DATA_SCHEMA, cast_frame
+from manifest import LATEST_MANIFEST, RunManifest, promote, read_manifest
 
-# Create a logger
+# full rebuilds students_data in pandas on every update, incremental only reprocesses changed students,
+# pushdown runs the whole transform inside SQLite, streaming processes students in chunks with bounded memory
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "full")
+CHUNK_SIZE = int(os.getenv("PIPELINE_CHUNK_SIZE", 50000)) # Rows read at a time in streaming mode and csv exports
+STUDENTS_DATA_INDEXES = ["uuid", "career_path_id", "job_id"] # Columns downstream lookups filter on
+CONTACT_FIELDS = ["mailing_address", "email"] # Fields unpacked from the contact_info JSON
+WATCH_INTERVAL = float(os.getenv("PIPELINE_WATCH_INTERVAL", 0.05)) # Seconds between change checks in watch mode
+DB_FILE = 'cademycode_updated.db'
+DB_TABLE = "students_data"
+FILE_PATH = "students_data.csv"
+LOG_DIR = '../log' # Log, version, last modified time and run manifests
+LOG_FILE = os.path.join(LOG_DIR, 'data_pipeline.log')
+VERSION_FILE = os.path.join(LOG_DIR, 'version.txt')
+LAST_MODIFIED_FILE = os.path.join(LOG_DIR, 'last_modified_time.txt')
+PROD_DIR = '../prod'
+BATCH_OUTPUT_DIR = "sources" # Batch mode writes <source>/students_data.csv here
+BATCH_STATE_DIR = os.path.join(LOG_DIR, 'sources') # and keeps each source's log dir files in <source>/ here
+
+# Create a logger; handlers are set up by configure_logging when the pipeline runs as a script
 logger = logging.getLogger(__name__)
-logging.basicConfig(
-    filename='../log/data_pipeline.log', 
-    level=logging.DEBUG, 
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    datefmt='%m/%d/%Y %H:%M:%S'
-)
+version = 0 # Version of the current run, used in log messages
+run_manifest = RunManifest() # Status, row counts and stage timings of the current run
+
+# Function to send the pipeline logs to the log file
+def configure_logging(log_file=LOG_FILE):
+    logging.basicConfig(
+        filename=log_file, 
+        level=logging.DEBUG, 
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%m/%d/%Y %H:%M:%S',
+        force=True
+    )
 
 # Function to check if the database has been updates since the last run
-def read_last_modified_time():
+def read_last_modified_time(last_modified_file=LAST_MODIFIED_FILE):
     try:
-        with open('../log/last_modified_time.txt', 'r') as f:
+        with open(last_modified_file, 'r') as f:
             timestamp_str = f.read().strip()
             if timestamp_str:
                 return datetime.fromisoformat(timestamp_str)
@@ -29,9 +66,9 @@ def read_last_modified_time():
         return None
 
 # Function to write last modified time to a file
-def write_last_modified_time(modified_time):
+def write_last_modified_time(modified_time, last_modified_file=LAST_MODIFIED_FILE):
     try:
-        with open('../log/last_modified_time.txt', 'w') as f:
+        with open(last_modified_file, 'w') as f:
             logger.info(f"last_modified_time.txt has been updated: {modified_time.isoformat()}")
             f.write(modified_time.isoformat())
     except Exception as e:
@@ -39,7 +76,7 @@ def write_last_modified_time(modified_time):
         return None
 
 # Function to check if the database has been updated
-def is_database_updated(db_file):
+def is_database_updated(db_file, last_modified_file=LAST_MODIFIED_FILE):
     if not os.path.exists(db_file):
         logger.error(f"Database file {db_file} not found.")
         return False
@@ -50,10 +87,10 @@ def is_database_updated(db_file):
         current_modified_time = datetime.fromtimestamp(file_modified_time)
         logger.debug(f'Current modified time is {current_modified_time}')
         
-        last_modified_time = read_last_modified_time()
+        last_modified_time = read_last_modified_time(last_modified_file)
         logger.debug(f'Last modified time is {last_modified_time}')
         if last_modified_time is None or current_modified_time > last_modified_time:
-            write_last_modified_time(current_modified_time)
+            write_last_modified_time(current_modified_time, last_modified_file)
             return True
         return False
     except Exception as e:
@@ -69,9 +106,9 @@ def to_json(row, field):
         return None
 
 # Function to read version from a file
-def read_version():
+def read_version(version_file=VERSION_FILE):
     try:
-        with open('../log/version.txt', 'r') as file:
+        with open(version_file, 'r') as file:
             version = int(file.read().strip())
             return version
     except FileNotFoundError:
@@ -79,129 +116,648 @@ def read_version():
         return 1  # Default version
 
 # Function to write updated version to a file
-def write_version(version):
+def write_version(version, version_file=VERSION_FILE):
     try:
-        with open('../log/version.txt', 'w') as file:
+        with open(version_file, 'w') as file:
             file.write(f"{version}")
     except Exception as e:
         logger.error(f"Error writing to the file: {e}")
         return
 
 # Function to keep track of versions
-def change_version():
+def change_version(version_file=VERSION_FILE):
     global version
     version += 1
     logger.info(f"Version is updated to {version}")
-    write_version(version)
-
-# Connection to database and data processing unit
-try:  
-    db_file = 'cademycode_updated.db'
-    last_modified_time = read_last_modified_time()
-    version = read_version()
-    change_version()
+    write_version(version, version_file)
+
+# Function to read a source table into a dataframe, dropping duplicated rows
+def read_source_table(con, table, label):
+    df = pd.read_sql_query(f"""SELECT * FROM {table}""", con)
+
+    duplicates_count = df.duplicated().sum()
+    if duplicates_count > 0:
+        logger.warning(f"Version {version}: {label} table contains {duplicates_count} duplicates")
+        df = df.drop_duplicates()
+    return df
+
+# Function to clean the students table: unpack contact info, fill empty values and fix data types
+def clean_students(df_students):
+    # Unpack contact_info column into separate columns for address and email
+    for field in CONTACT_FIELDS:
+        df_students[field] = df_students['contact_info'].apply(lambda x: to_json(x, field))
+    df_students = df_students.drop(columns= {'contact_info'})
+
+    # Reorder colums logically and rename
+    df_students = df_students[["uuid", "name", "dob", "sex", "mailing_address", "email", "job_id", "num_course_taken", "current_career_path_id", "time_spent_hrs"]]
+    df_students = df_students.rename(columns={"current_career_path_id":"career_path_id"})
+
+    # Fill in empty values; numbers may be stored as text like '7.0'
+    for col in ['job_id', 'num_course_taken', 'career_path_id', 'time_spent_hrs']:
+        df_students[col] = pd.to_numeric(df_students[col]).fillna(0)
+
+    # Change data types to the compact students_data types
+    return cast_frame(df_students)
+
+# Function to read the courses table and change data types
+def read_courses(con):
+    df_courses = read_source_table(con, "cademycode_courses", "cademycode_courses")
+    return df_courses.astype({'career_path_id': 'int64', 'hours_to_complete': 'int64'})
+
+# Function to read the jobs table and change data types
+def read_jobs(con):
+    df_jobs = read_source_table(con, "cademycode_student_jobs", "cademycode_job")
+    return df_jobs.astype({'job_id': 'int64', 'avg_salary': 'int64'})
+
+# Function to join students data with job and courses
+def join_students(df_students, df_courses, df_jobs):
+    df_merged = pd.merge(df_students, df_courses,  how='left', left_on="career_path_id", right_on="career_path_id")
+    df_final = pd.merge(df_merged, df_jobs, how="left", left_on="job_id", right_on="job_id")
+
+    df_final["job_category"] = df_final["job_category"].fillna('Unknown')
+    df_final["avg_salary"] = df_final["avg_salary"].fillna(0)
+    df_final["career_path_name"] = df_final["career_path_name"].fillna('Unknown')
+    df_final["hours_to_complete"] = df_final["hours_to_complete"].fillna(0)
+
+    # if hours spent equals or more than needed hours to complete a path - then true
+    df_final['_completed_path'] = df_final['time_spent_hrs'] > df_final['hours_to_complete']
+    return cast_frame(df_final)
+
+# Function to enrich students with course and job attributes from lookup dicts; same fill rules as join_students
+def enrich_students(df_students, courses, jobs):
+    df_students["career_path_name"] = df_students["career_path_id"].map(courses["career_path_name"]).fillna('Unknown')
+    df_students["hours_to_complete"] = df_students["career_path_id"].map(courses["hours_to_complete"]).fillna(0)
+    df_students["job_category"] = df_students["job_id"].map(jobs["job_category"]).fillna('Unknown')
+    df_students["avg_salary"] = df_students["job_id"].map(jobs["avg_salary"]).fillna(0)
+
+    # if hours spent equals or more than needed hours to complete a path - then true
+    df_students['_completed_path'] = df_students['time_spent_hrs'] > df_students['hours_to_complete']
+    return cast_frame(df_students)
+
+# Courses and jobs tables kept between runs of a long-running process. Both tables are small, so their raw rows
+# are compared on every run and the dataframes and lookup dicts are only rebuilt when something changed.
+class LookupTables:
+    def __init__(self):
+        self.source_rows = None
+
+    def refresh(self, con):
+        source_rows = [con.execute(f"SELECT * FROM {table}").fetchall()
+                       for table in ("cademycode_courses", "cademycode_student_jobs")]
+        if source_rows != self.source_rows:
+            self.courses = read_courses(con)
+            self.jobs = read_jobs(con)
+            self.course_lookup, self.duplicated_paths = build_lookup(self.courses, "career_path_id", ["career_path_name", "hours_to_complete"])
+            self.job_lookup, self.duplicated_jobs = build_lookup(self.jobs, "job_id", ["job_category", "avg_salary"])
+            self.source_rows = source_rows
+        return self
+
+# Function to check if the join didn't duplicate or drop students
+def check_row_counts(df_student_row_count, df_student_data_row_count):
+    # checking if the table doesn't contain duplicated student as a result of the join
+    if df_student_row_count == df_student_data_row_count:
+        logger.info(f"Version {version}: Number of students remains the same after the join")
+    else: 
+        logger.error(f"Version {version}: Number of students changes after the join")
+
+# Function to export the students_data table to a csv file in chunks, without loading it into memory at once
+def export_students_data(con, file_path):
+    columns = ", ".join(STUDENTS_DATA_SCHEMA)
+    chunks = pd.read_sql_query(f"""SELECT {columns} FROM students_data ORDER BY uuid""", con, chunksize=CHUNK_SIZE)
+    header = True
+    with open(file_path, "w", newline="") as f:
+        for chunk in chunks:
+            cast_frame(chunk).to_csv(f, index=False, header=header)
+            header = False
+
+# Function to build the result of a run: students going into the join, rows coming out of it and,
+# when the mode holds it in memory, the final dataframe
+def run_result(df_student_row_count, df_student_data_row_count, df_final=None):
+    return {
+        "student_rows": df_student_row_count,
+        "students_data_rows": df_student_data_row_count,
+        "df_final": df_final,
+    }
+
+# Full mode: students_data is rebuilt in pandas from all source rows
+def run_full(con, db_table, file_path, lookups=None):
+    # Read sql into a dataframe
+    with run_manifest.stage("read"):
+        lookups = (lookups or LookupTables()).refresh(con)
+        df_raw = read_source_table(con, "cademycode_students", "cademycode_students")
+
+    with run_manifest.stage("transform"):
+        df_students = clean_students(df_raw)
+
+        df_student_row_count = df_students.shape[0]
+        logger.info(f"Version {version}: Number of line before the join: {df_student_row_count}")
+
+        # joining students data with job and courses
+        df_final = join_students(df_students, lookups.courses, lookups.jobs)
+
+    df_student_data_row_count = df_final.shape[0]
+    logger.info(f"Version {version}: Number of lines after the join: {df_student_data_row_count}")
+    check_row_counts(df_student_row_count, df_student_data_row_count)
+
+    # load the final table into the database and export as a csv file
+    with run_manifest.stage("load"):
+        load_table(con, db_table, df_final, STUDENTS_DATA_SCHEMA, STUDENTS_DATA_INDEXES)
+    logger.info(f"Version {version}: Updating the DB table - {db_table}")
+
+    with run_manifest.stage("export"):
+        df_final.to_csv(file_path, index=False)
+    logger.info(f"Version {version}: Exporting file to {file_path}")
+    return run_result(df_student_row_count, df_student_data_row_count, df_final)
+
+# Incremental mode: only students whose source rows changed (by content hash), or whose course or job
+# changed, are transformed and upserted into students_data. Runs without saved hashes rebuild everything.
+def run_incremental(con, db_table, file_path, lookups=None):
+    with run_manifest.stage("read"):
+        lookups = (lookups or LookupTables()).refresh(con)
+        df_raw = read_source_table(con, "cademycode_students", "cademycode_students")
+    df_courses = lookups.courses
+    df_jobs = lookups.jobs
+
+    with run_manifest.stage("change_capture"):
+        hashes = {
+            "cademycode_students": row_hashes(df_raw, "uuid"),
+            "cademycode_courses": row_hashes(df_courses, "career_path_id"),
+            "cademycode_student_jobs": row_hashes(df_jobs, "job_id"),
+        }
+
+        rebuild = not has_change_state(con) or not table_exists(con, db_table)
+        if rebuild:
+            logger.info(f"Version {version}: No change state found, rebuilding {db_table}")
+            df_changed = df_raw
+            stale_uuids = set()
+        else:
+            changes = {source: changed_keys(con, source, source_hashes) for source, source_hashes in hashes.items()}
+            changed_uuids, deleted_uuids = changes["cademycode_students"]
+            changed_paths, deleted_paths = changes["cademycode_courses"]
+            changed_jobs, deleted_jobs = changes["cademycode_student_jobs"]
+
+            # Students pointing at a changed or removed course or job need their joined columns refreshed
+            path_ids = pd.to_numeric(df_raw['current_career_path_id']).fillna(0)
+            job_ids = pd.to_numeric(df_raw['job_id']).fillna(0)
+            affected = df_raw['uuid'].isin(changed_uuids) \
+                | path_ids.isin(changed_paths | deleted_paths) \
+                | job_ids.isin(changed_jobs | deleted_jobs)
+            df_changed = df_raw[affected]
+            stale_uuids = set(df_changed['uuid']) | deleted_uuids
+            logger.info(
+                f"Version {version}: {len(changed_uuids)} changed and {len(deleted_uuids)} deleted students, "
+                f"{len(changed_paths | deleted_paths)} changed courses, {len(changed_jobs | deleted_jobs)} changed jobs")
+
+    df_student_row_count = df_changed.shape[0]
+    logger.info(f"Version {version}: Number of line before the join: {df_student_row_count}")
+    with run_manifest.stage("transform"):
+        df_final = join_students(clean_students(df_changed), df_courses, df_jobs)
+    df_student_data_row_count = df_final.shape[0]
+    logger.info(f"Version {version}: Number of lines after the join: {df_student_data_row_count}")
+    check_row_counts(df_student_row_count, df_student_data_row_count)
+
+    # Rows and hashes are replaced in one transaction, so a failed run is retried in full next time.
+    # A rebuild swaps in the new table first; if saving the hashes fails the next run rebuilds again.
+    with run_manifest.stage("load"):
+        if rebuild:
+            load_table(con, db_table, df_final, STUDENTS_DATA_SCHEMA, STUDENTS_DATA_INDEXES)
+        with con:
+            if not rebuild:
+                # Tables written before the loader existed have no indexes yet
+                create_indexes(con, db_table, STUDENTS_DATA_INDEXES)
+                delete_keys(con, db_table, "uuid", stale_uuids)
+                insert_rows(con, db_table, df_final, STUDENTS_DATA_SCHEMA)
+            for source, source_hashes in hashes.items():
+                if rebuild:
+                    save_hashes(con, source, source_hashes)
+                else:
+                    save_hashes(con, source, source_hashes, *changes[source])
+    logger.info(f"Version {version}: Upserted {df_student_data_row_count} rows into the DB table - {db_table}")
+
+    with run_manifest.stage("export"):
+        export_students_data(con, file_path)
+    logger.info(f"Version {version}: Exporting file to {file_path}")
+    return run_result(df_student_row_count, df_student_data_row_count, df_final)
+
+# Pushdown mode: the transform runs as a single query inside SQLite and the csv file is streamed from the
+# resulting table, so no table is materialized in pandas
+def run_pushdown(con, db_table, file_path, lookups=None):
+    with run_manifest.stage("read"):
+        for table, label in [("cademycode_students", "cademycode_students"), ("cademycode_courses", "cademycode_courses"),
+                             ("cademycode_student_jobs", "cademycode_job")]:
+            duplicates_count = count_duplicates(con, table)
+            if duplicates_count > 0:
+                logger.warning(f"Version {version}: {label} table contains {duplicates_count} duplicates")
+
+        df_student_row_count = count_students(con)
+        # Logged once per field, as to_json does, so a malformed row fails the run in every mode
+        for contact_info in invalid_contact_info(con):
+            for _ in CONTACT_FIELDS:
+                logger.error(f"Version {version}: Failed to parse JSON in row: {contact_info}")
+    logger.info(f"Version {version}: Number of line before the join: {df_student_row_count}")
+    # The transform and the load are one INSERT ... SELECT
+    with run_manifest.stage("load"):
+        df_student_data_row_count = build_students_data(con, db_table, STUDENTS_DATA_INDEXES)
+    logger.info(f"Version {version}: Number of lines after the join: {df_student_data_row_count}")
+    check_row_counts(df_student_row_count, df_student_data_row_count)
+    logger.info(f"Version {version}: Updating the DB table - {db_table}")
+
+    with run_manifest.stage("export"):
+        export_table(con, db_table, file_path)
+    logger.info(f"Version {version}: Exporting file to {file_path}")
+    # The rows only exist in the DB table and the csv file
+    return run_result(df_student_row_count, df_student_data_row_count)
+
+# Streaming mode: students are read, cleaned, enriched and appended to the DB table and the csv file chunk by chunk.
+# Courses and jobs are held as lookup dicts and duplicates across chunks are caught through a set of row hashes,
+# so memory is bounded by the chunk size instead of the number of students.
+def run_streaming(con, db_table, file_path, lookups=None):
+    with run_manifest.stage("read"):
+        lookups = (lookups or LookupTables()).refresh(con)
+    courses, jobs = lookups.course_lookup, lookups.job_lookup
+    for label, count in [("cademycode_courses", lookups.duplicated_paths), ("cademycode_job", lookups.duplicated_jobs)]:
+        if count > 0:
+            logger.warning(f"Version {version}: {label} table has {count} ids with more than one row, keeping the first")
+
+    seen = SeenRows()
+    duplicates_count = 0
+    df_student_row_count = df_student_data_row_count = 0
+    # Chunks go into a shadow table that replaces students_data once every chunk is in
+    with TableLoader(con, db_table, STUDENTS_DATA_SCHEMA, STUDENTS_DATA_INDEXES) as loader:
+        chunks = pd.read_sql_query("""SELECT * FROM cademycode_students""", con, chunksize=CHUNK_SIZE)
+        for i, df_chunk in enumerate(run_manifest.timed("read", chunks)):
+            with run_manifest.stage("transform"):
+                duplicated = seen.duplicated(df_chunk)
+                duplicates_count += int(duplicated.sum())
+                df_students = clean_students(df_chunk[~duplicated].copy())
+                df_student_row_count += df_students.shape[0]
+
+                df_students = enrich_students(df_students, courses, jobs)
+            with run_manifest.stage("load"):
+                loader.append(df_students)
+            with run_manifest.stage("export"):
+                df_students.to_csv(file_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            df_student_data_row_count += df_students.shape[0]
+
+    if duplicates_count > 0:
+        logger.warning(f"Version {version}: cademycode_students table contains {duplicates_count} duplicates")
+    logger.info(f"Version {version}: Number of line before the join: {df_student_row_count}")
+    logger.info(f"Version {version}: Number of lines after the join: {df_student_data_row_count}")
+    check_row_counts(df_student_row_count, df_student_data_row_count)
+    logger.info(f"Version {version}: Updating the DB table - {db_table}")
+    logger.info(f"Version {version}: Exporting file to {file_path}")
+    # The rows only exist in the DB table and the csv file
+    return run_result(df_student_row_count, df_student_data_row_count)
+
+
+MODES = {
+    "full": run_full,
+    "incremental": run_incremental,
+    "pushdown": run_pushdown,
+    "streaming": run_streaming,
+}
+
+# Function to run the transform in the given mode over an open connection; returns the run_result
+def run_pipeline(con, mode=PIPELINE_MODE, db_table=DB_TABLE, file_path=FILE_PATH, lookups=None):
+    if mode not in MODES:
+        raise ValueError(f"Unknown pipeline mode {mode!r}, expected one of {', '.join(MODES)}")
+    return MODES[mode](con, db_table, file_path, lookups)
+
+# Function to run the pipeline for the current version, logging errors against that version and writing
+# the run's manifest to state_dir
+def run_version(con, db_file, mode, db_table, file_path, lookups=None, state_dir=LOG_DIR):
+    logger.info(f"Version {version}: Database is updated, executing the pipeline")
+    run_manifest.start(version, mode, db_file, db_table, logger)
+    try:
+        result = run_pipeline(con, mode, db_table, file_path, lookups)
+    except Exception as e:
+        logger.error(f"Version {version}: Error running the pipeline: {e}")
+        run_manifest.finish("failed", error=str(e))
+        raise
+    else:
+        run_manifest.finish("success", result, outputs=[file_path])
+        return result
+    finally:
+        run_manifest.write(state_dir)
+
+# Function to run the pipeline once if the database changed since the last run, as data_pipeline.sh does.
+# The log, version, last modified time and manifests are kept in state_dir.
+def run_once(db_file=DB_FILE, mode=PIPELINE_MODE, db_table=DB_TABLE, file_path=FILE_PATH, state_dir=LOG_DIR):
+    global version
+    version_file = os.path.join(state_dir, "version.txt")
+    version = read_version(version_file)
+    change_version(version_file)
     with sqlite3.connect(db_file) as con:
         logger.info(f"Version {version}: Connected to the database")
-        cur = con.cursor()
-        
-        if is_database_updated(db_file):
-            logger.info(f"Version {version}: Database is updated, executing the pipeline")
-            
-            # Read sql into a dataframe
-            students_query = """SELECT * FROM cademycode_students"""
-            df_students = pd.read_sql_query(students_query, con)
-          
-            df_students_duplicates_count = df_students.duplicated().sum()
-            if df_students_duplicates_count > 0:
-                logger.warning(f"Version {version}: cademycode_students table contains {df_students_duplicates_count} duplicates")
-                df_students = df_students.drop_duplicates()
-
-            # Unpack contact_info column into separate columns for address and email
-            df_students['mailing_address'] = df_students['contact_info'].apply(lambda x: to_json(x, 'mailing_address'))
-            df_students['email'] = df_students['contact_info'].apply(lambda x: to_json(x, 'email'))
-            df_students = df_students.drop(columns= {'contact_info'})
-
-            # Reorder colums logically and rename
-            df_students = df_students[["uuid", "name", "dob", "sex", "mailing_address", "email", "job_id", "num_course_taken", "current_career_path_id", "time_spent_hrs"]]
-            df_students = df_students.rename(columns={"current_career_path_id":"career_path_id"})
-
-            # Fill in empty values
-            df_students['job_id'] = df_students['job_id'].fillna(0)
-            df_students['num_course_taken'] = df_students['num_course_taken'].fillna(0)
-            df_students['career_path_id'] = df_students['career_path_id'].fillna(0)
-            df_students['time_spent_hrs'] = df_students['time_spent_hrs'].fillna(0)
-
-            # Change data types for numerical columns
-            df_students = df_students.astype({'job_id': 'float64', 'num_course_taken': 'float64', 'career_path_id': 'float64', 'time_spent_hrs': 'float64'})
-            df_students = df_students.astype({'job_id': 'int64', 'num_course_taken': 'int64', 'career_path_id': 'int64'})
-
-            # read sql into a dataframe and change data_types
-            courses_query = """SELECT * FROM cademycode_courses"""
-            df_courses = pd.read_sql_query(courses_query, con)
-          
-            df_courses_duplicates_count = df_courses.duplicated().sum()
-            if df_courses_duplicates_count > 0:
-                logger.warning(f"Version {version}: cademycode_courses table contains {df_courses_duplicates_count} duplicates")
-                df_courses = df_courses.drop_duplicates()
-            
-            df_courses = df_courses.astype({'career_path_id': 'int64', 'hours_to_complete': 'int64'})
-
-            # read sql into a dataframe and change data_types
-            jobs_query = """SELECT * FROM cademycode_student_jobs"""
-            df_jobs = pd.read_sql_query(jobs_query, con)
-          
-            df_jobs_duplicates_count = df_jobs.duplicated().sum()
-            if df_jobs_duplicates_count > 0:
-                logger.warning(f"Version {version}: cademycode_job table contains {df_jobs_duplicates_count} duplicates")
-                df_jobs = df_jobs.drop_duplicates()
-          
-            df_jobs = df_jobs.astype({'job_id': 'int64', 'avg_salary': 'int64'})
-
-            df_student_row_count = df_students.shape[0]
-            logger.info(f"Version {version}: Number of line before the join: {df_student_row_count}")
-
-            # joining students data with job and courses
-            df_merged = pd.merge(df_students, df_courses,  how='left', left_on="career_path_id", right_on="career_path_id")
-            df_final = pd.merge(df_merged, df_jobs, how="left", left_on="job_id", right_on="job_id")
-
-            df_student_data_row_count = df_final.shape[0]
-            logger.info(f"Version {version}: Number of lines after the join: {df_student_data_row_count}")
-
-            df_final["job_category"] = df_final["job_category"].fillna('Unknown')
-            df_final["avg_salary"] = df_final["avg_salary"].fillna(0)
-            df_final["career_path_name"] = df_final["career_path_name"].fillna('Unknown')
-            df_final["hours_to_complete"] = df_final["hours_to_complete"].fillna(0)
-
-            # checking if the table doesn't contain duplicated student as a result of the join
-            if df_student_row_count == df_student_data_row_count:
-                logger.info(f"Version {version}: Number of students remains the same after the join")
-            else: 
-                logger.error(f"Version {version}: Number of students changes after the join")
-
-            # if hours spent equals or more than needed hours to complete a path - then true
-            df_final['_completed_path'] = (df_final['time_spent_hrs'] > df_final['hours_to_complete']).fillna(False)
-
-            # load the final table into the database and export as a csv file
-            db_table = "students_data"
-            df_final.to_sql(name=db_table, con=con, if_exists="replace")
-            logger.info(f"Version {version}: Updating the DB table - {db_table}")
-
-            file_path = "students_data.csv"
-            df_final.to_csv(file_path, index=False)
-            logger.info(f"Version {version}: Exporting file to {file_path}")
-        else: 
-            logger.info(f"Version {version}: Database has no updates")
-
-except Exception as e:
-      logger.error(f"Version {version}: Error running the pipeline: {e}")
-      raise
+
+        if is_database_updated(db_file, os.path.join(state_dir, "last_modified_time.txt")):
+            return run_version(con, db_file, mode, db_table, file_path, state_dir=state_dir)
+        logger.info(f"Version {version}: Database has no updates")
+        run_manifest.start(version, mode, db_file, db_table, logger)
+        run_manifest.finish("skipped")
+        run_manifest.write(state_dir)
+        return None
+
+# Function to get what identifies the current state of the database: the file's inode changes when the file
+# is replaced, and PRAGMA data_version changes whenever another connection commits to it
+def database_state(con, db_file):
+    return os.stat(db_file).st_ino, con.execute("PRAGMA data_version").fetchone()[0]
+
+# Watch mode: a long-running process that keeps the connection and the lookup tables warm and runs the pipeline
+# as soon as another process commits to the database. The check is a stat call and a pragma read, cheap enough
+# to poll every few milliseconds. A failed run is logged and the process waits for the next change.
+def watch(db_file=DB_FILE, mode=PIPELINE_MODE, db_table=DB_TABLE, file_path=FILE_PATH, poll_interval=WATCH_INTERVAL,
+          state_dir=LOG_DIR):
+    global version
+    version_file = os.path.join(state_dir, "version.txt")
+    last_modified_file = os.path.join(state_dir, "last_modified_time.txt")
+    version = read_version(version_file)
+    lookups = LookupTables()
+    con = None
+    inode = None
+    last_state = None
+    logger.info(f"Watching {db_file} for changes every {poll_interval}s in {mode} mode")
+    try:
+        while True:
+            if not os.path.exists(db_file):
+                time.sleep(poll_interval)
+                continue
+            if con is None or os.stat(db_file).st_ino != inode:
+                # The file was replaced: the old connection would keep reading the old file
+                replaced = con is not None
+                if replaced:
+                    con.close()
+                con = sqlite3.connect(db_file)
+                inode = os.stat(db_file).st_ino
+                logger.info(f"Version {version}: Connected to the database")
+                # On startup, a database that hasn't changed since the last run isn't processed again
+                if replaced or is_database_updated(db_file, last_modified_file):
+                    last_state = None
+                else:
+                    last_state = database_state(con, db_file)
+
+            if database_state(con, db_file) != last_state:
+                change_version(version_file)
+                try:
+                    run_version(con, db_file, mode, db_table, file_path, lookups, state_dir)
+                except Exception:
+                    con.rollback()
+                # The pipeline's own writes don't change data_version, so this state is the one it just processed
+                last_state = database_state(con, db_file)
+                write_last_modified_time(datetime.fromtimestamp(os.stat(db_file).st_mtime), last_modified_file)
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        logger.info(f"Version {version}: Stopped watching {db_file}")
+    finally:
+        if con is not None:
+            con.close()
+
+# Function to name each source database after its file, adding parent directories until the names are unique.
+# The file extension is left out unless that makes two names collide, as with a.db and a.sqlite.
+# Returns {name: path}.
+def source_names(db_files):
+    paths = list(dict.fromkeys(os.path.abspath(db_file) for db_file in db_files))
+    for depth in range(1, max((len(Path(path).parts) for path in paths), default=0) + 1):
+        for strip_suffix in (True, False):
+            names = ["_".join((Path(path).with_suffix("") if strip_suffix else Path(path)).parts[-depth:]).strip("/")
+                     for path in paths]
+            if len(set(names)) == len(names):
+                return dict(zip(names, paths))
+    if paths:
+        raise ValueError(f"Can't name the source databases uniquely: {paths}")
+    return {}
+
+# Function to run the pipeline for one source database in a worker process. Each source has its own log,
+# version, last modified time and manifests under state_dir/<name> and its csv file under output_dir/<name>.
+def run_source(name, db_file, mode, output_dir=BATCH_OUTPUT_DIR, state_dir=BATCH_STATE_DIR):
+    # sqlite3.connect would create an empty database for a mistyped path
+    if not os.path.exists(db_file):
+        raise FileNotFoundError(f"Database file {db_file} not found")
+    source_state_dir = os.path.join(state_dir, name)
+    source_output_dir = os.path.join(output_dir, name)
+    os.makedirs(source_state_dir, exist_ok=True)
+    os.makedirs(source_output_dir, exist_ok=True)
+    configure_logging(os.path.join(source_state_dir, "data_pipeline.log"))
+
+    file_path = os.path.join(source_output_dir, FILE_PATH)
+    run_once(db_file, mode, DB_TABLE, file_path, state_dir=source_state_dir)
+    # The final dataframe stays in the worker, only the manifest is sent back
+    return run_manifest.data
+
+# Function to concatenate the per-source csv files into one file with a leading source column, row by row;
+# returns the number of sources written
+def consolidate(names, output_dir, file_path):
+    tmp_path = f"{file_path}.tmp"
+    header_written = False
+    written = 0
+    with open(tmp_path, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        for name in names:
+            source_file = os.path.join(output_dir, name, FILE_PATH)
+            if not os.path.exists(source_file):
+                logger.warning(f"Source {name}: No {FILE_PATH} yet, leaving it out of {file_path}")
+                continue
+            with open(source_file, newline="") as source:
+                reader = csv.reader(source)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                if not header_written:
+                    writer.writerow(["source"] + header)
+                    header_written = True
+                writer.writerows([name] + row for row in reader)
+                written += 1
+    # Readers never see a half-written file
+    os.replace(tmp_path, file_path)
+    return written
+
+# Batch mode: every source database is processed in a process pool, so the total time scales with the number
+# of cores rather than the number of sources. A failed source is logged and doesn't stop the others.
+# Sources without updates keep their last csv file, which still goes into the consolidated file;
+# failed sources are left out of it, since their csv file is from an earlier run.
+# Returns {name: manifest of the source's run}, with None for sources whose worker raised.
+def run_batch(db_files, mode=PIPELINE_MODE, output_dir=BATCH_OUTPUT_DIR, state_dir=BATCH_STATE_DIR,
+              workers=None, consolidated_path=None):
+    sources = source_names(db_files)
+    logger.info(f"Running the pipeline for {len(sources)} sources in {mode} mode")
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_source, name, db_file, mode, output_dir, state_dir): name
+                   for name, db_file in sources.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                manifest = results[name] = future.result()
+            except Exception as e:
+                logger.error(f"Source {name}: Error running the pipeline: {e}")
+                results[name] = None
+                continue
+            if manifest["status"] == "success":
+                logger.info(f"Source {name}: Version {manifest['version']} wrote {manifest['students_data_rows']} rows in {manifest['duration_seconds']:.2f}s")
+            elif manifest["status"] == "skipped":
+                logger.info(f"Source {name}: Version {manifest['version']} has no updates")
+            else:
+                logger.error(f"Source {name}: Version {manifest['version']} failed, check its log for more details")
+
+    if consolidated_path:
+        succeeded = [name for name in sources if results[name] is not None and results[name]["status"] != "failed"]
+        for name in sources:
+            if name not in succeeded:
+                logger.warning(f"Source {name}: Leaving it out of {consolidated_path} as its run failed")
+        written = consolidate(succeeded, output_dir, consolidated_path)
+        logger.info(f"Consolidated {written} of {len(sources)} sources into {consolidated_path}")
+    return results
 
 class TestDataPipeline(unittest.TestCase):
+    # Every mode runs against an in-memory copy of the database, so the tests don't touch the real DB table or csv file
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.results = {}
+        source = sqlite3.connect(DB_FILE)
+        for mode in MODES:
+            con = sqlite3.connect(":memory:")
+            source.backup(con)
+            result = run_pipeline(con, mode, DB_TABLE, os.path.join(cls.tmp_dir.name, f"{mode}.csv"))
+            # Pushdown and streaming modes leave the rows in the DB table only
+            if result["df_final"] is None:
+                result["df_final"] = pd.read_sql_query(f"SELECT * FROM {DB_TABLE}", con)
+            cls.results[mode] = result
+            con.close()
+        source.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
     def test_number_of_rows(self):
-        self.assertEqual(df_student_row_count, df_student_data_row_count, "The number of rows changed during transformation")
+        for mode, result in self.results.items():
+            with self.subTest(mode=mode):
+                self.assertEqual(result["student_rows"], result["students_data_rows"], "The number of rows changed during transformation")
     
     def test_no_null_values(self):
-        self.assertFalse(df_final.isnull().values.any(), "There are null values in the final table")
+        for mode, result in self.results.items():
+            with self.subTest(mode=mode):
+                self.assertFalse(result["df_final"].isnull().values.any(), "There are null values in the final table")
+
+    # A synthetic database with duplicates, malformed JSON and NULLs gives the same csv file in every mode; chunks
+    # are small enough that duplicates in streaming mode cross chunk boundaries
+    def test_modes_agree_on_synthetic_data(self):
+        # Imported here so production runs don't load the generator
+        from synthetic_data import generate
+
+        db_file = os.path.join(self.tmp_dir.name, "synthetic.db")
+        generate(db_file, 3000, duplicate_rate=0.05, malformed_rate=0.01, null_rate=0.1, seed=1)
+        outputs, manifests = {}, {}
+        with mock.patch.dict(globals(), CHUNK_SIZE=700), self.assertLogs(logger, level="WARNING"):
+            for mode in MODES:
+                con = sqlite3.connect(":memory:")
+                source = sqlite3.connect(db_file)
+                source.backup(con)
+                source.close()
+                file_path = os.path.join(self.tmp_dir.name, f"synthetic_{mode}.csv")
+                run_version(con, db_file, mode, DB_TABLE, file_path, state_dir=os.path.join(self.tmp_dir.name, mode))
+                manifests[mode] = run_manifest.data
+                con.close()
+                with open(file_path) as f:
+                    outputs[mode] = f.read()
+        # The malformed contact_info rows are logged as errors and fail the run in every mode
+        self.assertEqual(manifests["full"]["status"], "failed")
+        self.assertGreater(manifests["full"]["log_records"].get("ERROR", 0), 0)
+        for mode, output in outputs.items():
+            with self.subTest(mode=mode):
+                self.assertEqual(output, outputs["full"], f"{mode} mode output differs from full mode")
+                self.assertEqual(manifests[mode]["status"], manifests["full"]["status"])
+                self.assertEqual(manifests[mode]["log_records"].get("ERROR"), manifests["full"]["log_records"].get("ERROR"))
+
+    # The loader switches the database to WAL for the load only, so the source file keeps its journal mode
+    def test_database_keeps_its_journal_mode(self):
+        db_file = os.path.join(self.tmp_dir.name, "journal_mode.db")
+        source = sqlite3.connect(DB_FILE)
+        con = sqlite3.connect(db_file)
+        source.backup(con)
+        source.close()
+        with self.assertLogs(logger, level="INFO"):
+            run_pipeline(con, "pushdown", DB_TABLE, os.path.join(self.tmp_dir.name, "journal_mode.csv"))
+        self.assertEqual(con.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        con.close()
+        self.assertFalse(os.path.exists(f"{db_file}-wal"))
+
+    # Edits to every source table between two incremental runs give the same csv file as a full run of the edited database
+    def test_incremental_run_after_source_edits_matches_full(self):
+        source = sqlite3.connect(DB_FILE)
+        con = sqlite3.connect(":memory:")
+        source.backup(con)
+        source.close()
+        incremental_path = os.path.join(self.tmp_dir.name, "edited_incremental.csv")
+        full_path = os.path.join(self.tmp_dir.name, "edited_full.csv")
+        with self.assertLogs(logger, level="INFO"):
+            run_pipeline(con, "incremental", DB_TABLE, incremental_path)
+            with con:
+                con.execute("UPDATE cademycode_students SET name = 'Edited Name', time_spent_hrs = '99.0' WHERE uuid = 1")
+                con.execute("DELETE FROM cademycode_students WHERE uuid = 2")
+                con.execute("UPDATE cademycode_courses SET hours_to_complete = hours_to_complete + 5 WHERE career_path_id = 8")
+                con.execute("UPDATE cademycode_student_jobs SET avg_salary = avg_salary + 1000 WHERE job_id = 7")
+                con.execute("""
+                    INSERT INTO cademycode_students
+                    SELECT (SELECT MAX(uuid) + 1 FROM cademycode_students), 'New Student', dob, sex, contact_info, job_id,
+                        num_course_taken, current_career_path_id, time_spent_hrs
+                    FROM cademycode_students WHERE uuid = 3""")
+            result = run_pipeline(con, "incremental", DB_TABLE, incremental_path)
+
+            full_con = sqlite3.connect(":memory:")
+            con.backup(full_con)
+            con.close()
+            run_pipeline(full_con, "full", DB_TABLE, full_path)
+            full_con.close()
+
+        # Only the edited and inserted students and the students of the changed course and job are transformed
+        self.assertGreater(result["student_rows"], 2)
+        self.assertLess(result["student_rows"], 6000)
+        with open(incremental_path) as incremental, open(full_path) as full:
+            self.assertEqual(incremental.read(), full.read())
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Clean and join the subscriber tables into students_data")
+    parser.add_argument("command", nargs="?", choices=["run", "watch", "batch", "promote", "test"], default="run",
+                        help="run the pipeline once if the database changed (default), keep watching it, "
+                             "run it for several source databases, promote the last run's files to prod, or run the tests")
+    parser.add_argument("sources", nargs="*", help="Source databases for batch mode")
+    parser.add_argument("--mode", choices=list(MODES), default=PIPELINE_MODE, help="Pipeline mode, PIPELINE_MODE by default")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="Seconds between change checks in watch mode")
+    parser.add_argument("--output-dir", default=BATCH_OUTPUT_DIR, help="Directory for the per-source csv files in batch mode")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes in batch mode, one per core by default")
+    parser.add_argument("--consolidated", default=None, help="Also write every source's rows into this csv file in batch mode")
+    parser.add_argument("--state-dir", default=LOG_DIR, help="Directory with the run manifests to promote from")
+    parser.add_argument("--prod-dir", default=PROD_DIR, help="Directory to promote the files of a successful run to")
+    args = parser.parse_args()
+    # argparse doesn't check the default against the choices, so a mistyped PIPELINE_MODE would get through
+    if args.mode not in MODES:
+        parser.error(f"PIPELINE_MODE {args.mode!r} is not a valid mode, choose from {', '.join(MODES)}")
+
+    if args.command == "test":
+        unittest.main(argv=[parser.prog])
+    if args.command == "promote":
+        # Prints the outcome for data_pipeline.sh and exits with an error if there is nothing good to promote
+        manifest = read_manifest(os.path.join(args.state_dir, LATEST_MANIFEST))
+        if manifest is None:
+            raise SystemExit(f"No run manifest found in {args.state_dir}")
+        if manifest["status"] == "skipped":
+            print(f"Pipeline version {manifest['version']} found no updates, nothing to promote.")
+            raise SystemExit(0)
+        if manifest["status"] != "success":
+            raise SystemExit(f"Pipeline failed in version {manifest['version']}. Check the logs for more details.")
+        print(f"Pipeline version {manifest['version']} completed successfully.")
+        for path in promote(manifest, args.prod_dir):
+            print(f"File promoted to {path}")
+        raise SystemExit(0)
+    configure_logging()
+    if args.command == "watch":
+        watch(mode=args.mode, poll_interval=args.interval)
+    elif args.command == "batch":
+        if not args.sources:
+            parser.error("batch needs at least one source database")
+        results = run_batch(args.sources, args.mode, args.output_dir, workers=args.workers, consolidated_path=args.consolidated)
+        if any(manifest is None or manifest["status"] == "failed" for manifest in results.values()):
+            raise SystemExit(1)
+    else:
+        run_once(mode=args.mode)
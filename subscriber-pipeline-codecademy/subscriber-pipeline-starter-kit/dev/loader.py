@@ -0,0 +1,94 @@
+import itertools
+
+# Pragmas for bulk loads: WAL lets readers keep reading the old table during a load,
+# and with WAL synchronous=NORMAL is still safe against corruption. journal_mode is stored in the
+# database file, so the loader puts the previous one back once the load is over.
+LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000, # 64 MB page cache
+    "temp_store": "MEMORY",
+}
+BATCH_SIZE = 10000 # Rows per executemany call
+
+
+# Function to apply the bulk load pragmas to a connection
+def apply_pragmas(con, pragmas=LOAD_PRAGMAS):
+    for name, value in pragmas.items():
+        con.execute(f"PRAGMA {name} = {value}")
+
+
+# Function to create the lookup indexes of a table if they don't exist yet
+def create_indexes(con, table, indexes):
+    for col in indexes:
+        con.execute(f"CREATE INDEX IF NOT EXISTS {table}_{col} ON {table} ({col})")
+
+
+# Function to turn a dataframe into rows of plain Python values in the schema's column order, with NULLs for missing values
+def to_rows(df, columns):
+    df = df.reindex(columns=columns).astype(object)
+    return df.where(df.notna(), None).itertuples(index=False, name=None)
+
+
+# Function to insert a dataframe into a table in batches
+def insert_rows(con, table, df, schema):
+    insert = f"INSERT INTO {table} ({', '.join(schema)}) VALUES ({', '.join(['?'] * len(schema))})"
+    rows = to_rows(df, list(schema))
+    while batch := list(itertools.islice(rows, BATCH_SIZE)):
+        con.executemany(insert, batch)
+
+
+# Loads a table into a shadow copy and swaps it in place of the live table. The load, the swap and the
+# index builds happen in one transaction, so readers see the old table until the new one is complete.
+#
+#   with TableLoader(con, "students_data", schema, ["uuid"]) as loader:
+#       loader.append(df)
+class TableLoader:
+    def __init__(self, con, table, schema, indexes=()):
+        self.con = con
+        self.table = table
+        self.shadow_table = f"{table}__shadow"
+        self.schema = schema
+        self.indexes = indexes
+        self.rows = 0
+
+    def __enter__(self):
+        # journal_mode can only change outside a transaction
+        self.con.commit()
+        self.journal_mode = self.con.execute("PRAGMA journal_mode").fetchone()[0]
+        apply_pragmas(self.con)
+        self.con.execute("BEGIN IMMEDIATE")
+        columns = ", ".join(f"{col} {col_type}" for col, col_type in self.schema.items())
+        self.con.execute(f"DROP TABLE IF EXISTS {self.shadow_table}")
+        self.con.execute(f"CREATE TABLE {self.shadow_table} ({columns})")
+        return self
+
+    def append(self, df):
+        insert_rows(self.con, self.shadow_table, df, self.schema)
+        self.rows += len(df)
+
+    # Function to fill the shadow table from a query whose columns follow the schema's order
+    def insert_from(self, query):
+        cursor = self.con.execute(f"INSERT INTO {self.shadow_table} ({', '.join(self.schema)}) {query}")
+        self.rows += cursor.rowcount
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.con.rollback()
+        else:
+            self.con.execute(f"DROP TABLE IF EXISTS {self.table}")
+            self.con.execute(f"ALTER TABLE {self.shadow_table} RENAME TO {self.table}")
+            # Indexes are built once the rows are in, which is cheaper than maintaining them row by row
+            create_indexes(self.con, self.table, self.indexes)
+            self.con.commit()
+        # Leaving WAL checkpoints the load into the database file, so a change to the source is still
+        # seen in its modification time
+        self.con.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        return False
+
+
+# Function to load a whole dataframe as the new contents of a table
+def load_table(con, table, df, schema, indexes=()):
+    with TableLoader(con, table, schema, indexes) as loader:
+        loader.append(df)
+    return loader.rows
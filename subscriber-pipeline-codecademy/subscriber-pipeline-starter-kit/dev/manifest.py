@@ -0,0 +1,157 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+LATEST_MANIFEST = "latest_run.json" # Manifest of the last run, next to version.txt
+RUNS_DIR = "runs" # Manifest of every run, as run-<version>.json
+PROD_MANIFEST = "manifest.json" # Manifest of the run whose files are in prod
+
+
+# Function to get the sha256 checksum of a file, reading it in blocks
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to describe an output file for the manifest
+def describe_output(path):
+    return {"path": os.path.abspath(path), "bytes": os.path.getsize(path), "sha256": file_checksum(path)}
+
+
+# Function to write a json file atomically so nobody reads a half-written manifest
+def write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Function to read a manifest, or None if there is none yet
+def read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# Counts the warnings and errors logged during a run; any error fails the run, like grepping the log for ERROR did
+class LogCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.counts = Counter()
+
+    def emit(self, record):
+        self.counts[record.levelname] += 1
+
+
+# Status, row counts, stage timings and output files of one pipeline run, written as json once the run ends.
+# Stages that run several times, like the chunks of streaming mode, are summed.
+class RunManifest:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.data = {}
+        self.stages = Counter()
+        self.started = None
+        self.log_counter = None
+        self.logger = None
+
+    # Function to start recording a run, counting the records of the given logger
+    def start(self, version, mode, db_file, db_table, logger):
+        self.reset()
+        self.started = time.perf_counter()
+        self.data = {
+            "version": version,
+            "mode": mode,
+            "db_file": os.path.abspath(db_file),
+            "db_table": db_table,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.log_counter = LogCounter()
+        self.logger = logger
+        logger.addHandler(self.log_counter)
+
+    # Context manager timing a stage
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - started
+
+    # Function to time how long each item of an iterable, such as a chunked query, takes to produce
+    def timed(self, name, iterable):
+        iterator = iter(iterable)
+        done = object()
+        while True:
+            with self.stage(name):
+                item = next(iterator, done)
+            if item is done:
+                return
+            yield item
+
+    # Function to end the run; the status is success, failed or skipped, and a success with logged errors fails
+    def finish(self, status, result=None, outputs=(), error=None):
+        if self.logger is not None:
+            self.logger.removeHandler(self.log_counter)
+        log_records = dict(self.log_counter.counts) if self.log_counter else {}
+        if status == "success" and log_records.get("ERROR"):
+            status = "failed"
+        self.data.update({
+            "status": status,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "duration_seconds": time.perf_counter() - self.started if self.started is not None else None,
+            "student_rows": result["student_rows"] if result else None,
+            "students_data_rows": result["students_data_rows"] if result else None,
+            "stage_seconds": dict(self.stages),
+            "log_records": log_records,
+            "outputs": [describe_output(path) for path in outputs if os.path.exists(path)],
+            "error": error,
+        })
+        return self.data
+
+    # Function to write the manifest to state_dir/runs and as the latest run
+    def write(self, state_dir):
+        write_json_atomic(os.path.join(state_dir, RUNS_DIR, f"run-{self.data['version']}.json"), self.data)
+        write_json_atomic(os.path.join(state_dir, LATEST_MANIFEST), self.data)
+
+
+# Function to copy the outputs of a successful run into prod_dir. Each file is checked against the manifest's
+# checksum, copied next to its destination and renamed over it, so prod never holds a partial file. The manifest
+# is copied last and records which run prod holds; promoting the same run again does nothing.
+def promote(manifest, prod_dir):
+    if manifest.get("status") != "success":
+        raise ValueError(f"Version {manifest.get('version')} has status {manifest.get('status')}, not promoting it")
+    prod_manifest_path = os.path.join(prod_dir, PROD_MANIFEST)
+    prod_manifest = read_manifest(prod_manifest_path)
+    if prod_manifest is not None and prod_manifest.get("outputs") == manifest["outputs"]:
+        return []
+
+    os.makedirs(prod_dir, exist_ok=True)
+    promoted = []
+    for output in manifest["outputs"]:
+        if file_checksum(output["path"]) != output["sha256"]:
+            raise ValueError(f"{output['path']} changed since version {manifest['version']} wrote it")
+        prod_path = os.path.join(prod_dir, os.path.basename(output["path"]))
+        tmp_path = f"{prod_path}.tmp"
+        shutil.copyfile(output["path"], tmp_path)
+        if file_checksum(tmp_path) != output["sha256"]:
+            os.remove(tmp_path)
+            raise ValueError(f"Copy of {output['path']} doesn't match its checksum")
+        os.replace(tmp_path, prod_path)
+        promoted.append(prod_path)
+    write_json_atomic(prod_manifest_path, manifest)
+    return promoted
@@ -0,0 +1,49 @@
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+# Arrow-backed strings when pyarrow is installed, pandas' own nullable strings otherwise
+STRING = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+
+# Column contract of students_data, in output order: the SQLite type of the DB table and the pandas dtype of
+# in-memory frames. Low-cardinality text is categorical, integers are right-sized, free text is a nullable
+# string and floats stay float64 so the csv file keeps the same digits.
+STUDENTS_DATA_COLUMNS = {
+    "uuid": ("INTEGER", "int32"),
+    "name": ("TEXT", STRING),
+    "dob": ("TEXT", STRING),
+    "sex": ("TEXT", "category"),
+    "mailing_address": ("TEXT", STRING),
+    "email": ("TEXT", STRING),
+    "job_id": ("INTEGER", "int16"),
+    "num_course_taken": ("INTEGER", "int16"),
+    "career_path_id": ("INTEGER", "int16"),
+    "time_spent_hrs": ("REAL", "float64"),
+    "career_path_name": ("TEXT", "category"),
+    "hours_to_complete": ("REAL", "float64"),
+    "job_category": ("TEXT", "category"),
+    "avg_salary": ("INTEGER", "int32"),
+    "_completed_path": ("INTEGER", "bool"),
+}
+STUDENTS_DATA_SCHEMA = {col: sql_type for col, (sql_type, _) in STUDENTS_DATA_COLUMNS.items()}
+STUDENTS_DATA_DTYPES = {col: dtype for col, (_, dtype) in STUDENTS_DATA_COLUMNS.items()}
+BOOLEAN_COLUMNS = [col for col, dtype in STUDENTS_DATA_DTYPES.items() if dtype == "bool"]
+
+
+# Function to check that an integer column fits its right-sized type, since astype would silently wrap around
+def check_range(series, dtype):
+    if series.empty:
+        return
+    info = np.iinfo(dtype)
+    if series.min() < info.min or series.max() > info.max:
+        raise ValueError(f"{series.name} has values outside the {dtype} range ({info.min} to {info.max})")
+
+
+# Function to cast the students_data columns present in a frame to their schema dtypes in one astype pass
+def cast_frame(df, dtypes=STUDENTS_DATA_DTYPES):
+    dtypes = {col: dtype for col, dtype in dtypes.items() if col in df.columns}
+    for col, dtype in dtypes.items():
+        if pd.api.types.is_integer_dtype(dtype):
+            check_range(df[col], dtype)
+    return df.astype(dtypes)
@@ -0,0 +1,100 @@
+import csv
+
+from loader import TableLoader
+from schema import BOOLEAN_COLUMNS, STUDENTS_DATA_SCHEMA
+
+STUDENT_COLUMNS = ["uuid", "name", "dob", "sex", "contact_info", "job_id", "num_course_taken", "current_career_path_id", "time_spent_hrs"]
+COURSE_COLUMNS = ["career_path_id", "career_path_name", "hours_to_complete"]
+JOB_COLUMNS = ["job_id", "job_category", "avg_salary"]
+
+
+# Function to cast a text column holding numbers like '7.0' to an integer, with NULLs as 0
+def as_integer(column):
+    return f"CAST(CAST(COALESCE({column}, 0) AS REAL) AS INTEGER)"
+
+
+# Function to number the copies of identical rows, in table order, so only the first copy is kept
+def first_copies(table, columns):
+    return f"""
+        SELECT *, rowid AS source_order,
+            ROW_NUMBER() OVER (PARTITION BY {", ".join(columns)} ORDER BY rowid) AS copy
+        FROM {table}"""
+
+
+# Same cleaning, join and fill rules as the pandas transform, as one query: exact duplicates are dropped
+# with a window, contact_info is parsed by SQLite's JSON functions (malformed JSON gives NULLs), empty
+# values are filled with COALESCE and rows keep the order the pandas merges produce
+STUDENTS_DATA_QUERY = f"""
+    WITH students AS (
+        SELECT *,
+            {as_integer("job_id")} AS job_key,
+            {as_integer("current_career_path_id")} AS career_path_key
+        FROM ({first_copies("cademycode_students", STUDENT_COLUMNS)})
+        WHERE copy = 1
+    ),
+    courses AS ({first_copies("cademycode_courses", COURSE_COLUMNS)}),
+    jobs AS ({first_copies("cademycode_student_jobs", JOB_COLUMNS)})
+    SELECT
+        s.uuid,
+        s.name,
+        s.dob,
+        s.sex,
+        CASE WHEN json_valid(s.contact_info) THEN json_extract(s.contact_info, '$.mailing_address') END,
+        CASE WHEN json_valid(s.contact_info) THEN json_extract(s.contact_info, '$.email') END,
+        s.job_key,
+        {as_integer("s.num_course_taken")},
+        s.career_path_key,
+        CAST(COALESCE(s.time_spent_hrs, 0) AS REAL),
+        COALESCE(c.career_path_name, 'Unknown'),
+        CAST(COALESCE(c.hours_to_complete, 0) AS REAL),
+        COALESCE(j.job_category, 'Unknown'),
+        COALESCE(j.avg_salary, 0),
+        CAST(COALESCE(s.time_spent_hrs, 0) AS REAL) > COALESCE(c.hours_to_complete, 0)
+    FROM students s
+    LEFT JOIN courses c ON c.copy = 1 AND c.career_path_id = s.career_path_key
+    LEFT JOIN jobs j ON j.copy = 1 AND j.job_id = s.job_key
+    ORDER BY s.source_order, c.source_order, j.source_order"""
+
+
+# Function to count the rows of a table that are exact duplicates of an earlier row
+def count_duplicates(con, table):
+    return con.execute(f"SELECT COUNT(*) - (SELECT COUNT(*) FROM (SELECT DISTINCT * FROM {table})) FROM {table}").fetchone()[0]
+
+
+# Function to count the students left after dropping duplicates, i.e. the rows going into the join
+def count_students(con):
+    return con.execute(f"""
+        SELECT COUNT(*) FROM ({first_copies("cademycode_students", STUDENT_COLUMNS)}) WHERE copy = 1""").fetchone()[0]
+
+
+# Function to list, in table order, the contact_info of the students that isn't valid JSON; the join leaves
+# their mailing address and email NULL
+def invalid_contact_info(con):
+    return [row[0] for row in con.execute(f"""
+        SELECT contact_info FROM ({first_copies("cademycode_students", STUDENT_COLUMNS)})
+        WHERE copy = 1 AND NOT COALESCE(json_valid(contact_info), 0)
+        ORDER BY source_order""")]
+
+
+# Function to build the students_data table inside SQLite and swap it in; returns its row count
+def build_students_data(con, table, indexes=()):
+    with TableLoader(con, table, STUDENTS_DATA_SCHEMA, indexes) as loader:
+        loader.insert_from(STUDENTS_DATA_QUERY)
+    return loader.rows
+
+
+# Function to stream a table into a csv file straight from the cursor, writing booleans as True/False
+def export_table(con, table, file_path, batch_size=50000):
+    cursor = con.execute(f"SELECT {', '.join(STUDENTS_DATA_SCHEMA)} FROM {table} ORDER BY rowid")
+    boolean_positions = [list(STUDENTS_DATA_SCHEMA).index(col) for col in BOOLEAN_COLUMNS]
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(STUDENTS_DATA_SCHEMA)
+        while rows := cursor.fetchmany(batch_size):
+            if boolean_positions:
+                rows = [list(row) for row in rows]
+                for row in rows:
+                    for position in boolean_positions:
+                        if row[position] is not None:
+                            row[position] = bool(row[position])
+            writer.writerows(rows)
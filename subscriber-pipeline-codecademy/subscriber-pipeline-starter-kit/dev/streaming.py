@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+
+# Set of 64-bit row hashes kept as one sorted numpy array (8 bytes per row), for spotting rows
+# that duplicate a row from an earlier chunk
+class SeenRows:
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    # Function to get a mask of the chunk's rows that were seen before, in this chunk or an earlier one,
+    # and remember the rest
+    def duplicated(self, df):
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        positions = np.searchsorted(self.hashes, hashes).clip(max=max(len(self.hashes) - 1, 0))
+        seen_before = (self.hashes[positions] == hashes) if len(self.hashes) else np.zeros(len(hashes), dtype=bool)
+        duplicated = seen_before | pd.Series(hashes).duplicated().to_numpy()
+        self.hashes = np.union1d(self.hashes, hashes[~duplicated])
+        return duplicated
+
+
+# Function to turn a small table into {column: {key: value}} dicts for enriching chunks with Series.map;
+# returns the lookup and the number of keys that had more than one row (the first row is kept)
+def build_lookup(df, key, columns):
+    duplicated_keys = df[key].duplicated()
+    df = df[~duplicated_keys].set_index(key)
+    return {col: df[col].to_dict() for col in columns}, int(duplicated_keys.sum())
@@ -0,0 +1,134 @@
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+
+from loader import apply_pragmas
+
+# The source tables as they are in cademycode.db: numbers in the students table are stored as text like '7.0'
+STUDENTS_TABLE = """
+    CREATE TABLE cademycode_students (
+        uuid INTEGER,
+        name VARCHAR,
+        dob VARCHAR,
+        sex TEXT,
+        contact_info JSON,
+        job_id VARCHAR,
+        num_course_taken VARCHAR,
+        current_career_path_id VARCHAR,
+        time_spent_hrs VARCHAR
+    )"""
+COURSES_TABLE = "CREATE TABLE cademycode_courses (career_path_id BIGINT, career_path_name TEXT, hours_to_complete BIGINT)"
+JOBS_TABLE = "CREATE TABLE cademycode_student_jobs (job_id BIGINT, job_category TEXT, avg_salary BIGINT)"
+
+COURSES = [
+    (1, "data scientist", 20), (2, "data engineer", 20), (3, "data analyst", 12), (4, "software engineering", 25),
+    (5, "backend engineer", 18), (6, "frontend engineer", 20), (7, "iOS developer", 27), (8, "android developer", 27),
+    (9, "machine learning engineer", 35), (10, "ux/ui designer", 15),
+]
+# The jobs table of cademycode.db has three duplicated rows, kept here
+JOBS = [
+    (1, "analytics", 86000), (2, "engineer", 101000), (3, "software developer", 110000), (4, "creative", 66000),
+    (5, "financial services", 135000), (6, "education", 61000), (7, "HR", 80000), (8, "student", 10000),
+    (9, "healthcare", 120000), (0, "other", 80000), (3, "software developer", 110000), (4, "creative", 66000),
+    (5, "financial services", 135000),
+]
+JOB_WEIGHTS = [92, 804, 818, 777, 772, 752, 746, 780, 337, 108] # Students per job_id 0-9 in cademycode.db
+
+FIRST_NAMES = ["Annabelle", "Micah", "Hosea", "Mariann", "Lucio", "Dorothy", "Jonah", "Ingrid", "Omar", "Priya",
+               "Wendell", "Yuki", "Carmen", "Tobias", "Esther", "Rafael", "Greta", "Kofi", "Lena", "Mateo"]
+LAST_NAMES = ["Avery", "Rubio", "Dale", "Kirk", "Alexander", "Nguyen", "Okafor", "Schmidt", "Haddad", "Patel",
+              "Moreno", "Tanaka", "Lindqvist", "Boateng", "Kowalski", "Fischer", "Oyelaran", "Reyes", "Walsh", "Chen"]
+STREETS = ["N Timber Key", "Crescent Fair", "SE Wintergreen Isle", "Cinder Cliff", "Amber Hill", "Fallen Leaf Way",
+           "Old Mill Rd", "Harbor View", "Quiet Pine Ct", "W Market St"]
+CITIES = ["Irondale", "Shoals", "Lane", "Doyles borough", "St. Bonaventure", "Maple Falls", "Riverton", "Eastport"]
+STATES = ["Wisconsin", "Indiana", "Arkansas", "Rhode Island", "Virginia", "Oregon", "Texas", "Maine", "Ohio", "Utah"]
+EMAIL_DOMAINS = ["woohoo.com", "hmail.com", "coldmail.com", "inlook.com"]
+
+GENERATE_PRAGMAS = {"journal_mode": "OFF", "synchronous": "OFF"} # A generated database is thrown away if generation fails
+BATCH_SIZE = 100000 # Students generated and inserted at a time
+
+
+# Function to format numbers the way the source stores them, e.g. 7 as '7.0', with None for NULLs
+def as_text(values, nulls):
+    return [None if null else str(value) for value, null in zip(values.tolist(), nulls.tolist())]
+
+
+# Function to generate the rows of count students starting at first_uuid
+def student_rows(rng, first_uuid, count, null_rate, malformed_rate):
+    first_names = rng.choice(FIRST_NAMES, count).tolist()
+    last_names = rng.choice(LAST_NAMES, count).tolist()
+    names = [f"{first} {last}" for first, last in zip(first_names, last_names)]
+    dobs = (np.datetime64("1942-01-01") + rng.integers(0, 63 * 365, count)).astype(str).tolist()
+    sexes = rng.choice(["F", "M", "N"], count, p=[0.4, 0.4, 0.2]).tolist()
+
+    addresses = zip(rng.integers(1, 1000, count).tolist(), rng.choice(STREETS, count).tolist(),
+                    rng.choice(CITIES, count).tolist(), rng.choice(STATES, count).tolist(),
+                    rng.integers(10000, 99999, count).tolist())
+    emails = zip(first_names, last_names, rng.integers(1000, 9999, count).tolist(), rng.choice(EMAIL_DOMAINS, count).tolist())
+    contact_info = [
+        f'{{"mailing_address": "{number} {street}, {city}, {state}, {zip_code}", '
+        f'"email": "{first.lower()}_{last.lower()}{suffix}@{domain}"}}'
+        for (number, street, city, state, zip_code), (first, last, suffix, domain) in zip(addresses, emails)]
+    # Malformed JSON is simulated by cutting the object off halfway
+    for i in np.flatnonzero(rng.random(count) < malformed_rate).tolist():
+        contact_info[i] = contact_info[i][:len(contact_info[i]) // 2]
+
+    job_weights = np.array(JOB_WEIGHTS) / sum(JOB_WEIGHTS)
+    job_ids = as_text(rng.choice(len(JOB_WEIGHTS), count, p=job_weights).astype(float), rng.random(count) < null_rate)
+    courses_taken = as_text(rng.integers(0, 16, count).astype(float), rng.random(count) < null_rate)
+    # Students without a career path have no time spent either, as in the source
+    no_path = rng.random(count) < null_rate
+    path_ids = as_text(rng.integers(1, len(COURSES) + 1, count).astype(float), no_path)
+    hours = as_text(rng.uniform(0, 36, count).round(2), no_path)
+
+    uuids = range(first_uuid, first_uuid + count)
+    return zip(uuids, names, dobs, sexes, contact_info, job_ids, courses_taken, path_ids, hours)
+
+
+# Function to write a database of synthetic source tables with the given number of unique students.
+# duplicate_rate adds exact copies of random students at the end of the table (so they cross chunk boundaries),
+# malformed_rate truncates contact_info JSON and null_rate blanks job, course count and career path columns.
+# Returns the number of rows in the students table.
+def generate(db_file, students, duplicate_rate=0.01, malformed_rate=0.001, null_rate=0.05, seed=0):
+    if os.path.exists(db_file):
+        os.remove(db_file)
+    rng = np.random.default_rng(seed)
+    con = sqlite3.connect(db_file)
+    try:
+        apply_pragmas(con, GENERATE_PRAGMAS)
+        for create in (STUDENTS_TABLE, COURSES_TABLE, JOBS_TABLE):
+            con.execute(create)
+        con.executemany("INSERT INTO cademycode_courses VALUES (?, ?, ?)", COURSES)
+        con.executemany("INSERT INTO cademycode_student_jobs VALUES (?, ?, ?)", JOBS)
+
+        for first_uuid in range(1, students + 1, BATCH_SIZE):
+            count = min(BATCH_SIZE, students + 1 - first_uuid)
+            con.executemany("INSERT INTO cademycode_students VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            student_rows(rng, first_uuid, count, null_rate, malformed_rate))
+
+        duplicates = rng.integers(1, students + 1, int(students * duplicate_rate)) if students else []
+        con.execute("CREATE TEMP TABLE duplicate_rows (row INTEGER)")
+        con.executemany("INSERT INTO temp.duplicate_rows VALUES (?)", zip(np.sort(duplicates).tolist()))
+        con.execute("""
+            INSERT INTO cademycode_students
+            SELECT s.* FROM temp.duplicate_rows d JOIN cademycode_students s ON s.rowid = d.row""")
+        con.commit()
+        return con.execute("SELECT COUNT(*) FROM cademycode_students").fetchone()[0]
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic cademycode database for tests and benchmarks")
+    parser.add_argument("db_file", help="Database to create, replacing it if it exists")
+    parser.add_argument("--students", type=int, default=100000, help="Number of unique students")
+    parser.add_argument("--duplicate-rate", type=float, default=0.01, help="Share of students added again as exact duplicates")
+    parser.add_argument("--malformed-rate", type=float, default=0.001, help="Share of students with malformed contact_info JSON")
+    parser.add_argument("--null-rate", type=float, default=0.05, help="Share of NULLs in each nullable student column")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rows = generate(args.db_file, args.students, args.duplicate_rate, args.malformed_rate, args.null_rate, args.seed)
+    print(f"Wrote {rows} student rows to {args.db_file}")
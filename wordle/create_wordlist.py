@@ -1,17 +1,90 @@
-
+import argparse
+import os
 import pathlib
-import sys
-from string import ascii_letters
-
-in_path = pathlib.Path(sys.argv[1])
-out_path = pathlib.Path(sys.argv[2])
-
-words = sorted(
-    {
-        word.lower()
-        for word in in_path.read_text(encoding="utf-8").split()
-        if all(letter in ascii_letters for letter in word)
-    },
-    key=lambda word: (len(word), word),
-)
-out_path.write_text("\n".join(words))
\ No newline at end of file
+import re
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+WORD = re.compile(r"(?<!\S)[A-Za-z]+(?!\S)")  # whitespace-separated tokens made only of ASCII letters
+CHUNK_SIZE = 1 << 23  # characters read at a time, about 8 MB of text
+CORPUS_PATTERN = "*.txt"  # files read from directories given as input
+
+
+# Function to count the words of a chunk of text, lower case
+def count_words(text):
+    return Counter(map(str.lower, WORD.findall(text)))
+
+
+# Function to list the corpus files of the inputs, taking the text files under directories
+def corpus_files(inputs):
+    for path in map(pathlib.Path, inputs):
+        if path.is_dir():
+            yield from sorted(path.rglob(CORPUS_PATTERN))
+        else:
+            yield path
+
+
+# Function to read files in chunks of about chunk_size characters that end between two words, so no word is split
+def read_chunks(paths, chunk_size=CHUNK_SIZE):
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            tail = ""
+            while chunk := f.read(chunk_size):
+                text = tail + chunk
+                if text[-1].isspace():
+                    yield text
+                    tail = ""
+                    continue
+                # The last word may go on in the next chunk, so it is kept for that one
+                parts = text.rsplit(None, 1)
+                if len(parts) == 2:
+                    yield parts[0]
+                tail = parts[-1]
+            if tail:
+                yield tail
+
+
+# Function to count the words of the corpus files over a process pool. Only a few chunks per worker are read
+# ahead, so the memory used doesn't grow with the size of the corpus.
+def count_corpus(paths, workers=None, chunk_size=CHUNK_SIZE):
+    workers = workers or os.cpu_count() or 1
+    counts = Counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for text in read_chunks(paths, chunk_size):
+            pending.add(pool.submit(count_words, text))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts.update(future.result())
+        for future in pending:
+            counts.update(future.result())
+    return counts
+
+
+# Function to write the words sorted by length, then alphabetically
+def write_word_list(counts, out_path):
+    words = sorted(counts, key=lambda word: (len(word), word))
+    pathlib.Path(out_path).write_text("\n".join(words))
+
+
+# Function to write the words with how often they appear, most frequent first, one "word count" per line
+def write_frequencies(counts, out_path):
+    words = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    pathlib.Path(out_path).write_text("\n".join(f"{word} {count}" for word, count in words))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the word list and word frequencies of a text corpus")
+    parser.add_argument("inputs", nargs="+", help=f"corpus files, or directories of {CORPUS_PATTERN} files")
+    parser.add_argument("output", help="word list to write, sorted by length then alphabetically")
+    parser.add_argument("--frequencies", help="word frequencies to write, <output>_frequencies.txt by default")
+    parser.add_argument("--workers", type=int, help="worker processes, one per CPU by default")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="characters of text counted at a time")
+    args = parser.parse_args()
+
+    out_path = pathlib.Path(args.output)
+    frequencies_path = args.frequencies or out_path.with_name(f"{out_path.stem}_frequencies{out_path.suffix}")
+    counts = count_corpus(corpus_files(args.inputs), args.workers, args.chunk_size)
+    write_word_list(counts, out_path)
+    write_frequencies(counts, frequencies_path)
@@ -6,16 +6,22 @@ import contextlib
 from rich.console import Console
 from rich.theme import Theme
 from string import ascii_uppercase
+from solver import GREEN, YELLOW, Solver, score_guess
+from word_index import WordIndex
 
 console = Console()
 
 MAX_GUESSES = 6     #set a variable to determine the number of guesses
 WORD_LENGTH = 5     #set a variable to determine the length of the word
+HINT = '?'          #typing this instead of a guess asks the solver for the best next guess
+STYLES = {GREEN: 'bold white on green', YELLOW: 'bold white on yellow'}
 
 def main():
     # Pre-process
-    secret_word = get_random_word('word_list.txt')
+    word_index = WordIndex.open('word_list.txt')     #memory-mapped index of the word list, built the first time
+    secret_word = get_random_word(word_index)
     user_guesses = ["_" * WORD_LENGTH] * MAX_GUESSES
+    solver = None       #loaded on the first hint
 
     # Process (main loop)
     with contextlib.suppress(KeyboardInterrupt):
@@ -24,15 +30,21 @@ def main():
             refresh_screen(f'Guess #{guess_num + 1}')
             show_guesses(user_guesses, secret_word)
 
-            guess = input('\nYour Guess: ').upper()
+            guess = input(f'\nYour Guess ({HINT} for a hint): ').upper()
             while True:
-                if len(guess) != 5:
+                if guess == HINT:
+                    solver = solver or Solver.from_file('word_list.txt')
+                    show_hint(solver, user_guesses[:guess_num], secret_word)
+                    guess = input('Your Guess: ').upper()
+                elif len(guess) != 5:
                     guess = input('The guess should be a 5 letter word! \nTry again: ').upper()
                 elif guess in user_guesses:
                     print(f'You already guessed {guess}')
                     guess = input('Try again:').upper()
                 elif re.compile('[^A-Z]').search(guess):
                     guess = input('Word must contain only letters! \nTry again: ').upper()
+                elif guess not in word_index:
+                    guess = input(f'{guess} is not in the word list! \nTry again: ').upper()
                 else: 
                     break
 
@@ -46,34 +58,26 @@ def main():
     # Post-process
     game_over(user_guesses, secret_word, guessed_correctly=user_guesses[guess_num] == secret_word)
 
-def get_random_word(filename):
-    word_list = []      #create an empty list for storing words
-    #read a file and append into the list
-    with open(filename, 'r') as file:
-        word_list = [
-            word.replace('\n', '').upper() 
-            for word in file 
-            if len(word.replace('\n', '')) == 5
-            ]
-    return random.choice(word_list)      #randomly select a word from the list
+def get_random_word(word_index):
+    return word_index.random_word(WORD_LENGTH, random)      #randomly select a word of the right length from the index
 
 def show_guesses(guesses, secret_word):
     styled_alphabet = {letter:letter for letter in ascii_uppercase}
     for guess in guesses:
         styled_guess = []
-        for letter, correct in zip(guess, secret_word):
-            if letter == correct:
-                style = 'bold white on green'
-            elif letter in secret_word:
-                style = 'bold white on yellow"'
-            else: 
-                style = 'white on #666666'
+        for letter, score in zip(guess, score_guess(guess, secret_word)):
+            style = STYLES.get(score, 'white on #666666')
             styled_guess.append(f'[{style}]{letter}[/]')
             if letter != "_":
                 styled_alphabet[letter] = f'[{style}]{letter}[/]'
         console.print(''.join(styled_guess), justify="center")
     console.print("\n" + ''.join(styled_alphabet.values()), justify="center")
 
+def show_hint(solver, guesses, secret_word):
+    feedback = solver.feedback(guesses, secret_word)
+    candidates = solver.candidates(feedback)
+    console.print(f"[bold blue]Hint:[/] try {solver.best_guess(feedback)} ({len(candidates)} possible words left)")
+
 def refresh_screen(headline):
     console.clear()
     console.rule(f"[bold blue]:leafy_green: {headline} :leafy_green:[/]\n")
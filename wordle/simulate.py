@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from script import MAX_GUESSES, WORD_LENGTH
+from solver import Solver, load_matrix, pattern_code, read_words, score_guess
+
+WORD_LIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'word_list.txt')
+GAMES_PER_TASK = 64     #secret words sent to a worker at a time
+FAILED = 'X'            #key of the lost games in the guess distribution
+
+# Guesses the best word by expected information. Every game starts from the same opening and most games share
+# their first few steps, so the guess for each feedback seen so far is remembered.
+class EntropyStrategy:
+    def __init__(self, words):
+        self.solver = Solver(words, load_matrix(words))
+        self.guesses = {}
+
+    def guess(self, feedback, rng):
+        key = tuple(feedback)
+        if key not in self.guesses:
+            self.guesses[key] = self.solver.best_guess(feedback)
+        return self.guesses[key]
+
+# Guesses a random word that still fits the feedback, the way a careful player without a plan would
+class RandomCandidateStrategy:
+    def __init__(self, words):
+        self.solver = Solver(words, load_matrix(words))
+
+    def guess(self, feedback, rng):
+        candidates = self.solver.candidates(feedback)
+        return self.solver.words[rng.choice(candidates)] if len(candidates) else None
+
+# A strategy is built once per worker from the word list and asked for each guess with the feedback so far,
+# a list of (guess, pattern code), and a random generator seeded for the game
+STRATEGIES = {
+    'entropy': EntropyStrategy,
+    'random': RandomCandidateStrategy,
+}
+
+strategy = None     #the strategy of this worker process
+
+# Function to build the strategy of a worker process
+def init_worker(strategy_name, words):
+    global strategy
+    strategy = STRATEGIES[strategy_name](words)
+
+# Function to play one game against a secret word with the rules of the game in script.py.
+# Returns the number of guesses it took, or None if the word wasn't guessed in MAX_GUESSES.
+def play_game(strategy, secret_word, rng):
+    feedback = []
+    for guess_num in range(MAX_GUESSES):
+        guess = strategy.guess(feedback, rng)
+        if guess is None or len(guess) != WORD_LENGTH:
+            raise ValueError(f'{type(strategy).__name__} guessed {guess!r} playing {secret_word}')
+        if guess in (earlier for earlier, _ in feedback):
+            raise ValueError(f'{type(strategy).__name__} guessed {guess} twice playing {secret_word}')
+        if guess == secret_word:
+            return guess_num + 1
+        feedback.append((guess, pattern_code(score_guess(guess, secret_word))))
+    return None
+
+# Function to play a batch of secret words in a worker; each game gets its own seed so the results don't
+# depend on how the words were split between workers
+def play_games(secret_words, seed):
+    results = Counter()
+    for secret_word in secret_words:
+        guesses = play_game(strategy, secret_word, random.Random(f'{seed}-{secret_word}'))
+        results[guesses or FAILED] += 1
+    return results
+
+# Function to play every word of the list as the secret word with a strategy, fanned out over a process pool
+def simulate(strategy_name, words, workers=None, seed=0):
+    load_matrix(words)      #build the cached matrix once here, rather than in every worker
+    batches = [words[start:start + GAMES_PER_TASK] for start in range(0, len(words), GAMES_PER_TASK)]
+
+    started = time.perf_counter()
+    distribution = Counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(strategy_name, words)) as pool:
+        for results in pool.map(play_games, batches, [seed] * len(batches)):
+            distribution.update(results)
+    elapsed = time.perf_counter() - started
+
+    wins = {guesses: distribution[guesses] for guesses in range(1, MAX_GUESSES + 1)}
+    won = sum(wins.values())
+    return {
+        'strategy': strategy_name,
+        'games': len(words),
+        'distribution': {**wins, FAILED: distribution[FAILED]},
+        'failure_rate': distribution[FAILED] / len(words) if words else 0,
+        'average_guesses': sum(guesses * count for guesses, count in wins.items()) / won if won else None,
+        'seconds': elapsed,
+        'games_per_second': len(words) / elapsed if elapsed else None,
+    }
+
+# Function to print the results of a simulation with a bar per number of guesses
+def show_results(results):
+    print(f"\n{results['strategy']}: {results['games']} games in {results['seconds']:.2f} s "
+          f"({results['games_per_second']:.0f} games/s)")
+    largest = max(results['distribution'].values()) or 1
+    for guesses, count in results['distribution'].items():
+        print(f"  {guesses} {'#' * round(40 * count / largest):<40} {count}")
+    average = results['average_guesses']
+    print(f"  failure rate {results['failure_rate']:.2%}, average {average:.3f} guesses per win" if average is not None
+          else f"  failure rate {results['failure_rate']:.2%}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play every word of the word list as the secret word and report how a strategy does')
+    parser.add_argument('--strategy', nargs='+', choices=list(STRATEGIES), default=list(STRATEGIES), help='strategies to compare')
+    parser.add_argument('--word-list', default=WORD_LIST)
+    parser.add_argument('--workers', type=int, help='worker processes, one per CPU by default')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random choices of the strategies')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    words = read_words(args.word_list, WORD_LENGTH)
+    all_results = []
+    for strategy_name in args.strategy:
+        all_results.append(simulate(strategy_name, words, args.workers, args.seed))
+        show_results(all_results[-1])
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(all_results, file, indent=2)
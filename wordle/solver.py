@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+
+WORD_LENGTH = 5
+GREY, YELLOW, GREEN = 0, 1, 2
+PATTERNS = 3 ** WORD_LENGTH     # every coloring of a guess fits in a uint8
+ALL_GREEN = sum(GREEN * 3 ** i for i in range(WORD_LENGTH))
+BLOCK_SIZE = 512                # guesses scored at a time, to bound the memory of the (guesses, answers, letters) arrays
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+# Function to score a guess against the secret word the way show_guesses colors it: green if the letter is in the
+# right place, yellow if the letter is anywhere in the secret word, grey otherwise
+def score_guess(guess, secret_word):
+    scores = []
+    for letter, correct in zip(guess, secret_word):
+        if letter == correct:
+            scores.append(GREEN)
+        elif letter in secret_word:
+            scores.append(YELLOW)
+        else:
+            scores.append(GREY)
+    return scores
+
+# Function to pack the scores of a guess into one number, the first letter being the lowest base-3 digit
+def pattern_code(scores):
+    return sum(score * 3 ** i for i, score in enumerate(scores))
+
+# Function to read the playable words from a word list file, upper case as the game uses them
+def read_words(filename, word_length=WORD_LENGTH):
+    with open(filename, 'r') as file:
+        return [word.strip().upper() for word in file if len(word.strip()) == word_length]
+
+# Function to turn words into a (words, letters) array of letter codes
+def letter_codes(words):
+    return np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8).reshape(len(words), -1)
+
+# Function to compute the pattern code of every guess against every answer as a (guesses, answers) uint8 matrix
+def feedback_matrix(guesses, answers):
+    answer_letters = letter_codes(answers)
+    # One bit per letter of the alphabet for the letters in each answer
+    answer_masks = np.bitwise_or.reduce(np.left_shift(1, answer_letters - ord('A'), dtype=np.uint32), axis=1)
+    weights = (3 ** np.arange(answer_letters.shape[1])).astype(np.uint8)
+
+    matrix = np.empty((len(guesses), len(answers)), dtype=np.uint8)
+    for start in range(0, len(guesses), BLOCK_SIZE):
+        guess_letters = letter_codes(guesses[start:start + BLOCK_SIZE])[:, None, :]
+        green = guess_letters == answer_letters[None, :, :]
+        present = (answer_masks[None, :, None] >> (guess_letters - ord('A'))) & 1
+        scores = np.where(green, GREEN, present).astype(np.uint8)
+        matrix[start:start + BLOCK_SIZE] = (scores * weights).sum(axis=2, dtype=np.uint8)
+    return matrix
+
+# Function to load the feedback matrix of a word list from the cache, memory-mapped, building and caching it
+# the first time. The cache file is named after a hash of the words, so a changed list gets a new matrix, and
+# a cached file that is damaged or not a (words, words) uint8 matrix is built again.
+def load_matrix(words, cache_dir=CACHE_DIR):
+    digest = hashlib.sha1('\n'.join(words).encode('ascii')).hexdigest()[:16]
+    path = os.path.join(cache_dir, f'patterns-{digest}.npy')
+    if os.path.exists(path):
+        try:
+            matrix = np.load(path, mmap_mode='r')
+            if matrix.shape == (len(words), len(words)) and matrix.dtype == np.uint8:
+                return matrix
+        except (ValueError, EOFError):
+            pass
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.save(file, feedback_matrix(words, words))
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode='r')
+
+# Narrows down the possible secret words from the feedback of earlier guesses and suggests the next guess.
+# Every word in the list is both a possible guess and a possible answer.
+class Solver:
+    def __init__(self, words, matrix):
+        self.words = words
+        self.index = {word: i for i, word in enumerate(words)}
+        self.matrix = matrix
+
+    @classmethod
+    def from_file(cls, filename, cache_dir=CACHE_DIR):
+        words = read_words(filename)
+        return cls(words, load_matrix(words, cache_dir))
+
+    # Function to get the pattern codes of a guess against every word; guesses outside the list are scored on the fly
+    def patterns(self, guess):
+        if guess in self.index:
+            return self.matrix[self.index[guess]]
+        return feedback_matrix([guess], self.words)[0]
+
+    # Function to get the indexes of the words that would have given the feedback, a list of (guess, pattern code)
+    def candidates(self, feedback=()):
+        candidates = np.arange(len(self.words))
+        for guess, pattern in feedback:
+            candidates = candidates[self.patterns(guess)[candidates] == pattern]
+        return candidates
+
+    # Function to get the expected information, in bits, of every guess over the candidates
+    def entropies(self, candidates):
+        entropies = np.empty(len(self.words))
+        offsets = np.arange(BLOCK_SIZE, dtype=np.int64)[:, None] * PATTERNS
+        for start in range(0, len(self.words), BLOCK_SIZE):
+            block = np.asarray(self.matrix[start:start + BLOCK_SIZE][:, candidates], dtype=np.int64)
+            # Count the candidates per pattern for every guess in the block with one bincount
+            counts = np.bincount((block + offsets[:len(block)]).ravel(), minlength=len(block) * PATTERNS)
+            p = counts.reshape(len(block), PATTERNS) / len(candidates)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                entropies[start:start + len(block)] = -np.where(p > 0, p * np.log2(p), 0).sum(axis=1)
+        return entropies
+
+    # Function to get the guess that splits the candidates best; among equally good guesses a candidate is
+    # preferred, since it can also be the answer
+    def best_guess(self, feedback=()):
+        candidates = self.candidates(feedback)
+        if len(candidates) == 0:
+            return None
+        if len(candidates) <= 2:
+            return self.words[candidates[0]]
+        entropies = self.entropies(candidates)
+        best = np.flatnonzero(entropies >= entropies.max() - 1e-9)
+        best_candidates = np.intersect1d(best, candidates)
+        return self.words[(best_candidates if len(best_candidates) else best)[0]]
+
+    # Function to turn guesses made against a secret word into the feedback the solver works from
+    def feedback(self, guesses, secret_word):
+        return [(guess, pattern_code(score_guess(guess, secret_word))) for guess in guesses]
+
+if __name__ == '__main__':
+    filename = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'word_list.txt')
+    started = time.perf_counter()
+    solver = Solver.from_file(filename)
+    loaded = time.perf_counter()
+    guess = solver.best_guess()
+    print(f'{len(solver.words)} words, matrix loaded in {(loaded - started) * 1000:.1f} ms')
+    print(f'Best opening guess: {guess} ({(time.perf_counter() - loaded) * 1000:.1f} ms)')
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+
+from create_wordlist import corpus_files, count_corpus, count_words, read_chunks, write_frequencies, write_word_list
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pg11.txt')
+
+class TestCreateWordlist(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def test_chunks_never_split_a_word(self):
+        text = 'The  quick\nbrown fox, jumps over\tthe lazy dog. Supercalifragilistic!\n\nend'
+        path = self.write('text.txt', text)
+        for chunk_size in [1, 3, 7, 16, len(text)]:
+            with self.subTest(chunk_size=chunk_size):
+                chunks = list(read_chunks([path], chunk_size))
+                self.assertEqual(' '.join(chunks).split(), text.split())
+                self.assertEqual(sum(map(count_words, chunks), Counter()), count_words(text))
+
+    def test_words_are_ascii_letters_only(self):
+        self.assertEqual(count_words("The cat's hat, THE end café the"), Counter({'the': 3, 'end': 1}))
+
+    def test_corpus_files_of_a_directory_are_sorted(self):
+        b = self.write('corpus/b.txt', 'b')
+        a = self.write('corpus/nested/a.txt', 'a')
+        self.write('corpus/notes.md', 'skipped')
+        single = self.write('single.dat', 'kept')
+        self.assertEqual([str(path) for path in corpus_files([os.path.join(self.tmp_dir.name, 'corpus'), single])],
+                         [b, a, single])
+
+    def test_output_is_the_same_for_any_number_of_workers(self):
+        with open(CORPUS, encoding='utf-8', errors='replace') as file:
+            expected = count_words(file.read())
+        outputs = set()
+        for workers in [1, 3]:
+            counts = count_corpus([CORPUS, CORPUS], workers=workers, chunk_size=1 << 14)
+            self.assertEqual(counts, Counter({word: 2 * count for word, count in expected.items()}))
+            word_list = os.path.join(self.tmp_dir.name, f'words_{workers}.txt')
+            frequencies = os.path.join(self.tmp_dir.name, f'words_{workers}_frequencies.txt')
+            write_word_list(counts, word_list)
+            write_frequencies(counts, frequencies)
+            with open(word_list) as words_file, open(frequencies) as frequencies_file:
+                outputs.add((words_file.read(), frequencies_file.read()))
+        self.assertEqual(len(outputs), 1)
+
+        words, frequencies = outputs.pop()
+        words = words.split('\n')
+        self.assertEqual(words, sorted(words, key=lambda word: (len(word), word)))
+        counts = [int(line.split()[1]) for line in frequencies.split('\n')]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import solver
+from solver import Solver, feedback_matrix, load_matrix, pattern_code, read_words, score_guess
+
+WORD_LIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'word_list.txt')
+
+# Function to get the .npy file contents of an array
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+class TestFeedbackMatrix(unittest.TestCase):
+    def test_matches_score_guess_on_sampled_pairs(self):
+        words = read_words(WORD_LIST)
+        matrix = feedback_matrix(words, words)
+        self.assertEqual(matrix.shape, (len(words), len(words)))
+        self.assertEqual(matrix.dtype, np.uint8)
+        rng = random.Random(0)
+        for _ in range(2000):
+            guess, answer = rng.randrange(len(words)), rng.randrange(len(words))
+            self.assertEqual(matrix[guess, answer], pattern_code(score_guess(words[guess], words[answer])),
+                             f'{words[guess]} against {words[answer]}')
+
+    def test_repeated_letters_and_block_boundaries(self):
+        words = ['SPEED', 'ERASE', 'EERIE', 'ABBEY', 'KEBAB', 'LEVEL', 'CRANE', 'ZZZZZ']
+        with mock.patch.object(solver, 'BLOCK_SIZE', 3):
+            matrix = feedback_matrix(words, words)
+        for i, guess in enumerate(words):
+            for j, answer in enumerate(words):
+                self.assertEqual(matrix[i, j], pattern_code(score_guess(guess, answer)), f'{guess} against {answer}')
+        self.assertTrue((np.diag(matrix) == solver.ALL_GREEN).all())
+
+class TestLoadMatrix(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.words = ['CRANE', 'SLATE', 'TRACE', 'SPEED']
+        self.builds = mock.patch.object(solver, 'feedback_matrix', wraps=feedback_matrix).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def cache_files(self):
+        return sorted(os.listdir(self.tmp_dir.name))
+
+    def test_matrix_is_built_once_and_memory_mapped(self):
+        matrix = load_matrix(self.words, self.tmp_dir.name)
+        self.assertIsInstance(matrix, np.memmap)
+        np.testing.assert_array_equal(matrix, feedback_matrix(self.words, self.words))
+        self.builds.reset_mock()
+        load_matrix(self.words, self.tmp_dir.name)
+        self.builds.assert_not_called()
+        self.assertEqual(len(self.cache_files()), 1)
+
+    def test_changed_word_list_gets_its_own_matrix(self):
+        load_matrix(self.words, self.tmp_dir.name)
+        matrix = load_matrix(self.words + ['ABBEY'], self.tmp_dir.name)
+        self.assertEqual(matrix.shape, (5, 5))
+        self.assertEqual(len(self.cache_files()), 2)
+
+    def test_damaged_or_wrong_size_cache_is_rebuilt(self):
+        load_matrix(self.words, self.tmp_dir.name)
+        path = os.path.join(self.tmp_dir.name, self.cache_files()[0])
+        with open(path, 'rb') as file:
+            data = file.read()
+        for name, damaged in [('truncated', data[:-3]), ('empty', b''), ('wrong size', npy_bytes(np.zeros((3, 3), dtype=np.uint8))),
+                              ('wrong dtype', npy_bytes(np.zeros((4, 4), dtype=np.int64)))]:
+            with self.subTest(name):
+                with open(path, 'wb') as file:
+                    file.write(damaged)
+                self.builds.reset_mock()
+                matrix = load_matrix(self.words, self.tmp_dir.name)
+                self.builds.assert_called_once()
+                np.testing.assert_array_equal(matrix, feedback_matrix(self.words, self.words))
+
+class TestSolver(unittest.TestCase):
+    def test_secret_word_stays_a_candidate(self):
+        words = read_words(WORD_LIST)
+        word_solver = Solver(words, feedback_matrix(words, words))
+        rng = random.Random(1)
+        for secret_word in rng.sample(words, 20):
+            feedback = word_solver.feedback(rng.sample(words, 3), secret_word)
+            candidates = [words[i] for i in word_solver.candidates(feedback)]
+            self.assertIn(secret_word, candidates)
+            # Every candidate would have given the same feedback
+            self.assertTrue(all(word_solver.feedback([guess for guess, _ in feedback], word) == feedback for word in candidates))
+            self.assertIn(word_solver.best_guess(feedback), words)
+        # A guess outside the list is scored on the fly
+        self.assertEqual(word_solver.patterns('QQQQQ')[0], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import random
+import tempfile
+import unittest
+import zlib
+
+from word_index import WordIndex, build_index, index_path
+
+COLLIDING_WORDS = ['QXJUCOG', 'BEHLSMH']     #two words with the same crc32, so they probe from the same slot in any table
+WORD_LIST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'word_list.txt')
+
+class TestWordIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'words.idx')
+
+    def open_index(self, words):
+        build_index(words, self.path)
+        word_index = WordIndex(self.path)
+        self.addCleanup(word_index.close)
+        return word_index
+
+    def test_words_are_cleaned_and_grouped_by_length(self):
+        word_index = self.open_index(['crane\n', 'Slate', 'CRANE', 'it', "don't", 'café', '', 'at\n'])
+        self.assertEqual(word_index.words(5), ['CRANE', 'SLATE'])
+        self.assertEqual(word_index.words(2), ['AT', 'IT'])
+        self.assertEqual(word_index.count(4), 0)
+        self.assertEqual(word_index.words(4), [])
+        self.assertEqual(word_index.word(5, 1), 'SLATE')
+        self.assertIn(word_index.random_word(5, random.Random(0)), ['CRANE', 'SLATE'])
+        with self.assertRaises(ValueError):
+            word_index.random_word(7)
+
+    def test_present_and_absent_words(self):
+        word_index = self.open_index(['CRANE', 'SLATE', 'AT'])
+        for word in ['CRANE', 'SLATE', 'AT']:
+            self.assertIn(word, word_index)
+        for word in ['CRATE', 'crane', 'TO', 'A', 'CRANES', 'CAFÉS', '']:
+            self.assertNotIn(word, word_index)
+
+    def test_crc32_collisions(self):
+        self.assertEqual(zlib.crc32(COLLIDING_WORDS[0].encode()), zlib.crc32(COLLIDING_WORDS[1].encode()))
+        word_index = self.open_index(COLLIDING_WORDS + ['ABCDEFG', 'ZYXWVUT'])
+        for word in COLLIDING_WORDS + ['ABCDEFG', 'ZYXWVUT']:
+            self.assertIn(word, word_index)
+        # A word missing from the list is told apart from the one sharing its hash
+        word_index = self.open_index(COLLIDING_WORDS[:1])
+        self.assertIn(COLLIDING_WORDS[0], word_index)
+        self.assertNotIn(COLLIDING_WORDS[1], word_index)
+
+    def test_every_word_of_the_word_list_is_found(self):
+        with open(WORD_LIST) as file:
+            words = {word.strip().upper() for word in file if word.strip()}
+        word_index = self.open_index(words)
+        self.assertEqual(sum(word_index.count(length) for length in word_index.groups), len(words))
+        self.assertTrue(all(word in word_index for word in words))
+        self.assertFalse(any(word[::-1] in word_index for word in words if word[::-1] not in words))
+
+class TestOpenWordIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.filename = os.path.join(self.tmp_dir.name, 'words.txt')
+        self.path = index_path(self.filename)
+        self.write_list(['CRANE', 'SLATE'])
+
+    def write_list(self, words, mtime=1_000_000):
+        with open(self.filename, 'w') as file:
+            file.write('\n'.join(words))
+        os.utime(self.filename, (mtime, mtime))
+
+    # Function to open the index of the word list and get its words of five letters
+    def open_words(self):
+        with WordIndex.open(self.filename) as word_index:
+            return word_index.words(5)
+
+    def test_index_is_built_once(self):
+        self.assertEqual(self.open_words(), ['CRANE', 'SLATE'])
+        built = os.stat(self.path)
+        self.assertEqual(self.open_words(), ['CRANE', 'SLATE'])
+        self.assertEqual(os.stat(self.path).st_ino, built.st_ino)
+
+    def test_stale_index_is_rebuilt(self):
+        self.open_words()
+        self.write_list(['CRANE', 'SLATE', 'TRACE'], mtime=os.path.getmtime(self.path) + 10)
+        self.assertEqual(self.open_words(), ['CRANE', 'SLATE', 'TRACE'])
+
+    def test_damaged_index_is_rebuilt(self):
+        self.open_words()
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        for damaged in [data[:-4], data + b'\0' * 4, data[:6], b'', b'XIDX' + data[4:]]:
+            with self.subTest(size=len(damaged)):
+                with open(self.path, 'wb') as file:
+                    file.write(damaged)
+                self.assertEqual(self.open_words(), ['CRANE', 'SLATE'])
+                with open(self.path, 'rb') as file:
+                    self.assertEqual(file.read(), data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+from string import ascii_uppercase
+
+# The index file starts with a header and a table of the word lengths in it. The words of each length follow as
+# fixed-width records in sorted order, then a hash table of record numbers (plus one, 0 is an empty slot) with
+# linear probing, so a word is found by hashing it and comparing a record or two.
+MAGIC = b'WIDX'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHH')     #magic, format version, number of word lengths
+GROUP = struct.Struct('<HIIII')     #word length, number of words, offset of the records, offset of the hash table, slots
+SLOT = struct.Struct('<I')
+
+# Function to get the path of the index of a word list file
+def index_path(filename):
+    return os.path.splitext(filename)[0] + '.idx'
+
+# Function to get the slot a word starts probing from in a hash table of the given number of slots
+def word_slot(word, slots):
+    return zlib.crc32(word) & (slots - 1)
+
+# Function to write the index of some words, upper case and grouped by length, replacing the file at once
+def build_index(words, path):
+    groups = {}
+    for word in sorted({word.strip().upper() for word in words}):
+        if word and all(letter in ascii_uppercase for letter in word):
+            groups.setdefault(len(word), []).append(word.encode('ascii'))
+
+    offset = HEADER.size + GROUP.size * len(groups)
+    entries, body = [], []
+    for length, group in sorted(groups.items()):
+        records = b''.join(group)
+        slots = 1 << (2 * len(group) - 1).bit_length()      #a power of two, at most half full
+        table = [0] * slots
+        for number, word in enumerate(group):
+            slot = word_slot(word, slots)
+            while table[slot]:
+                slot = (slot + 1) & (slots - 1)
+            table[slot] = number + 1
+        entries.append(GROUP.pack(length, len(group), offset, offset + len(records), slots))
+        body += [records, struct.pack(f'<{slots}I', *table)]
+        offset += len(records) + SLOT.size * slots
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(groups)))
+        file.writelines(entries + body)
+    os.replace(tmp_path, path)
+
+# Words of a word list, memory-mapped from its index: opening it only reads the header, picking a random word
+# of a length and checking whether a word is in the list take constant time
+class WordIndex:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)      #raises ValueError on an empty file
+        magic, version, lengths = HEADER.unpack_from(self.buffer) if len(self.buffer) >= HEADER.size else (None, None, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.buffer.close()
+            raise ValueError(f'{path} is not a version {FORMAT_VERSION} word index')
+        self.groups = {}
+        size = HEADER.size + GROUP.size * lengths       #a truncated or padded file doesn't match what its header describes
+        if len(self.buffer) >= size:
+            for i in range(lengths):
+                length, *group = GROUP.unpack_from(self.buffer, HEADER.size + i * GROUP.size)
+                self.groups[length] = group
+                size = max(size, group[2] + SLOT.size * group[3])       #the end of its hash table
+        if len(self.buffer) != size:
+            self.buffer.close()
+            raise ValueError(f'{path} is {len(self.buffer)} bytes, its header describes {size}')
+
+    # Function to open the index of a word list file, building it first if it is missing, older than the list
+    # or damaged
+    @classmethod
+    def open(cls, filename):
+        path = index_path(filename)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(filename):
+            try:
+                return cls(path)
+            except ValueError:
+                pass
+        with open(filename, 'r') as file:
+            build_index(file, path)
+        return cls(path)
+
+    # Function to get the number of words of a length
+    def count(self, length):
+        return self.groups[length][0] if length in self.groups else 0
+
+    # Function to get the word with the given number among the sorted words of a length
+    def word(self, length, number):
+        _, records, _, _ = self.groups[length]
+        return self.buffer[records + number * length:records + (number + 1) * length].decode('ascii')
+
+    # Function to get the sorted words of a length
+    def words(self, length):
+        count, records, _, _ = self.groups.get(length, (0, 0, 0, 0))
+        data = self.buffer[records:records + count * length].decode('ascii')
+        return [data[i:i + length] for i in range(0, len(data), length)]
+
+    # Function to pick a random word of a length
+    def random_word(self, length, rng=random):
+        if not self.count(length):
+            raise ValueError(f'There are no {length} letter words in the word list')
+        return self.word(length, rng.randrange(self.count(length)))
+
+    def __contains__(self, word):
+        try:
+            word = word.encode('ascii')
+        except UnicodeEncodeError:
+            return False
+        if len(word) not in self.groups:
+            return False
+        _, records, table, slots = self.groups[len(word)]
+        slot = word_slot(word, slots)
+        while number := SLOT.unpack_from(self.buffer, table + slot * SLOT.size)[0]:
+            start = records + (number - 1) * len(word)
+            if self.buffer[start:start + len(word)] == word:
+                return True
+            slot = (slot + 1) & (slots - 1)
+        return False
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == '__main__':
+    filename = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'word_list.txt')
+    path = sys.argv[2] if len(sys.argv) > 2 else index_path(filename)
+    with open(filename, 'r') as file:
+        build_index(file, path)
+    with WordIndex(path) as word_index:
+        print(f'Wrote {path}: ' + ', '.join(f'{word_index.count(length)} words of {length} letters' for length in sorted(word_index.groups)))